@@ -22,6 +22,7 @@ from components.crm_ui import crm_ui
 from crm_agent.db.engine import SessionLocal
 from crm_agent.db.repo import Repo
 from crm_agent.flow.workflow import run_until_candidates
+from crm_agent.services.template_library import invalidate_library
 
 # 기존 import 지우고 이걸로 대체하세요
 import sys
@@ -594,6 +595,18 @@ def fetch_step4_data(db, repo: Repo, run_id: str) -> dict:
 # -------------------------
 # UI -> Streamlit 이벤트 처리
 # -------------------------
+def _candidate_progress(status):
+    """
+    streaming 생성 중 후보가 확정될 때마다 status 박스에 한 줄씩 표시
+    """
+    def _cb(ev: dict) -> None:
+        c = ev.get("candidate") or {}
+        comp = (ev.get("compliance") or {}).get("status", "")
+        src = " · 승인 템플릿 재사용" if (c.get("notes") or {}).get("library") else ""
+        status.write(f"{c.get('template_id', '')} · {c.get('title', '')} ({comp}){src}")
+    return _cb
+
+
 def handle_component_event(evt: dict, db, repo: Repo) -> None:
     if not evt or not isinstance(evt, dict):
         return
@@ -691,6 +704,7 @@ def handle_component_event(evt: dict, db, repo: Repo) -> None:
                 db.commit()
             except Exception:
                 pass
+            invalidate_library()
 
         st.session_state["requested_page"] = "Home(UI)"
         st.rerun()
@@ -761,7 +775,9 @@ def handle_component_event(evt: dict, db, repo: Repo) -> None:
         )
         repo.update_run(rid, step_id="S2_READY")
 
-        run_until_candidates(rid, channel=channel, tone=tone)
+        with st.status("템플릿 후보 생성 중...", expanded=True) as gen_status:
+            run_until_candidates(rid, channel=channel, tone=tone, on_candidate=_candidate_progress(gen_status))
+            gen_status.update(label="템플릿 후보 생성 완료", state="complete")
 
         st.session_state["run_id"] = rid
         st.session_state["step1_result"] = make_json_safe(
@@ -825,7 +841,15 @@ def handle_component_event(evt: dict, db, repo: Repo) -> None:
         tone = (brief.get("tone_hint") or "amoremall").strip().lower()
 
         try:
-            run_until_candidates(run_id, channel=channel, tone=tone)
+            with st.status("템플릿 후보 재생성 중...", expanded=True) as gen_status:
+                run_until_candidates(
+                    run_id,
+                    channel=channel,
+                    tone=tone,
+                    on_candidate=_candidate_progress(gen_status),
+                    use_library=False,  # 재생성은 승인 템플릿 재사용 없이 새로
+                )
+                gen_status.update(label="템플릿 후보 재생성 완료", state="complete")
             st.session_state["step2_error"] = {"ok": True, "msg": "재생성 완료"}
         except Exception as e:
             st.session_state["step2_error"] = {"ok": False, "msg": f"재생성 실패: {e}"}
@@ -870,6 +894,7 @@ def handle_component_event(evt: dict, db, repo: Repo) -> None:
             db.commit()
         except Exception:
             pass
+        invalidate_library()
 
         st.session_state["step3_result"] = {"ok": True, "msg": "저장 완료", "toast_id": toast_id}
         st.session_state["requested_page"] = "Step3(승인/반려 저장)"
@@ -0,0 +1,18 @@
+"""
+오프라인 end-to-end 벤치마크 (MySQL / OpenAI / Pinecone 없이)
+
+- fakes.py          : OpenAI(Responses/Embeddings) / Pinecone / SentenceTransformer 로컬 stand-in
+- sqlite_fixture.py : db/init/fianl.sql 기반 SQLite fixture (사용자 수 N으로 확장)
+- run.py            : run_until_candidates / run_product_agent / JJG process_* 실행 → latency·throughput·peak RSS
+
+사용:
+  python -m benchmarks.run --users 1000,100000 --scenarios candidates,product,jjg
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
@@ -0,0 +1,521 @@
+"""
+대용량 합성 데이터 생성기 (users / user_features / user_events / carts / cart_items / orders / order_items)
+
+- 사용자 chunk 단위로 numpy 벡터 연산으로 생성 → table별 DataFrame 을 바로 sink 로 흘려보냄(메모리 = chunk 크기)
+- 분포(skew)
+  - 사용자 활동량: lognormal(평균 1) → 이벤트/장바구니/주문 수가 소수 heavy user 에 몰림
+  - 상품 인기: rank 기반 Zipf(p ∝ 1/rank^a)
+  - 재구매: 주문 상품 일부는 사용자별 선호 상품에서 다시 뽑음
+  - 시각: 최근일수록 많게(beta(1, 3))
+- sink
+  - SQLite   : executemany
+  - MySQL    : pymysql executemany(= multi-row INSERT 로 묶여 전송)
+  - TSV      : table별 .tsv + LOAD DATA LOCAL INFILE 스크립트(load_data.sql)
+- (seed, chunk 번호)로 rng 를 만들기 때문에 같은 설정이면 항상 같은 데이터
+
+사용:
+  python -m benchmarks.datagen --users 1000000 --sqlite /tmp/crm.sqlite
+  python -m benchmarks.datagen --users 1000000 --tsv_dir /tmp/crm_tsv      # → mysql --local-infile=1 crm < load_data.sql
+  python -m benchmarks.datagen --users 1000000 --mysql                      # .env 의 MySQL 설정 사용
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import ROOT  # noqa: F401  (src 경로 등록)
+
+TABLES = ("users", "user_features", "user_events", "carts", "cart_items", "orders", "order_items")
+
+COLUMNS: Dict[str, List[str]] = {
+    "users": [
+        "user_id", "customer_name", "gender", "birth_year", "region", "preferred_channel",
+        "sms_opt_in", "kakao_opt_in", "push_opt_in", "email_opt_in",
+        "phone_e164", "kakao_user_key", "push_token", "email", "created_at", "updated_at",
+    ],
+    "user_features": [
+        "user_id", "lifecycle_stage", "last_browse_at", "last_cart_at", "last_purchase_at", "cart_items_count",
+        "persona_id", "skin_type", "skin_concern_primary", "sensitivity_level", "top_category_30d",
+        "updated_at", "keyword",
+    ],
+    "user_events": [
+        "event_id", "user_id", "event_type", "occurred_at", "product_id", "category_id", "device", "payload_json",
+    ],
+    "carts": ["cart_id", "user_id", "status", "created_at", "updated_at"],
+    "cart_items": ["cart_item_id", "cart_id", "prod_sn", "quantity", "unit_price", "added_at"],
+    "orders": ["order_id", "user_id", "order_status", "total_amount", "ordered_at"],
+    "order_items": ["order_item_id", "order_id", "prod_sn", "quantity", "unit_price", "created_at"],
+}
+
+# (값, 확률)
+_GENDER = (["F", "M", "U"], [0.72, 0.25, 0.03])
+_REGION = (["Seoul", "Gyeonggi", "Busan", "Incheon", "Daegu", "Daejeon", "Gwangju", "Ulsan", "Other"],
+           [0.30, 0.25, 0.08, 0.07, 0.06, 0.05, 0.04, 0.03, 0.12])
+_CHANNEL = (["SMS", "KAKAO", "PUSH", "EMAIL"], [0.45, 0.30, 0.20, 0.05])
+_PERSONA = (["hydration", "ingredient_care", "trend_seeker", "value_hunter"], [0.35, 0.30, 0.20, 0.15])
+_SKIN_TYPE = (["dry", "oily", "combination", "normal", "unknown"], [0.28, 0.2, 0.3, 0.15, 0.07])
+_CONCERN = (["sensitivity", "acne", "pigmentation", "wrinkles", "pores", "redness", "hydration", "barrier", "unknown"],
+            [0.14, 0.12, 0.1, 0.12, 0.1, 0.06, 0.2, 0.08, 0.08])
+_SENSITIVITY = (["low", "mid", "high", "unknown"], [0.3, 0.4, 0.22, 0.08])
+_TOP_CATEGORY = (["skincare", "makeup", "hair", "body", "fragrance", "unknown"], [0.5, 0.22, 0.08, 0.1, 0.04, 0.06])
+_EVENT_TYPE = (["BROWSE", "ADD_TO_CART", "REMOVE_FROM_CART", "PURCHASE", "SEARCH", "WISHLIST"],
+               [0.62, 0.12, 0.03, 0.05, 0.13, 0.05])
+_DEVICE = (["APP", "WEB", "UNKNOWN"], [0.6, 0.35, 0.05])
+_CART_STATUS = (["ABANDONED", "ORDERED", "ACTIVE"], [0.35, 0.35, 0.30])
+_ORDER_STATUS = (["DELIVERED", "SHIPPING", "PAYMENT_COMPLETED", "REFUNDED", "CANCELED"],
+                 [0.6, 0.15, 0.12, 0.06, 0.07])
+
+_DAY = 86400
+
+
+@dataclass
+class GenConfig:
+    users: int
+    seed: int = 42
+    chunk_users: int = 100_000
+    start_index: int = 1
+    zipf_a: float = 1.1             # 상품 인기 skew
+    activity_sigma: float = 1.0     # 사용자 활동량 lognormal sigma
+    events_per_user: float = 12.0
+    carts_per_user: float = 1.0
+    orders_per_user: float = 2.3
+    repurchase_ratio: float = 0.4   # 주문 상품 중 선호 상품 재구매 비율
+    days: int = 180                 # 이벤트/주문 기간
+    now: str = "2026-01-01 00:00:00"
+
+
+@dataclass
+class Catalog:
+    prod_sn: np.ndarray
+    price: np.ndarray
+    category: np.ndarray
+    concerns: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dump(cls, tables: Dict[str, Any], data: Dict[str, List[Tuple[Any, ...]]]) -> "Catalog":
+        cols = tables["products"].columns
+        rows = data.get("products") or []
+        i_sn, i_sale, i_orig, i_cat = (cols.index(c) for c in ("prod_sn", "price_sale", "price_original", "category_paths_all"))
+        concern_rows = data.get("product_concern_map") or []
+        i_con = tables["product_concern_map"].columns.index("product_concern") if concern_rows else 0
+        return cls(
+            prod_sn=np.asarray([r[i_sn] for r in rows], dtype=np.int64),
+            price=np.asarray([r[i_sale] or r[i_orig] or 10000 for r in rows], dtype=np.int64),
+            category=np.asarray([((r[i_cat] or "").split("||")[0].split(">")[0] or None) for r in rows], dtype=object),
+            concerns=sorted({r[i_con] for r in concern_rows if r[i_con]}),
+        )
+
+    @classmethod
+    def from_db(cls, con) -> "Catalog":
+        """
+        DB-API connection(sqlite3 / pymysql) 의 products / product_concern_map 에서
+        """
+        cur = con.cursor()
+        cur.execute("SELECT prod_sn, COALESCE(price_sale, price_original, 10000), category_paths_all FROM products")
+        rows = cur.fetchall()
+        cur.execute("SELECT DISTINCT product_concern FROM product_concern_map")
+        concerns = sorted(r[0] for r in cur.fetchall() if r[0])
+        cur.close()
+        return cls(
+            prod_sn=np.asarray([r[0] for r in rows], dtype=np.int64),
+            price=np.asarray([r[1] for r in rows], dtype=np.int64),
+            category=np.asarray([((r[2] or "").split("||")[0].split(">")[0] or None) for r in rows], dtype=object),
+            concerns=concerns,
+        )
+
+
+def _choice(rng: np.random.Generator, spec: Tuple[List[str], List[float]], n: int) -> np.ndarray:
+    values, p = spec
+    p = np.asarray(p, dtype=float)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p / p.sum())]
+
+
+def _zipf_p(n: int, a: float, rng: np.random.Generator) -> np.ndarray:
+    # rank 1이 가장 인기. 어떤 상품이 인기인지는 seed로 섞음
+    p = 1.0 / np.arange(1, n + 1, dtype=float) ** a
+    return rng.permutation(p / p.sum())
+
+
+def _ts(sec: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    epoch 초 → 'YYYY-MM-DD HH:MM:SS' (mask=False 자리는 None)
+    """
+    s = np.char.replace(np.datetime_as_string(sec.astype("datetime64[s]"), unit="s"), "T", " ").astype(object)
+    if mask is not None:
+        s[~mask] = None
+    return s
+
+
+def _recent(rng: np.random.Generator, now: int, days: int, n: int) -> np.ndarray:
+    return now - (rng.beta(1.0, 3.0, size=n) * days * _DAY).astype(np.int64)
+
+
+def _group_max(idx: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(n, -1, dtype=np.int64)
+    if len(idx):
+        np.maximum.at(out, idx, values)
+    return out
+
+
+def _zfill(idx: np.ndarray, width: int) -> np.ndarray:
+    return np.char.zfill(idx.astype(str), width)
+
+
+def generate(cfg: GenConfig, catalog: Catalog) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    (table, DataFrame) 를 chunk 단위로 yield. 정수 PK는 chunk 간 이어짐
+    """
+    if not len(catalog.prod_sn):
+        raise RuntimeError("products 가 비어 있습니다(catalog 필요)")
+    now = int(np.datetime64(cfg.now.replace(" ", "T"), "s").astype(np.int64))
+    n_prod = len(catalog.prod_sn)
+    p_prod = _zipf_p(n_prod, cfg.zipf_a, np.random.default_rng([cfg.seed, 0xC0DE]))
+    concerns = catalog.concerns or ["영양/보습"]
+    p_concern = _zipf_p(len(concerns), 0.8, np.random.default_rng([cfg.seed, 0xC0C0]))
+    next_id = {"event": 1, "cart": 1, "cart_item": 1, "order": 1, "order_item": 1}
+
+    def _ids(kind: str, n: int) -> np.ndarray:
+        start = next_id[kind]
+        next_id[kind] = start + n
+        return np.arange(start, start + n, dtype=np.int64)
+
+    for chunk_no, lo in enumerate(range(0, cfg.users, cfg.chunk_users)):
+        n = min(cfg.chunk_users, cfg.users - lo)
+        rng = np.random.default_rng([cfg.seed, chunk_no + 1])
+        idx = np.arange(cfg.start_index + lo, cfg.start_index + lo + n, dtype=np.int64)
+        num = _zfill(idx, 7)
+        uid = np.char.add("u_", num).astype(object)
+        activity = rng.lognormal(-cfg.activity_sigma ** 2 / 2, cfg.activity_sigma, size=n)
+
+        # ---- users
+        channel = _choice(rng, _CHANNEL, n)
+        opt = {}
+        for ch in _CHANNEL[0]:
+            base = {"SMS": 0.55, "KAKAO": 0.4, "PUSH": 0.35, "EMAIL": 0.25}[ch]
+            p = np.where(channel == ch, 0.95, base)
+            opt[ch] = (rng.random(n) < p).astype(np.int64)
+        created = now - rng.integers(0, 3 * 365 * _DAY, size=n)
+        users = pd.DataFrame({
+            "user_id": uid,
+            "customer_name": np.char.add("User", num).astype(object),
+            "gender": _choice(rng, _GENDER, n),
+            "birth_year": np.clip(np.rint(rng.normal(1992, 9, size=n)), 1950, 2008).astype(np.int64),
+            "region": _choice(rng, _REGION, n),
+            "preferred_channel": channel,
+            "sms_opt_in": opt["SMS"],
+            "kakao_opt_in": opt["KAKAO"],
+            "push_opt_in": opt["PUSH"],
+            "email_opt_in": opt["EMAIL"],
+            "phone_e164": np.char.add("+8210", _zfill(idx, 8)).astype(object),
+            "kakao_user_key": np.where(opt["KAKAO"] == 1, np.char.add("kk_", num).astype(object), None),
+            "push_token": np.where(opt["PUSH"] == 1, np.char.add("pt_", num).astype(object), None),
+            "email": np.where(opt["EMAIL"] == 1, np.char.add(np.char.add("user", num), "@example.com").astype(object), None),
+            "created_at": _ts(created),
+            "updated_at": _ts(np.maximum(created, now - rng.integers(0, 30 * _DAY, size=n))),
+        })
+
+        # ---- user_events
+        ev_cnt = rng.poisson(cfg.events_per_user * activity)
+        ev_user = np.repeat(np.arange(n), ev_cnt)
+        n_ev = len(ev_user)
+        ev_type = _choice(rng, _EVENT_TYPE, n_ev)
+        ev_prod = rng.choice(n_prod, size=n_ev, p=p_prod)
+        ev_at = _recent(rng, now, cfg.days, n_ev)
+        no_prod = ev_type == "SEARCH"
+        events = pd.DataFrame({
+            "event_id": _ids("event", n_ev),
+            "user_id": uid[ev_user],
+            "event_type": ev_type,
+            "occurred_at": _ts(ev_at),
+            "product_id": np.where(no_prod, None, catalog.prod_sn[ev_prod].astype(str).astype(object)),
+            "category_id": np.where(no_prod, None, catalog.category[ev_prod]),
+            "device": _choice(rng, _DEVICE, n_ev),
+            "payload_json": np.full(n_ev, None, dtype=object),
+        })
+
+        # ---- carts / cart_items
+        cart_cnt = rng.poisson(cfg.carts_per_user * np.minimum(activity, 5.0))
+        cart_user = np.repeat(np.arange(n), cart_cnt)
+        n_cart = len(cart_user)
+        cart_id = _ids("cart", n_cart)
+        cart_at = _recent(rng, now, cfg.days, n_cart)
+        cart_status = _choice(rng, _CART_STATUS, n_cart)
+        carts = pd.DataFrame({
+            "cart_id": cart_id,
+            "user_id": uid[cart_user],
+            "status": cart_status,
+            "created_at": _ts(cart_at),
+            "updated_at": _ts(np.minimum(now, cart_at + rng.integers(0, 5 * _DAY, size=n_cart))),
+        })
+        ci_cnt = 1 + rng.poisson(1.5, size=n_cart)
+        ci_cart = np.repeat(np.arange(n_cart), ci_cnt)
+        n_ci = len(ci_cart)
+        ci_prod = rng.choice(n_prod, size=n_ci, p=p_prod)
+        cart_items = pd.DataFrame({
+            "cart_item_id": _ids("cart_item", n_ci),
+            "cart_id": cart_id[ci_cart],
+            "prod_sn": catalog.prod_sn[ci_prod],
+            "quantity": 1 + rng.poisson(0.4, size=n_ci),
+            "unit_price": catalog.price[ci_prod],
+            "added_at": _ts(cart_at[ci_cart]),
+        })
+
+        # ---- orders / order_items (일부는 사용자별 선호 상품 재구매)
+        order_cnt = rng.poisson(cfg.orders_per_user * np.minimum(activity, 8.0))
+        order_user = np.repeat(np.arange(n), order_cnt)
+        n_order = len(order_user)
+        order_id = _ids("order", n_order)
+        order_at = _recent(rng, now, cfg.days * 2, n_order)
+        oi_cnt = 1 + rng.poisson(1.7, size=n_order)
+        oi_order = np.repeat(np.arange(n_order), oi_cnt)
+        n_oi = len(oi_order)
+        favorite = rng.choice(n_prod, size=n, p=p_prod)
+        oi_prod = np.where(
+            rng.random(n_oi) < cfg.repurchase_ratio,
+            favorite[order_user[oi_order]],
+            rng.choice(n_prod, size=n_oi, p=p_prod),
+        )
+        oi_qty = 1 + rng.poisson(0.3, size=n_oi)
+        oi_price = catalog.price[oi_prod]
+        total = np.bincount(oi_order, weights=oi_qty * oi_price, minlength=n_order).astype(np.int64)
+        orders = pd.DataFrame({
+            "order_id": order_id,
+            "user_id": uid[order_user],
+            "order_status": _choice(rng, _ORDER_STATUS, n_order),
+            "total_amount": total,
+            "ordered_at": _ts(order_at),
+        })
+        order_items = pd.DataFrame({
+            "order_item_id": _ids("order_item", n_oi),
+            "order_id": order_id[oi_order],
+            "prod_sn": catalog.prod_sn[oi_prod],
+            "quantity": oi_qty,
+            "unit_price": oi_price,
+            "created_at": _ts(order_at[oi_order]),
+        })
+
+        # ---- user_features (위에서 만든 활동으로부터 집계)
+        browse = ev_type == "BROWSE"
+        last_browse = _group_max(ev_user[browse], ev_at[browse], n)
+        last_cart = _group_max(cart_user, cart_at, n)
+        delivered = orders["order_status"].to_numpy() == "DELIVERED"
+        last_purchase = _group_max(order_user[delivered], order_at[delivered], n)
+        last_any = np.maximum.reduce([last_browse, last_cart, last_purchase, _group_max(ev_user, ev_at, n)])
+        open_cart = cart_status[ci_cart] != "ORDERED"
+        cart_items_count = np.bincount(cart_user[ci_cart[open_cart]], minlength=n).astype(np.int64)
+        lifecycle = np.select(
+            [now - created < 30 * _DAY, now - last_any < 30 * _DAY, now - last_any < 90 * _DAY],
+            ["new", "active", "dormant"],
+            default="churned",
+        ).astype(object)
+        kw1 = np.asarray(concerns, dtype=object)[rng.choice(len(concerns), size=n, p=p_concern)]
+        kw2 = np.asarray(concerns, dtype=object)[rng.choice(len(concerns), size=n, p=p_concern)]
+        two = (rng.random(n) < 0.15) & (kw1 != kw2)
+        keyword = np.where(two, kw1 + ", " + kw2, kw1)
+        features = pd.DataFrame({
+            "user_id": uid,
+            "lifecycle_stage": lifecycle,
+            "last_browse_at": _ts(np.maximum(last_browse, 0), last_browse >= 0),
+            "last_cart_at": _ts(np.maximum(last_cart, 0), last_cart >= 0),
+            "last_purchase_at": _ts(np.maximum(last_purchase, 0), last_purchase >= 0),
+            "cart_items_count": cart_items_count,
+            "persona_id": _choice(rng, _PERSONA, n),
+            "skin_type": _choice(rng, _SKIN_TYPE, n),
+            "skin_concern_primary": _choice(rng, _CONCERN, n),
+            "sensitivity_level": _choice(rng, _SENSITIVITY, n),
+            "top_category_30d": _choice(rng, _TOP_CATEGORY, n),
+            "updated_at": _ts(np.full(n, now, dtype=np.int64)),
+            "keyword": keyword,
+        })
+
+        yield "users", users
+        yield "user_features", features
+        yield "user_events", events
+        yield "carts", carts
+        yield "cart_items", cart_items
+        yield "orders", orders
+        yield "order_items", order_items
+
+
+# -----------------------------
+# sinks
+# -----------------------------
+def _rows(df: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    # Series.tolist() → python 기본 타입(numpy scalar는 DB-API 드라이버가 못 받음)
+    return list(zip(*(df[c].tolist() for c in df.columns)))
+
+
+class SqliteSink:
+    def __init__(self, con: sqlite3.Connection):
+        self.con = con
+
+    def write(self, table: str, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        cols = ", ".join(f'"{c}"' for c in df.columns)
+        ph = ", ".join("?" * len(df.columns))
+        self.con.executemany(f'INSERT INTO "{table}" ({cols}) VALUES ({ph})', _rows(df))
+
+    def close(self) -> None:
+        self.con.commit()
+
+
+class MySQLSink:
+    """
+    pymysql cursor.executemany 는 INSERT ... VALUES 를 max_allowed_packet 안에서 multi-row 로 묶어 보냄
+    """
+
+    def __init__(self, engine, batch_rows: int = 5000):
+        self.raw = engine.raw_connection()
+        self.batch_rows = batch_rows
+        cur = self.raw.cursor()
+        cur.execute("SET SESSION unique_checks = 0")
+        cur.execute("SET SESSION foreign_key_checks = 0")
+        cur.close()
+
+    def write(self, table: str, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        cols = ", ".join(f"`{c}`" for c in df.columns)
+        ph = ", ".join(["%s"] * len(df.columns))
+        sql = f"INSERT INTO `{table}` ({cols}) VALUES ({ph})"
+        rows = _rows(df)
+        cur = self.raw.cursor()
+        try:
+            for i in range(0, len(rows), self.batch_rows):
+                cur.executemany(sql, rows[i:i + self.batch_rows])
+            self.raw.commit()
+        finally:
+            cur.close()
+
+    def close(self) -> None:
+        cur = self.raw.cursor()
+        cur.execute("SET SESSION unique_checks = 1")
+        cur.execute("SET SESSION foreign_key_checks = 1")
+        cur.close()
+        self.raw.close()
+
+
+class TsvSink:
+    """
+    table별 TSV(NULL = \\N) + LOAD DATA LOCAL INFILE 스크립트.
+    생성 값에는 탭/개행이 없어서 escape 불필요
+    """
+
+    def __init__(self, out_dir: Path):
+        self.dir = Path(out_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.cols: Dict[str, List[str]] = {}
+        for t in TABLES:
+            p = self.dir / f"{t}.tsv"
+            if p.exists():
+                p.unlink()
+
+    def write(self, table: str, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        self.cols.setdefault(table, list(df.columns))
+        df.to_csv(self.dir / f"{table}.tsv", sep="\t", header=False, index=False, na_rep="\\N",
+                  mode="a", lineterminator="\n")
+
+    def close(self) -> None:
+        lines = ["SET SESSION unique_checks = 0;", "SET SESSION foreign_key_checks = 0;"]
+        for t in TABLES:
+            if t not in self.cols:
+                continue
+            cols = ", ".join(f"`{c}`" for c in self.cols[t])
+            path = (self.dir / f"{t}.tsv").resolve().as_posix()
+            lines.append(
+                f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{t}` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({cols});"
+            )
+        lines += ["SET SESSION unique_checks = 1;", "SET SESSION foreign_key_checks = 1;"]
+        (self.dir / "load_data.sql").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def write_all(
+        cfg: GenConfig,
+        catalog: Catalog,
+        sink,
+        *,
+        tables: Sequence[str] = TABLES,
+        progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, int]:
+    """
+    generate → sink. returns: table별 row 수
+    """
+    counts = {t: 0 for t in tables}
+    t0 = time.perf_counter()
+    done_users = 0
+    for table, df in generate(cfg, catalog):
+        if table not in counts:
+            continue
+        sink.write(table, df)
+        counts[table] += len(df)
+        if table == "users":
+            done_users += len(df)
+            if progress:
+                rate = done_users / max(1e-9, time.perf_counter() - t0)
+                progress(f"  users {done_users:,}/{cfg.users:,} ({rate:,.0f} users/s)")
+    sink.close()
+    return counts
+
+
+def main():
+    p = argparse.ArgumentParser(description="synthetic users/events/carts/orders generator")
+    p.add_argument("--users", type=int, required=True)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--chunk_users", type=int, default=100_000)
+    p.add_argument("--start_index", type=int, default=1, help="user_id 번호 시작값(u_0000001)")
+    p.add_argument("--events_per_user", type=float, default=12.0)
+    p.add_argument("--orders_per_user", type=float, default=2.3)
+    p.add_argument("--zipf_a", type=float, default=1.1)
+    g = p.add_mutually_exclusive_group(required=True)
+    g.add_argument("--sqlite", help="기존 SQLite fixture 경로(products 등이 있어야 함)")
+    g.add_argument("--tsv_dir", help="TSV + load_data.sql 출력 디렉토리(catalog 는 db/init/fianl.sql)")
+    g.add_argument("--mysql", action="store_true", help=".env MySQL 에 직접 INSERT")
+    args = p.parse_args()
+
+    cfg = GenConfig(
+        users=args.users, seed=args.seed, chunk_users=args.chunk_users, start_index=args.start_index,
+        events_per_user=args.events_per_user, orders_per_user=args.orders_per_user, zipf_a=args.zipf_a,
+    )
+    log = lambda m: print(m, file=sys.stderr)  # noqa: E731
+    t0 = time.perf_counter()
+
+    if args.sqlite:
+        con = sqlite3.connect(args.sqlite)
+        con.execute("PRAGMA synchronous = OFF")
+        try:
+            counts = write_all(cfg, Catalog.from_db(con), SqliteSink(con), progress=log)
+        finally:
+            con.close()
+    elif args.tsv_dir:
+        from benchmarks.sqlite_fixture import parse_dump
+        tables, data = parse_dump()
+        counts = write_all(cfg, Catalog.from_dump(tables, data), TsvSink(Path(args.tsv_dir)), progress=log)
+        log(f"load: mysql --local-infile=1 <db> < {Path(args.tsv_dir) / 'load_data.sql'}")
+    else:
+        from crm_agent.db.engine import engine
+        raw = engine.raw_connection()
+        try:
+            catalog = Catalog.from_db(raw)
+        finally:
+            raw.close()
+        counts = write_all(cfg, catalog, MySQLSink(engine), progress=log)
+
+    print({"elapsed_sec": round(time.perf_counter() - t0, 1), **counts})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""
+벤치마크용 로컬 stand-in (네트워크 호출 없음)
+
+- FakeOpenAI    : responses.create(structured output / streaming / with_raw_response), embeddings.create
+- FakePinecone  : Index.query / upsert / describe_index_stats (로컬 코퍼스 chunk를 in-memory index로)
+- FakeSentenceTransformer : JJG rec_logic 의 SentenceTransformer 대체
+
+출력은 (seed, 입력) 으로 결정되고, 지연은 mean_ms ± jitter 로 재현 가능하게 흉내낸다.
+install() 이 crm_agent 쪽 import 지점을 바꿔 끼운다.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import json
+import time
+import types
+import random
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class FakeConfig:
+    seed: int = 7
+    llm_ms: float = 800.0          # responses.create 1회(비스트리밍) 평균
+    ttft_ratio: float = 0.3        # 스트리밍 첫 토큰까지 비율
+    embed_ms: float = 60.0         # embeddings.create 1회
+    vector_ms: float = 40.0        # Pinecone query 1회
+    st_ms: float = 5.0             # SentenceTransformer.encode 1회(배치 단위)
+    jitter: float = 0.2            # ±비율
+    error_rate: float = 0.0        # LLM 호출 중 429로 실패시킬 비율
+    embed_dim: int = 1536
+    st_dim: int = 768
+    rpm: int = 1_000_000           # x-ratelimit-limit-* header 값
+    tpm: int = 1_000_000_000
+
+
+CONFIG = FakeConfig()
+
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {}
+
+# 429 주입용(seed 고정)
+_ERR_LOCK = threading.Lock()
+_ERR_RNG = random.Random(CONFIG.seed)
+
+
+def configure(**kw: Any) -> FakeConfig:
+    for k, v in kw.items():
+        if not hasattr(CONFIG, k):
+            raise ValueError(f"unknown fake config: {k}")
+        setattr(CONFIG, k, type(getattr(CONFIG, k))(v))
+    with _ERR_LOCK:
+        _ERR_RNG.seed(CONFIG.seed)
+    return CONFIG
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[name] = _STATS.get(name, 0) + n
+
+
+def stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+def reset_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+def _rng(*parts: Any) -> random.Random:
+    h = hashlib.sha1(json.dumps([CONFIG.seed, *parts], ensure_ascii=False, default=str).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(h[:8], "big"))
+
+
+def _sleep(mean_ms: float, *key: Any) -> None:
+    if mean_ms <= 0:
+        return
+    j = CONFIG.jitter
+    ms = mean_ms * (1.0 + _rng("latency", *key).uniform(-j, j)) if j > 0 else mean_ms
+    time.sleep(max(0.0, ms) / 1000.0)
+
+
+def _approx_tokens(text: str) -> int:
+    # 한글 위주 문장 기준 대략치(정확한 값은 필요 없음)
+    return max(1, len(text or "") // 2)
+
+
+# -----------------------------
+# embedding: feature hashing (토큰이 겹치면 cosine이 높아지도록)
+# -----------------------------
+_TOKEN_RE = re.compile(r"[0-9a-zA-Z%]+|[가-힣]+")
+
+
+def hash_embed(text: str, dim: int) -> np.ndarray:
+    v = np.zeros(dim, dtype=np.float32)
+    for tok in _TOKEN_RE.findall((text or "").lower()):
+        h = int.from_bytes(hashlib.md5(tok.encode("utf-8")).digest()[:8], "little")
+        v[h % dim] += 1.0 if (h >> 63) == 0 else -1.0
+    n = float(np.linalg.norm(v))
+    if n == 0.0:
+        v[int(hashlib.md5((text or "").encode("utf-8")).hexdigest(), 16) % dim] = 1.0
+        return v
+    return v / n
+
+
+# -----------------------------
+# LLM 출력 생성
+# -----------------------------
+_PHRASES = [
+    "요즘 같은 날씨엔 촉촉한 루틴이 필요해요",
+    "가볍게 스며드는 데일리 케어를 만나보세요",
+    "자주 찾으시던 그 제품, 지금 다시 확인해보세요",
+    "피부 컨디션이 달라지는 작은 습관",
+    "하루 끝, 나를 위한 10분 케어",
+    "놓치기 아쉬운 구성으로 준비했어요",
+    "산뜻하게 마무리되는 사용감",
+    "지금 가장 많이 찾는 루틴 아이템",
+]
+_ANGLES = ["혜택 강조", "문제 해결", "루틴 제안", "재방문 유도", "감성 한 줄"]
+
+_SLOTS_RE = re.compile(r"required_slots:\s*\[([^\]]*)\]")
+_K_RE = re.compile(r"정확히\s*(\d+)\s*개")
+_WORDS_RE = re.compile(r"[가-힣A-Za-z]{2,}")
+
+
+def _fake_normalized(user: str) -> Dict[str, Any]:
+    words: List[str] = []
+    for w in _WORDS_RE.findall(user):
+        if w not in words:
+            words.append(w)
+    return {
+        "normalized_text": " ".join(words[:20]),
+        "keywords": words[:6],
+        "category": "skincare",
+        "occasion": "",
+        "finish_or_texture": words[6:8],
+        "mood_or_style": words[8:10],
+        "negative": [],
+        "confidence": 0.9,
+    }
+
+
+def _fake_candidates(user: str) -> Dict[str, Any]:
+    m = _SLOTS_RE.search(user)
+    slots = re.findall(r"'([a-z_]+)'", m.group(1)) if m else ["customer_name", "product_name", "offer", "cta"]
+    k = int(_K_RE.search(user).group(1)) if _K_RE.search(user) else 5
+    rnd = _rng("candidates", user)
+    out = []
+    for i in range(k):
+        angle = _ANGLES[(i + rnd.randrange(len(_ANGLES))) % len(_ANGLES)]
+        p1, p2 = rnd.sample(_PHRASES, 2)
+        lines = [f"{{customer_name}}님, {p1}", f"{{product_name}} {p2}", "{offer}", "{cta}"]
+        for s in slots:
+            if "{" + s + "}" not in "\n".join(lines) and s != "subject":
+                lines.append("{" + s + "}")
+        out.append({
+            "title": f"{angle} {i + 1}",
+            "body_with_slots": "\n".join(lines),
+            "default_slot_values": {"cta": "{deep_link}", "subject": f"{p1[:20]}" if "subject" in slots else ""},
+        })
+    return {"candidates": out}
+
+
+def fake_output(name: str, user: str) -> str:
+    if name == "normalized_brief":
+        obj: Any = _fake_normalized(user)
+    elif name == "template_candidates":
+        obj = _fake_candidates(user)
+    else:
+        obj = {}
+    return json.dumps(obj, ensure_ascii=False)
+
+
+# -----------------------------
+# OpenAI
+# -----------------------------
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, msg: str = "rate limited (fake)"):
+        super().__init__(msg)
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after-ms": "50"})
+
+
+def _usage(system: str, user: str, out: str, cached: bool) -> SimpleNamespace:
+    return SimpleNamespace(
+        input_tokens=_approx_tokens(system) + _approx_tokens(user),
+        output_tokens=_approx_tokens(out),
+        input_tokens_details=SimpleNamespace(cached_tokens=_approx_tokens(system) if cached else 0),
+    )
+
+
+def _headers() -> Dict[str, str]:
+    return {
+        "x-ratelimit-limit-requests": str(CONFIG.rpm),
+        "x-ratelimit-remaining-requests": str(CONFIG.rpm - 1),
+        "x-ratelimit-limit-tokens": str(CONFIG.tpm),
+        "x-ratelimit-remaining-tokens": str(CONFIG.tpm - 1),
+    }
+
+
+def _inject_error() -> bool:
+    with _ERR_LOCK:
+        return _ERR_RNG.random() < CONFIG.error_rate
+
+
+class _Responses:
+    def __init__(self, owner: "FakeOpenAI"):
+        self._owner = owner
+        self.with_raw_response = _RawResponses(self)
+
+    def create(self, *, model: str = "", input: Any = None, text: Optional[Dict[str, Any]] = None,
+               prompt_cache_key: Optional[str] = None, stream: bool = False, timeout: Any = None, **kw: Any):
+        msgs = input if isinstance(input, list) else [{"role": "user", "content": str(input or "")}]
+        system = "\n".join(m.get("content", "") for m in msgs if m.get("role") == "system")
+        user = "\n".join(m.get("content", "") for m in msgs if m.get("role") != "system")
+        name = ((text or {}).get("format") or {}).get("name", "")
+
+        _count("openai.responses")
+        if CONFIG.error_rate > 0 and _inject_error():
+            _count("openai.responses.429")
+            _sleep(CONFIG.llm_ms * 0.05, "err", user)
+            raise FakeRateLimitError()
+
+        cached = self._owner._seen_prefix(prompt_cache_key, system)
+        out = fake_output(name, user)
+        usage = _usage(system, user, out, cached)
+        if stream:
+            return self._stream(out, usage, user)
+
+        _sleep(CONFIG.llm_ms, "llm", user)
+        return SimpleNamespace(output_text=out, usage=usage, model=model)
+
+    def _stream(self, out: str, usage: SimpleNamespace, user: str) -> Iterator[SimpleNamespace]:
+        _sleep(CONFIG.llm_ms * CONFIG.ttft_ratio, "ttft", user)
+        n = max(1, len(out) // 40)
+        step = CONFIG.llm_ms * (1.0 - CONFIG.ttft_ratio) / n
+        for i in range(n):
+            chunk = out[i * 40:(i + 1) * 40] if i < n - 1 else out[i * 40:]
+            if step > 0:
+                time.sleep(step / 1000.0)
+            yield SimpleNamespace(type="response.output_text.delta", delta=chunk)
+        yield SimpleNamespace(type="response.completed", response=SimpleNamespace(usage=usage))
+
+
+class _RawResponses:
+    def __init__(self, responses: _Responses):
+        self._responses = responses
+
+    def create(self, **kw: Any):
+        parsed = self._responses.create(**kw)
+        return SimpleNamespace(headers=_headers(), parse=lambda: parsed)
+
+
+class _Embeddings:
+    def create(self, *, model: str = "", input: Any = None, **kw: Any):
+        texts = [input] if isinstance(input, str) else list(input or [])
+        _count("openai.embeddings")
+        _count("openai.embeddings.inputs", len(texts))
+        _sleep(CONFIG.embed_ms, "embed", texts[:1])
+        data = [SimpleNamespace(index=i, embedding=hash_embed(t, CONFIG.embed_dim).tolist()) for i, t in enumerate(texts)]
+        return SimpleNamespace(data=data, model=model,
+                               usage=SimpleNamespace(prompt_tokens=sum(_approx_tokens(t) for t in texts)))
+
+
+class FakeOpenAI:
+    _prefix_lock = threading.Lock()
+    _prefixes: set = set()
+
+    def __init__(self, api_key: Optional[str] = None, max_retries: int = 0, **kw: Any):
+        self.api_key = api_key
+        self.responses = _Responses(self)
+        self.embeddings = _Embeddings()
+
+    @classmethod
+    def _seen_prefix(cls, cache_key: Optional[str], system: str) -> bool:
+        # prompt cache 흉내: 같은 (cache_key, system prefix) 두 번째부터 cached
+        key = hashlib.sha1(f"{cache_key}|{system}".encode("utf-8")).hexdigest()
+        with cls._prefix_lock:
+            if key in cls._prefixes:
+                return True
+            cls._prefixes.add(key)
+            return False
+
+
+# -----------------------------
+# Pinecone
+# -----------------------------
+@dataclass
+class _Namespace:
+    ids: List[str] = field(default_factory=list)
+    metadata: List[Dict[str, Any]] = field(default_factory=list)
+    vecs: Optional[np.ndarray] = None
+
+
+class FakeIndex:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._ns: Dict[str, _Namespace] = {}
+        self._loaded = False
+
+    def _ensure_corpus(self, namespace: str) -> None:
+        # 첫 query 시 로컬 코퍼스(rag/corpus)를 ingest와 같은 chunk로 적재
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            from crm_agent.rag.ingest import build_chunks, load_corpus
+            chunks = build_chunks(load_corpus())
+        except Exception:
+            return
+        self._upsert_locked(
+            [{"id": c.id, "values": None, "metadata": {**c.metadata, "text": c.text}} for c in chunks],
+            namespace,
+        )
+
+    def _upsert_locked(self, vectors: List[Dict[str, Any]], namespace: str) -> int:
+        ns = self._ns.setdefault(namespace, _Namespace())
+        rows = []
+        for v in vectors:
+            md = dict(v.get("metadata") or {})
+            vals = v.get("values")
+            vec = np.asarray(vals, dtype=np.float32) if vals is not None else hash_embed(md.get("text", ""), CONFIG.embed_dim)
+            ns.ids.append(v["id"])
+            ns.metadata.append(md)
+            rows.append(vec)
+        if rows:
+            new = np.vstack(rows)
+            ns.vecs = new if ns.vecs is None else np.vstack([ns.vecs, new])
+        return len(rows)
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "", **kw: Any):
+        _sleep(CONFIG.vector_ms, "upsert", len(vectors))
+        with self._lock:
+            self._loaded = True
+            n = self._upsert_locked(vectors, namespace)
+        return SimpleNamespace(upserted_count=n)
+
+    def query(self, *, vector: List[float], top_k: int = 10, namespace: str = "",
+              include_metadata: bool = True, filter: Optional[Dict[str, Any]] = None, **kw: Any):
+        _count("pinecone.query")
+        with self._lock:
+            self._ensure_corpus(namespace)
+            ns = self._ns.get(namespace)
+            vecs = None if ns is None else ns.vecs
+        _sleep(CONFIG.vector_ms, "vector", top_k)
+        if vecs is None or not len(vecs):
+            return SimpleNamespace(matches=[])
+        q = np.asarray(vector, dtype=np.float32)
+        scores = vecs @ q
+        order = np.argsort(-scores)[: int(top_k)]
+        matches = [
+            SimpleNamespace(id=ns.ids[i], score=float(scores[i]), metadata=ns.metadata[i] if include_metadata else {})
+            for i in order
+        ]
+        return SimpleNamespace(matches=matches)
+
+    def describe_index_stats(self, **kw: Any):
+        with self._lock:
+            return SimpleNamespace(
+                namespaces={k: SimpleNamespace(vector_count=len(v.ids)) for k, v in self._ns.items()},
+                total_vector_count=sum(len(v.ids) for v in self._ns.values()),
+                dimension=CONFIG.embed_dim,
+            )
+
+
+class FakePinecone:
+    _indexes: Dict[str, FakeIndex] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, api_key: Optional[str] = None, **kw: Any):
+        self.api_key = api_key
+
+    def Index(self, name: str) -> FakeIndex:
+        with self._lock:
+            idx = self._indexes.get(name)
+            if idx is None:
+                idx = FakeIndex(name)
+                self._indexes[name] = idx
+            return idx
+
+    def list_indexes(self):
+        with self._lock:
+            return [SimpleNamespace(name=n) for n in self._indexes]
+
+
+# -----------------------------
+# sentence_transformers
+# -----------------------------
+class FakeSentenceTransformer:
+    def __init__(self, model_name_or_path: str = "", **kw: Any):
+        self.name = model_name_or_path
+
+    def encode(self, sentences: Any, **kw: Any) -> np.ndarray:
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        _count("st.encode")
+        _count("st.encode.inputs", len(texts))
+        _sleep(CONFIG.st_ms, "st", len(texts))
+        if not texts:
+            return np.zeros((0, CONFIG.st_dim), dtype=np.float32)
+        return np.vstack([hash_embed(t, CONFIG.st_dim) for t in texts])
+
+
+def sentence_transformers_module() -> types.ModuleType:
+    mod = types.ModuleType("sentence_transformers")
+    mod.SentenceTransformer = FakeSentenceTransformer
+    return mod
+
+
+# -----------------------------
+# 설치
+# -----------------------------
+BENCH_ENV = {
+    "OPENAI_API_KEY": "sk-bench-fake",
+    "PINECONE_API_KEY": "pc-bench-fake",
+    "RATE_LIMIT_SHARED": "0",
+    "OPENAI_RPM": str(CONFIG.rpm),
+    "OPENAI_TPM": str(CONFIG.tpm),
+    "OPENAI_EMBED_RPM": str(CONFIG.rpm),
+    "OPENAI_EMBED_TPM": str(CONFIG.tpm),
+}
+
+
+def install() -> None:
+    """
+    openai.OpenAI / pinecone.Pinecone 및 이미 import 된 crm_agent 모듈의 참조를 fake로 교체.
+    (llm._client 는 호출 시점에 `from openai import OpenAI` 하므로 openai 모듈 쪽도 교체)
+    """
+    import openai
+    import pinecone
+
+    openai.OpenAI = FakeOpenAI
+    pinecone.Pinecone = FakePinecone
+    for mod_name in ("crm_agent.rag.retriever", "crm_agent.rag.ingest"):
+        mod = sys.modules.get(mod_name)
+        if mod is None:
+            continue
+        if hasattr(mod, "OpenAI"):
+            mod.OpenAI = FakeOpenAI
+        if hasattr(mod, "Pinecone"):
+            mod.Pinecone = FakePinecone
@@ -0,0 +1,511 @@
+"""
+오프라인 end-to-end 벤치마크
+
+사용자 수(1k/100k/1M)별 SQLite fixture 위에서 fake OpenAI/Pinecone/SentenceTransformer 로
+- candidates : flow.workflow.run_until_candidates (targeting → RAG → 후보 생성 → compliance)
+- product    : product_agent.workflow.run_product_agent (audience 전체 추천 + 렌더 + send log 적재)
+- delivery   : delivery.dispatcher.dispatch (CREATED send log → fake provider 발송 → SENT)
+- schedule   : delivery.scheduler.schedule_run (채널 한도/야간 제한으로 scheduled_at 배정)
+- jjg        : JJG/rec_logic/integration.py 의 process_ai_recommendation / process_abandoned_cart /
+               process_repurchase_recommendation
+을 실행하고 latency(p50/p95/max), throughput, peak RSS 를 보고한다.
+
+사용:
+  python -m benchmarks.run
+  python -m benchmarks.run --users 1000,100000,1000000 --scenarios candidates,product,jjg --out bench.json
+  python -m benchmarks.run --llm_ms 0 --embed_ms 0 --vector_ms 0      # 순수 로컬 처리 비용만
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import threading
+import traceback
+import importlib.util
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks import ROOT, fakes
+from benchmarks.sqlite_fixture import DATA_MODES, DEFAULT_CACHE_DIR, ensure_fixture, make_engine
+
+JJG_INTEGRATION = ROOT / "JJG" / "rec_logic" / "integration.py"
+
+SCENARIOS = ("candidates", "product", "delivery", "schedule", "jjg")
+
+BRIEF = {
+    "goal": "repurchase",
+    "campaign_goal": "reorder_top",
+    "campaign_text": "겨울철 건조한 피부를 위한 보습 크림 재구매 유도, 촉촉한 데일리 루틴 제안",
+    "channel_hint": "SMS",
+    "tone_hint": "amoremall",
+}
+
+SELECTED_TEMPLATE = {
+    "template_id": "BENCH_T001",
+    "title": "bench",
+    "body_with_slots": "{customer_name}님, {product_name}\n{offer}\n{cta}",
+    "notes": {"campaign_text_normalized": {"keywords": ["보습", "크림", "건조", "데일리", "루틴"]}},
+}
+
+
+# -----------------------------
+# 측정
+# -----------------------------
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _maxrss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB / macOS: bytes
+    return int(r) if platform.system() == "Darwin" else int(r) * 1024
+
+
+class RssSampler:
+    """
+    구간 동안 RSS 최대값(/proc/self/statm 샘플링). /proc 이 없으면 프로세스 전체 ru_maxrss
+    """
+
+    def __init__(self, interval_sec: float = 0.05):
+        self.interval = interval_sec
+        self.peak = 0
+        self._stop = threading.Event()
+        self._t: Optional[threading.Thread] = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            v = _rss_bytes()
+            if v and v > self.peak:
+                self.peak = v
+
+    def __enter__(self) -> "RssSampler":
+        v = _rss_bytes()
+        if v is None:
+            return self
+        self.peak = v
+        self._t = threading.Thread(target=self._loop, daemon=True)
+        self._t.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._t is None:
+            self.peak = _maxrss_bytes() or 0
+            return
+        self._stop.set()
+        self._t.join()
+        v = _rss_bytes()
+        if v and v > self.peak:
+            self.peak = v
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak / (1024 * 1024), 1)
+
+
+def _latency_stats(lat_ms: List[float]) -> Dict[str, float]:
+    if not lat_ms:
+        return {}
+    a = np.asarray(lat_ms, dtype=float)
+    return {
+        "p50": round(float(np.percentile(a, 50)), 1),
+        "p95": round(float(np.percentile(a, 95)), 1),
+        "mean": round(float(a.mean()), 1),
+        "max": round(float(a.max()), 1),
+    }
+
+
+# -----------------------------
+# 환경 구성
+# -----------------------------
+def _bind_engine(engine) -> None:
+    """
+    이미 import 된 crm_agent 모듈들의 SessionLocal 을 fixture engine 으로 교체
+    """
+    from sqlalchemy.orm import sessionmaker
+
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    for name, mod in list(sys.modules.items()):
+        if not name.startswith("crm_agent") or mod is None:
+            continue
+        if hasattr(mod, "SessionLocal"):
+            mod.SessionLocal = factory
+        if name == "crm_agent.db.engine":
+            mod.engine = engine
+
+    from crm_agent.services.template_library import invalidate_library
+    invalidate_library()
+
+
+def _session():
+    from crm_agent.db import engine as db_engine
+    from crm_agent.db.repo import Repo
+    return Repo(db_engine.SessionLocal())
+
+
+def seed_run(audience: int, *, channel: str = "SMS", variant: int = 0) -> str:
+    """
+    app STEP1/STEP2 와 같은 모양으로 run + BRIEF / TARGET_AUDIENCE / SELECTED_TEMPLATE handoff 생성
+    """
+    from sqlalchemy import text
+
+    repo = _session()
+    try:
+        brief = {**BRIEF, "channel_hint": channel}
+        if variant:
+            brief["campaign_text"] = f"{BRIEF['campaign_text']} #{variant}"
+        run_id = repo.create_run("bench", brief, channel=brief["channel_hint"])
+        repo.create_handoff(run_id, "BRIEF", brief)
+        rows = repo.db.execute(
+            text("SELECT user_id FROM users ORDER BY user_id LIMIT :n"), {"n": int(audience)}
+        ).fetchall()
+        user_ids = [r[0] for r in rows]
+        repo.create_handoff(run_id, "TARGET_AUDIENCE", {
+            "count": len(user_ids),
+            "user_ids": user_ids,
+            "sample": [],
+            "resolved": {"concern_keywords": ["보습"], "concern_categories": [], "skin_concerns": ["hydration"]},
+        })
+        repo.create_handoff(run_id, "SELECTED_TEMPLATE", SELECTED_TEMPLATE)
+        return run_id
+    finally:
+        repo.db.close()
+
+
+def _perf_of(run_id: str) -> Dict[str, Any]:
+    repo = _session()
+    try:
+        h = repo.get_latest_handoff(run_id, "PERF")
+        p = (h or {}).get("payload_json") or {}
+        if isinstance(p, str):
+            p = json.loads(p)
+        return {"by_kind": p.get("by_kind", {}), "top_spans": (p.get("spans") or [])[:5]}
+    except Exception:
+        return {}
+    finally:
+        repo.db.close()
+
+
+def _load_jjg(engine):
+    """
+    JJG integration.py 를 fake SentenceTransformer 로 import 하고 module engine 을 fixture 로 교체
+    (import 시 MySQL engine 생성 + 모델 로드를 하므로 benchmark에서는 module 단위로 바꿔 끼움)
+    """
+    saved = sys.modules.get("sentence_transformers")
+    sys.modules["sentence_transformers"] = fakes.sentence_transformers_module()
+    try:
+        spec = importlib.util.spec_from_file_location("bench_jjg_integration", JJG_INTEGRATION)
+        mod = importlib.util.module_from_spec(spec)
+        with open(os.devnull, "w") as null, redirect_stdout(null):
+            spec.loader.exec_module(mod)
+    finally:
+        if saved is None:
+            sys.modules.pop("sentence_transformers", None)
+        else:
+            sys.modules["sentence_transformers"] = saved
+    mod.engine = engine
+    return mod
+
+
+# -----------------------------
+# 시나리오
+# -----------------------------
+def _measure(
+        name: str,
+        users: int,
+        runs: int,
+        prepare: Callable[[int], Any],
+        body: Callable[[Any], Any],
+        *,
+        units_per_run: int = 1,
+        unit: str = "runs",
+) -> Dict[str, Any]:
+    lat: List[float] = []
+    errors: List[str] = []
+    last: Any = None
+    rows_out = 0
+    fakes.reset_stats()
+    with RssSampler() as rss:
+        t_all = 0.0
+        for i in range(runs):
+            arg = prepare(i)
+            t0 = time.perf_counter()
+            try:
+                with open(os.devnull, "w") as null, redirect_stdout(null):
+                    res = body(arg)
+                if isinstance(res, list):
+                    rows_out += len(res)
+                last = arg
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}"[:300])
+            dt = time.perf_counter() - t0
+            t_all += dt
+            lat.append(dt * 1000)
+    ok = runs - len(errors)
+    throughput: Dict[str, Any] = {"runs_per_sec": round(runs / t_all, 3) if t_all else None}
+    if unit != "runs":
+        throughput[f"{unit}_per_sec"] = round(ok * units_per_run / t_all, 1) if t_all else None
+    out: Dict[str, Any] = {
+        "scenario": name,
+        "users": users,
+        "runs": runs,
+        "ok": ok,
+        "errors": errors[:3],
+        "latency_ms": _latency_stats(lat),
+        "throughput": throughput,
+        "rows_out": rows_out,
+        "peak_rss_mb": rss.peak_mb,
+        "fake_calls": fakes.stats(),
+    }
+    if isinstance(last, str):
+        out["perf"] = _perf_of(last)
+    return out
+
+
+def bench_candidates(users: int, args) -> Dict[str, Any]:
+    from crm_agent.flow.workflow import run_until_candidates
+
+    return _measure(
+        "candidates", users, args.runs,
+        prepare=lambda i: seed_run(min(users, args.audience or users), channel=args.channel, variant=i + 1),
+        body=lambda run_id: run_until_candidates(run_id, channel=args.channel, tone="amoremall", use_library=False),
+    )
+
+
+def bench_product(users: int, args) -> Dict[str, Any]:
+    from crm_agent.product_agent.sharding import run_product_agent_sharded
+
+    audience = min(users, args.audience or users)
+    name = "product" if args.workers <= 1 else f"product[w={args.workers}]"
+    if args.routing != "fixed":
+        name += f"[{args.routing}]"
+    return _measure(
+        name, users, args.flow_runs,
+        prepare=lambda i: seed_run(audience, channel=args.channel),
+        body=lambda run_id: run_product_agent_sharded(run_id, workers=args.workers, routing=args.routing),
+        units_per_run=audience, unit="users",
+    )
+
+
+def bench_delivery(users: int, args) -> Dict[str, Any]:
+    from sqlalchemy import text
+
+    from crm_agent.delivery.dispatcher import dispatch
+    from crm_agent.delivery.limits import ChannelLimit
+    from crm_agent.delivery.providers import CHANNELS, reset_providers
+    from crm_agent.product_agent.workflow import run_product_agent
+
+    audience = min(users, args.audience or users)
+    os.environ["DELIVERY_FAKE_LATENCY_MS"] = str(args.delivery_ms)
+    reset_providers()
+    limits = {ch: ChannelLimit(mps=args.delivery_mps, concurrency=args.delivery_concurrency) for ch in CHANNELS}
+
+    def _prepare(i: int) -> str:
+        # send log 생성은 측정 밖. opt-out PREVIEW 도 CREATED 로 올려 audience 전체를 발송 대상으로
+        run_id = seed_run(audience, channel=args.channel)
+        with open(os.devnull, "w") as null, redirect_stdout(null):
+            run_product_agent(run_id)
+        repo = _session()
+        try:
+            repo.db.execute(text("UPDATE campaign_send_logs SET status = 'CREATED' WHERE run_id = :r AND status = 'PREVIEW'"),
+                            {"r": run_id})
+            repo.db.commit()
+        finally:
+            repo.db.close()
+        return run_id
+
+    return _measure(
+        "delivery", users, args.flow_runs,
+        prepare=_prepare,
+        body=lambda run_id: dispatch(run_id, limits=limits, quiet="off"),  # 측정 시각과 무관하게
+        units_per_run=audience, unit="messages",
+    )
+
+
+def bench_schedule(users: int, args) -> Dict[str, Any]:
+    from datetime import datetime
+
+    from sqlalchemy import text
+
+    from crm_agent.delivery.limits import ChannelLimit, channel_limits
+    from crm_agent.delivery.providers import CHANNELS
+    from crm_agent.delivery.scheduler import schedule_run
+    from crm_agent.product_agent.workflow import run_product_agent
+
+    audience = min(users, args.audience or users)
+    limits = channel_limits()
+    if args.delivery_mps > 0:
+        limits = {ch: ChannelLimit(mps=args.delivery_mps, concurrency=args.delivery_concurrency) for ch in CHANNELS}
+    # 결과가 실행 시각에 따라 달라지지 않게 오늘 10시 기준
+    start = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0)
+
+    def _prepare(i: int) -> str:
+        run_id = seed_run(audience, channel=args.channel)
+        with open(os.devnull, "w") as null, redirect_stdout(null):
+            run_product_agent(run_id)
+        repo = _session()
+        try:
+            repo.db.execute(text("UPDATE campaign_send_logs SET status = 'CREATED' WHERE run_id = :r AND status = 'PREVIEW'"),
+                            {"r": run_id})
+            repo.db.commit()
+        finally:
+            repo.db.close()
+        return run_id
+
+    return _measure(
+        "schedule", users, args.flow_runs,
+        prepare=_prepare,
+        body=lambda run_id: schedule_run(run_id, start_at=start, limits=limits),
+        units_per_run=audience, unit="messages",
+    )
+
+
+def bench_jjg(users: int, args, engine) -> List[Dict[str, Any]]:
+    audience = min(users, args.audience or users)
+    try:
+        mod = _load_jjg(engine)
+    except Exception as e:
+        return [{"scenario": "jjg", "users": users, "runs": 0, "ok": 0,
+                 "errors": [f"import failed: {type(e).__name__}: {e}"[:300]]}]
+
+    out = []
+    for fn_name in ("process_ai_recommendation", "process_abandoned_cart", "process_repurchase_recommendation"):
+        fn = getattr(mod, fn_name)
+        out.append(_measure(
+            f"jjg.{fn_name}", users, args.flow_runs,
+            prepare=lambda i: seed_run(audience, channel=args.channel),
+            body=fn,
+            units_per_run=audience, unit="users",
+        ))
+    return out
+
+
+# -----------------------------
+# main
+# -----------------------------
+def _print_row(r: Dict[str, Any]) -> None:
+    lat = r.get("latency_ms") or {}
+    tp = r.get("throughput") or {}
+    users_ps = tp.get("users_per_sec")
+    msgs_ps = tp.get("messages_per_sec")
+    print(
+        f"{r['scenario']:<42} users={r['users']:>9,} ok={r['ok']}/{r['runs']} "
+        f"p50={lat.get('p50', '-'):>9} p95={lat.get('p95', '-'):>9} ms  "
+        f"runs/s={tp.get('runs_per_sec', '-')}"
+        + (f"  users/s={users_ps:,.0f}" if users_ps else "")
+        + (f"  messages/s={msgs_ps:,.0f}" if msgs_ps else "")
+        + f"  peak_rss={r.get('peak_rss_mb', '-')}MB"
+    )
+    for e in r.get("errors") or []:
+        print(f"    ! {e}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="offline end-to-end benchmark (fake OpenAI/Pinecone + SQLite)")
+    p.add_argument("--users", default="1000", help="쉼표 구분 사용자 수 (예: 1000,100000,1000000)")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"쉼표 구분: {','.join(SCENARIOS)}")
+    p.add_argument("--runs", type=int, default=3, help="candidates 반복 횟수")
+    p.add_argument("--flow_runs", type=int, default=1, help="product / jjg 반복 횟수(audience 크기에 비례해 무거움)")
+    p.add_argument("--workers", type=int, default=1, help="product shard process 수(peak_rss/fake_calls 는 부모 process 만)")
+    p.add_argument("--routing", choices=("fixed", "fallback"), default="fixed", help="product 사용자별 채널 routing")
+    p.add_argument("--delivery_ms", type=float, default=20.0, help="fake provider batch 호출 지연")
+    p.add_argument("--delivery_mps", type=float, default=0.0, help="채널별 messages/sec 한도(0이면 무제한)")
+    p.add_argument("--delivery_concurrency", type=int, default=16, help="채널별 동시 provider 호출 수")
+    p.add_argument("--channel", default="SMS", help="SMS / KAKAO / PUSH / EMAIL")
+    p.add_argument("--audience", type=int, default=0, help="TARGET_AUDIENCE 크기(0이면 전체 사용자)")
+    p.add_argument("--llm_ms", type=float, default=fakes.CONFIG.llm_ms)
+    p.add_argument("--embed_ms", type=float, default=fakes.CONFIG.embed_ms)
+    p.add_argument("--vector_ms", type=float, default=fakes.CONFIG.vector_ms)
+    p.add_argument("--st_ms", type=float, default=fakes.CONFIG.st_ms)
+    p.add_argument("--jitter", type=float, default=fakes.CONFIG.jitter)
+    p.add_argument("--error_rate", type=float, default=0.0, help="LLM 429 주입 비율")
+    p.add_argument("--seed", type=int, default=fakes.CONFIG.seed)
+    p.add_argument("--cache_dir", default=str(DEFAULT_CACHE_DIR), help="fixture(SQLite) 캐시 위치")
+    p.add_argument("--rebuild", action="store_true", help="fixture 다시 생성")
+    p.add_argument("--data", choices=DATA_MODES, default="synthetic",
+                   help="사용자 데이터: synthetic(분포 있는 합성) / clone(dump 복제)")
+    p.add_argument("--out", default="", help="결과 JSON 저장 경로")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    args = parse_args(argv)
+    for k, v in fakes.BENCH_ENV.items():
+        os.environ.setdefault(k, v)
+    fakes.configure(
+        llm_ms=args.llm_ms, embed_ms=args.embed_ms, vector_ms=args.vector_ms, st_ms=args.st_ms,
+        jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+    )
+    fakes.install()
+
+    # fake 설치 후 import (retriever 는 import 시점에 OpenAI/Pinecone 을 가져감)
+    import crm_agent.flow.workflow  # noqa: F401
+    import crm_agent.product_agent.workflow  # noqa: F401
+    import crm_agent.delivery.dispatcher  # noqa: F401
+    import crm_agent.delivery.scheduler  # noqa: F401
+    fakes.install()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {sorted(unknown)}")
+
+    results: List[Dict[str, Any]] = []
+    for users in [int(x) for x in args.users.split(",") if x.strip()]:
+        path = ensure_fixture(users, cache_dir=Path(args.cache_dir), rebuild=args.rebuild,
+                              data_mode=args.data, seed=args.seed, progress=lambda m: print(m, file=sys.stderr))
+        engine = make_engine(path)
+        _bind_engine(engine)
+        try:
+            for s in scenarios:
+                try:
+                    if s == "candidates":
+                        rows = [bench_candidates(users, args)]
+                    elif s == "product":
+                        rows = [bench_product(users, args)]
+                    elif s == "delivery":
+                        rows = [bench_delivery(users, args)]
+                    elif s == "schedule":
+                        rows = [bench_schedule(users, args)]
+                    else:
+                        rows = bench_jjg(users, args, engine)
+                except Exception as e:
+                    traceback.print_exc()
+                    rows = [{"scenario": s, "users": users, "runs": 0, "ok": 0,
+                             "errors": [f"{type(e).__name__}: {e}"[:300]]}]
+                for r in rows:
+                    _print_row(r)
+                results.extend(rows)
+        finally:
+            engine.dispose()
+
+    if args.out:
+        meta = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fake_config": vars(fakes.CONFIG),
+            "args": vars(args),
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2, default=str)
+        print(f"saved: {args.out}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+벤치마크용 SQLite fixture (MySQL 없이 같은 schema/seed로 실행)
+
+- db/init/fianl.sql(MySQL dump) → SQLite DDL/INDEX 로 변환, dump의 INSERT 값을 그대로 적재
+- users 기준 seed(50명)와 그 사람의 user_features / carts / cart_items / orders / order_items 를
+  id만 바꿔 N명이 될 때까지 복제
+- make_engine(): 앱이 쓰는 MySQL 전용 구문(SHOW COLUMNS, information_schema, CAST(.. AS JSON),
+  tuple/expanding IN 파라미터 등)을 SQLite 로 바꿔서 실행하는 engine
+
+사용:
+  python -m benchmarks.sqlite_fixture --users 100000
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import argparse
+import functools
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks import ROOT
+
+DUMP_SQL = ROOT / "db" / "init" / "fianl.sql"
+DEFAULT_CACHE_DIR = ROOT / "benchmarks" / ".cache"
+
+# 복제 대상: table → (정수 PK(복제본마다 offset), {FK 컬럼: 부모 table})
+# users 와 user_id 컬럼을 가진 table은 user_id 를 복제본 id로 바꿈
+_USER_TABLES: Dict[str, Tuple[Optional[str], Dict[str, str]]] = {
+    "users": (None, {}),
+    "user_features": (None, {}),
+    "carts": ("cart_id", {}),
+    "cart_items": ("cart_item_id", {"cart_id": "carts"}),
+    "orders": ("order_id", {}),
+    "order_items": ("order_item_id", {"order_id": "orders"}),
+}
+
+INSERT_CHUNK = 50_000
+
+# clone: dump 사용자 복제, synthetic: benchmarks.datagen
+DATA_MODES = ("clone", "synthetic")
+
+
+# -----------------------------
+# dump 파싱
+# -----------------------------
+@dataclass
+class TableDef:
+    name: str
+    columns: List[str] = field(default_factory=list)
+    create_sql: str = ""
+    index_sql: List[str] = field(default_factory=list)
+
+
+_CREATE_RE = re.compile(r"CREATE TABLE `(\w+)` \((.*?)\n\)[^;]*;", re.S)
+_INSERT_RE = re.compile(r"INSERT INTO `(\w+)` VALUES (.*?);\n", re.S)
+_KEY_RE = re.compile(r"^(UNIQUE KEY|KEY|FULLTEXT KEY|SPATIAL KEY) `(\w+)` \((.*)\)$")
+_COL_RE = re.compile(r"^`(\w+)` (.*)$")
+
+# 타입 앞부분만 보고 SQLite 타입으로(enum/json/set 은 TEXT affinity로 고정)
+_TEXT_TYPES = ("enum(", "set(", "json")
+_STRIP_RES = [
+    re.compile(r"\s+ON UPDATE CURRENT_TIMESTAMP(\(\d*\))?", re.I),
+    re.compile(r"\s+CHARACTER SET \w+", re.I),
+    re.compile(r"\s+COLLATE \w+", re.I),
+    re.compile(r"\s+COMMENT '(?:[^'\\]|\\.)*'", re.I),
+    re.compile(r"\s+unsigned", re.I),
+]
+
+
+def _key_cols(spec: str) -> str:
+    # `a`,`b`(100) → "a","b"
+    cols = [c.strip().strip("`").split("(")[0].strip("`") for c in spec.split(",")]
+    return ", ".join(f'"{c}"' for c in cols if c)
+
+
+def _convert_table(name: str, body: str) -> TableDef:
+    t = TableDef(name=name)
+    col_sql: List[str] = []
+    pk_line: Optional[str] = None
+    auto_pk = False
+
+    for raw in body.splitlines():
+        line = raw.strip().rstrip(",")
+        if not line:
+            continue
+        m = _COL_RE.match(line)
+        if m:
+            col, rest = m.group(1), m.group(2)
+            for rx in _STRIP_RES:
+                rest = rx.sub("", rest)
+            if rest.lower().startswith(_TEXT_TYPES):
+                rest = re.sub(r"^(enum|set)\((?:[^()']|'(?:[^'\\]|\\.)*')*\)|^json", "TEXT", rest, flags=re.I)
+            if "AUTO_INCREMENT" in rest:
+                # rowid alias 여야 AUTOINCREMENT 동작 → INTEGER PRIMARY KEY
+                auto_pk = True
+                col_sql.append(f'"{col}" INTEGER PRIMARY KEY AUTOINCREMENT')
+            else:
+                col_sql.append(f'"{col}" {rest}')
+            t.columns.append(col)
+            continue
+        if line.startswith("PRIMARY KEY"):
+            pk_line = "PRIMARY KEY (" + _key_cols(line[line.index("(") + 1: line.rindex(")")]) + ")"
+            continue
+        km = _KEY_RE.match(line)
+        if km:
+            kind, key_name, spec = km.groups()
+            if kind in ("FULLTEXT KEY", "SPATIAL KEY"):
+                continue
+            unique = "UNIQUE " if kind == "UNIQUE KEY" else ""
+            t.index_sql.append(f'CREATE {unique}INDEX IF NOT EXISTS "{name}__{key_name}" ON "{name}" ({_key_cols(spec)})')
+            continue
+        # CONSTRAINT ... FOREIGN KEY 등은 버림(벤치마크 대상 아님)
+
+    if pk_line and not auto_pk:
+        col_sql.append(pk_line)
+    t.create_sql = f'CREATE TABLE "{name}" (\n  ' + ",\n  ".join(col_sql) + "\n)"
+    return t
+
+
+_VALUE_RE = re.compile(r"""\s*(?:'((?:[^'\\]|\\.)*)'|(NULL)|(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?))\s*""", re.S)
+_ESC = {"0": "\0", "n": "\n", "r": "\r", "t": "\t", "b": "\b", "Z": "\x1a"}
+_ESC_RE = re.compile(r"\\(.)", re.S)
+
+
+def _unescape(s: str) -> str:
+    if "\\" not in s:
+        return s
+    return _ESC_RE.sub(lambda m: _ESC.get(m.group(1), m.group(1)), s)
+
+
+def iter_values(blob: str) -> Iterator[Tuple[Any, ...]]:
+    """
+    `(1,'a',NULL),(2,'b\\'c',3.5)` → tuple 들 (MySQL dump 문자열 escape 해석)
+    """
+    pos, n = 0, len(blob)
+    while pos < n:
+        while pos < n and blob[pos] in " \n\r\t,":
+            pos += 1
+        if pos >= n:
+            break
+        if blob[pos] != "(":
+            raise ValueError(f"unexpected token at {pos}: {blob[pos:pos + 30]!r}")
+        pos += 1
+        row: List[Any] = []
+        while True:
+            m = _VALUE_RE.match(blob, pos)
+            if not m:
+                raise ValueError(f"bad value at {pos}: {blob[pos:pos + 30]!r}")
+            s, null, num = m.groups()
+            if s is not None:
+                row.append(_unescape(s))
+            elif null:
+                row.append(None)
+            else:
+                row.append(float(num) if ("." in num or "e" in num.lower()) else int(num))
+            pos = m.end()
+            ch = blob[pos]
+            pos += 1
+            if ch == ",":
+                continue
+            if ch == ")":
+                break
+            raise ValueError(f"unexpected {ch!r} at {pos}")
+        yield tuple(row)
+
+
+def parse_dump(path: Path = DUMP_SQL) -> Tuple[Dict[str, TableDef], Dict[str, List[Tuple[Any, ...]]]]:
+    sql = Path(path).read_text(encoding="utf-8")
+    tables = {m.group(1): _convert_table(m.group(1), m.group(2)) for m in _CREATE_RE.finditer(sql)}
+    data: Dict[str, List[Tuple[Any, ...]]] = {}
+    for m in _INSERT_RE.finditer(sql):
+        data.setdefault(m.group(1), []).extend(iter_values(m.group(2)))
+    return tables, data
+
+
+# -----------------------------
+# 적재 / 복제
+# -----------------------------
+def _insert(con: sqlite3.Connection, table: str, ncols: int, rows: List[Tuple[Any, ...]]) -> None:
+    if rows:
+        ph = ",".join("?" * ncols)
+        con.executemany(f'INSERT INTO "{table}" VALUES ({ph})', rows)
+
+
+def _clone_user_tables(
+        con: sqlite3.Connection,
+        tables: Dict[str, TableDef],
+        data: Dict[str, List[Tuple[Any, ...]]],
+        users: int,
+        progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, int]:
+    """
+    seed 사용자 집합을 copy k 번째마다 id를 바꿔 복제(k=0 은 seed 원본).
+    user_id: u_001 → u_001_00001 / 정수 PK·FK: + k * (seed 최대 id)
+    마지막 copy 는 users 수를 맞추려고 앞쪽 사용자만 사용
+    """
+    seed_users = sorted(r[tables["users"].columns.index("user_id")] for r in data.get("users", []))
+    if not seed_users:
+        raise RuntimeError("seed users가 없습니다")
+    per = len(seed_users)
+    copies = max(1, math.ceil(users / per))
+
+    specs = {}
+    for t, (pk, fks) in _USER_TABLES.items():
+        if t not in tables:
+            continue
+        cols = tables[t].columns
+        rows = data.get(t, [])
+        pk_i = cols.index(pk) if pk else None
+        stride = {pk: max((r[pk_i] for r in rows), default=0)} if pk else {}
+        specs[t] = {
+            "cols": cols,
+            "rows": rows,
+            "uid_i": cols.index("user_id") if "user_id" in cols else None,
+            "pk_i": pk_i,
+            "fk_i": {cols.index(c): parent for c, parent in fks.items()},
+            "stride": stride.get(pk, 0),
+        }
+
+    counts = {t: 0 for t in specs}
+    pending = {t: [] for t in specs}
+    last_n = users - per * (copies - 1)
+
+    def _flush(force: bool = False) -> None:
+        for t, rows in pending.items():
+            if rows and (force or len(rows) >= INSERT_CHUNK):
+                _insert(con, t, len(specs[t]["cols"]), rows)
+                counts[t] += len(rows)
+                pending[t] = []
+
+    for k in range(copies):
+        keep = set(seed_users if k < copies - 1 else seed_users[:last_n])
+        kept_parent: Dict[str, set] = {t: set() for t in specs}
+        for t, sp in specs.items():
+            uid_i, pk_i, fk_i = sp["uid_i"], sp["pk_i"], sp["fk_i"]
+            for r in sp["rows"]:
+                if uid_i is not None and r[uid_i] not in keep:
+                    continue
+                if any(r[i] not in kept_parent[parent] for i, parent in fk_i.items()):
+                    continue
+                if pk_i is not None:
+                    kept_parent[t].add(r[pk_i])
+                if k == 0:
+                    pending[t].append(r)
+                    continue
+                row = list(r)
+                if uid_i is not None:
+                    row[uid_i] = f"{r[uid_i]}_{k:05d}"
+                if pk_i is not None:
+                    row[pk_i] = r[pk_i] + k * sp["stride"]
+                for i, parent in fk_i.items():
+                    row[i] = r[i] + k * specs[parent]["stride"]
+                pending[t].append(tuple(row))
+        _flush()
+        if progress and (k + 1) % max(1, copies // 10) == 0:
+            progress(f"  users {min(users, (k + 1) * per):,}/{users:,}")
+    _flush(force=True)
+    return counts
+
+
+def build_fixture(
+        path: Path,
+        users: int,
+        *,
+        dump: Path = DUMP_SQL,
+        data_mode: str = "clone",
+        seed: int = 42,
+        progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, int]:
+    """
+    path 에 SQLite fixture 생성(임시 파일에 만든 뒤 rename). returns: table별 row 수
+    - data_mode="clone"    : dump 의 사용자 데이터를 users 수만큼 복제
+    - data_mode="synthetic": benchmarks.datagen 으로 분포가 있는 사용자 데이터 생성
+    """
+    if data_mode not in DATA_MODES:
+        raise ValueError(f"unknown data_mode: {data_mode}")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".building")
+    if tmp.exists():
+        tmp.unlink()
+
+    tables, data = parse_dump(dump)
+    con = sqlite3.connect(str(tmp))
+    try:
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        for t in tables.values():
+            con.execute(t.create_sql)
+
+        counts: Dict[str, int] = {}
+        for name, rows in data.items():
+            if name in _USER_TABLES or name not in tables:
+                continue
+            _insert(con, name, len(tables[name].columns), rows)
+            counts[name] = len(rows)
+        if data_mode == "synthetic":
+            from benchmarks.datagen import Catalog, GenConfig, SqliteSink, write_all
+            counts.update(write_all(GenConfig(users=users, seed=seed), Catalog.from_dump(tables, data),
+                                    SqliteSink(con), progress=progress))
+        else:
+            counts.update(_clone_user_tables(con, tables, data, users, progress=progress))
+
+        # index는 적재 후에 한 번에
+        for t in tables.values():
+            for stmt in t.index_sql:
+                con.execute(stmt)
+        con.execute("CREATE TABLE bench_meta (k TEXT PRIMARY KEY, v TEXT)")
+        con.executemany("INSERT INTO bench_meta VALUES (?, ?)", [
+            ("users", str(users)),
+            ("data_mode", data_mode if data_mode == "clone" else f"{data_mode}:{seed}"),
+            ("dump_mtime", str(Path(dump).stat().st_mtime)),
+            ("counts", json.dumps(counts)),
+        ])
+        con.commit()
+        con.execute("ANALYZE")
+    finally:
+        con.close()
+    os.replace(tmp, path)
+    return counts
+
+
+def _fixture_ok(path: Path, users: int, dump: Path, mode_key: str = "clone") -> bool:
+    if not path.exists():
+        return False
+    try:
+        con = sqlite3.connect(str(path))
+        try:
+            meta = dict(con.execute("SELECT k, v FROM bench_meta").fetchall())
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return False
+    return (
+        meta.get("users") == str(users)
+        and meta.get("data_mode", "clone") == mode_key
+        and meta.get("dump_mtime") == str(Path(dump).stat().st_mtime)
+    )
+
+
+def fixture_path(users: int, cache_dir: Optional[Path] = None, data_mode: str = "clone") -> Path:
+    suffix = "" if data_mode == "clone" else f"_{data_mode}"
+    return Path(cache_dir or DEFAULT_CACHE_DIR) / f"crm_{users}{suffix}.sqlite"
+
+
+def ensure_fixture(
+        users: int,
+        *,
+        cache_dir: Optional[Path] = None,
+        rebuild: bool = False,
+        dump: Path = DUMP_SQL,
+        data_mode: str = "clone",
+        seed: int = 42,
+        progress: Optional[Callable[[str], None]] = None,
+) -> Path:
+    """
+    캐시(users 수 + data_mode/seed + dump mtime 일치)가 있으면 재사용
+    """
+    path = fixture_path(users, cache_dir, data_mode)
+    mode_key = data_mode if data_mode == "clone" else f"{data_mode}:{seed}"
+    if rebuild or not _fixture_ok(path, users, dump, mode_key):
+        t0 = time.perf_counter()
+        if progress:
+            progress(f"building fixture {path.name} ...")
+        build_fixture(path, users, dump=dump, data_mode=data_mode, seed=seed, progress=progress)
+        if progress:
+            progress(f"fixture ready ({time.perf_counter() - t0:.1f}s)")
+    return path
+
+
+# -----------------------------
+# MySQL 구문 → SQLite
+# -----------------------------
+_CURSOR_RULES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"^\s*SHOW\s+COLUMNS\s+FROM\s+`?(\w+)`?\s*$", re.I),
+     "SELECT name AS \"Field\", type AS \"Type\", "
+     "CASE \"notnull\" WHEN 1 THEN 'NO' ELSE 'YES' END AS \"Null\", "
+     "CASE pk WHEN 0 THEN '' ELSE 'PRI' END AS \"Key\", dflt_value AS \"Default\", '' AS \"Extra\" "
+     "FROM pragma_table_info('\\1')"),
+    (re.compile(r"\binformation_schema\.tables\b", re.I),
+     "(SELECT name AS table_name, 'main' AS table_schema FROM sqlite_master WHERE type = 'table')"),
+    (re.compile(r"\bDATABASE\(\)", re.I), "'main'"),
+    (re.compile(r"CAST\(\s*(\?|:\w+)\s+AS\s+JSON\s*\)", re.I), "\\1"),
+    (re.compile(r"\bNOW\(\)", re.I), "datetime('now', 'localtime')"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bGREATEST\(", re.I), "MAX("),
+    (re.compile(r"\bLEAST\(", re.I), "MIN("),
+    (re.compile(r"\bFOR\s+UPDATE(\s+SKIP\s+LOCKED)?\b", re.I), ""),
+]
+_ON_DUP_RE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_FN_RE = re.compile(r"\bVALUES\(\s*`?(\w+)`?\s*\)", re.I)
+_IN_PARAM_RE = re.compile(r"\bIN\s*:(\w+)\b", re.I)
+
+
+@functools.lru_cache(maxsize=2048)
+def rewrite_sql(statement: str) -> str:
+    out = statement
+    for rx, repl in _CURSOR_RULES:
+        out = rx.sub(repl, out)
+    m = _ON_DUP_RE.search(out)
+    if m:
+        head, tail = out[:m.start()], out[m.end():]
+        out = head + "ON CONFLICT DO UPDATE SET" + _VALUES_FN_RE.sub(r"excluded.\1", tail)
+    return out
+
+
+def _rewrite_in_params(elem, params: Dict[str, Any]):
+    """
+    `col IN :ids` + list/tuple 값 → `col IN (SELECT value FROM json_each(:ids))` + JSON 문자열.
+    MySQL 드라이버의 tuple 치환·expanding bindparam 둘 다 SQLite 변수 개수 한도(32766) 없이 동작
+    """
+    from sqlalchemy import text
+
+    names = {n for n in _IN_PARAM_RE.findall(elem.text) if isinstance(params.get(n), (list, tuple))}
+    if not names:
+        return elem, params
+
+    def _sub(m: re.Match) -> str:
+        n = m.group(1)
+        return f"IN (SELECT value FROM json_each(:{n}))" if n in names else m.group(0)
+
+    new = text(_IN_PARAM_RE.sub(_sub, elem.text))
+    keep = [bp for name, bp in elem._bindparams.items() if name not in names]
+    if keep:
+        new = new.bindparams(*keep)
+    new_params = dict(params)
+    for n in names:
+        new_params[n] = json.dumps(list(params[n]), ensure_ascii=False, default=str)
+    return new, new_params
+
+
+def make_engine(path: Path, *, echo: bool = False):
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.sql.elements import TextClause
+
+    from crm_agent.services.tracing import install_sqlalchemy
+
+    engine = create_engine(
+        f"sqlite:///{Path(path)}",
+        future=True,
+        echo=echo,
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_con, _record):
+        cur = dbapi_con.cursor()
+        cur.execute("PRAGMA journal_mode = WAL")
+        cur.execute("PRAGMA synchronous = NORMAL")
+        cur.execute("PRAGMA cache_size = -200000")
+        cur.execute("PRAGMA temp_store = MEMORY")
+        cur.close()
+
+    @event.listens_for(engine, "before_execute", retval=True)
+    def _before_execute(conn, elem, multiparams, params, execution_options):
+        if isinstance(elem, TextClause) and params and not multiparams:
+            elem, params = _rewrite_in_params(elem, params)
+        return elem, multiparams, params
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        return rewrite_sql(statement), parameters
+
+    install_sqlalchemy(engine)
+    return engine
+
+
+def main():
+    p = argparse.ArgumentParser(description="build SQLite benchmark fixture from db/init/fianl.sql")
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--cache_dir", default=str(DEFAULT_CACHE_DIR))
+    p.add_argument("--rebuild", action="store_true")
+    p.add_argument("--data", choices=DATA_MODES, default="clone")
+    p.add_argument("--seed", type=int, default=42)
+    args = p.parse_args()
+    path = ensure_fixture(args.users, cache_dir=Path(args.cache_dir), rebuild=args.rebuild,
+                          data_mode=args.data, seed=args.seed, progress=print)
+    con = sqlite3.connect(str(path))
+    try:
+        print(path)
+        print(json.loads(dict(con.execute("SELECT k, v FROM bench_meta").fetchall())["counts"]))
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -60,6 +60,7 @@ CREATE TABLE `campaign_runs` (
   `target_json` json DEFAULT NULL,
   `selected_template_id` varchar(64) DEFAULT NULL,
   `final_payload_json` json DEFAULT NULL,
+  `sent_at` datetime DEFAULT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`run_id`)
@@ -71,7 +72,7 @@ CREATE TABLE `campaign_runs` (
 --
 
 /*!40000 ALTER TABLE `campaign_runs` DISABLE KEYS */;
-INSERT INTO `campaign_runs` VALUES ('7a7dfa31-d6e0-4bcc-a363-706b0b5c901e','marketer_001','CREATED','S1_BRIEF','{\"goal\": \"1) 화장품 특징 기반 추천 CRM(자연어 입력 필요)\", \"tone_hint\": \"amoremall\", \"channel_hint\": \"PUSH\", \"campaign_goal\": \"feature_reco\", \"campaign_text\": \"겨울철 보습 루틴을 강조하면서, 기존 구매 고객의 재구매를 유도하는 캠페인. 톤은 친근하게.\"}','PUSH','amoremall',NULL,NULL,NULL,'2025-12-30 11:29:11','2025-12-30 11:29:11'),('859108a8-3f1d-4b7a-9ada-917ef6cdbba2','marketer_001','CREATED','S4_APPROVAL','{\"goal\": \"1) 화장품 특징 기반 추천 CRM(자연어 입력 필요)\", \"tone_hint\": \"amoremall\", \"channel_hint\": \"PUSH\", \"campaign_goal\": \"feature_reco\", \"campaign_text\": \"겨울철 보습 루틴을 강조하면서, 기존 구매 고객의 재구매를 유도하는 캠페인. 톤은 친근하게.\"}','PUSH','amoremall',NULL,NULL,NULL,'2025-12-28 16:40:05','2025-12-28 16:41:54'),('bb8ba0fb-45b1-41b8-8c1c-ea3ccee82be1','marketer_002','CREATED','S4_APPROVAL','{\"goal\": \"2) 장바구니 미구매 상품 CRM\", \"tone_hint\": \"amoremall\", \"channel_hint\": \"PUSH\", \"campaign_goal\": \"cart_abandon\", \"campaign_text\": \"\"}','PUSH','amoremall',NULL,NULL,NULL,'2025-12-30 15:55:16','2025-12-30 16:03:15');
+INSERT INTO `campaign_runs` VALUES ('7a7dfa31-d6e0-4bcc-a363-706b0b5c901e','marketer_001','CREATED','S1_BRIEF','{\"goal\": \"1) 화장품 특징 기반 추천 CRM(자연어 입력 필요)\", \"tone_hint\": \"amoremall\", \"channel_hint\": \"PUSH\", \"campaign_goal\": \"feature_reco\", \"campaign_text\": \"겨울철 보습 루틴을 강조하면서, 기존 구매 고객의 재구매를 유도하는 캠페인. 톤은 친근하게.\"}','PUSH','amoremall',NULL,NULL,NULL,NULL,'2025-12-30 11:29:11','2025-12-30 11:29:11'),('859108a8-3f1d-4b7a-9ada-917ef6cdbba2','marketer_001','CREATED','S4_APPROVAL','{\"goal\": \"1) 화장품 특징 기반 추천 CRM(자연어 입력 필요)\", \"tone_hint\": \"amoremall\", \"channel_hint\": \"PUSH\", \"campaign_goal\": \"feature_reco\", \"campaign_text\": \"겨울철 보습 루틴을 강조하면서, 기존 구매 고객의 재구매를 유도하는 캠페인. 톤은 친근하게.\"}','PUSH','amoremall',NULL,NULL,NULL,NULL,'2025-12-28 16:40:05','2025-12-28 16:41:54'),('bb8ba0fb-45b1-41b8-8c1c-ea3ccee82be1','marketer_002','CREATED','S4_APPROVAL','{\"goal\": \"2) 장바구니 미구매 상품 CRM\", \"tone_hint\": \"amoremall\", \"channel_hint\": \"PUSH\", \"campaign_goal\": \"cart_abandon\", \"campaign_text\": \"\"}','PUSH','amoremall',NULL,NULL,NULL,NULL,'2025-12-30 15:55:16','2025-12-30 16:03:15');
 /*!40000 ALTER TABLE `campaign_runs` ENABLE KEYS */;
 
 --
@@ -88,17 +89,21 @@ CREATE TABLE `campaign_send_logs` (
   `campaign_goal` varchar(64) NOT NULL,
   `channel` enum('SMS','KAKAO','PUSH','EMAIL') NOT NULL,
   `step_id` varchar(16) NOT NULL,
-  `candidate_id` varchar(16) DEFAULT NULL,
-  `status` enum('CREATED','SENT','FAILED','SKIPPED','PREVIEW') NOT NULL DEFAULT 'CREATED',
+  `candidate_id` varchar(16) NOT NULL DEFAULT '',
+  `status` enum('CREATED','SENDING','SENT','FAILED','SKIPPED','PREVIEW') NOT NULL DEFAULT 'CREATED',
   `rendered_text` text,
   `error_code` varchar(64) DEFAULT NULL,
   `error_message` varchar(255) DEFAULT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `sent_at` datetime DEFAULT NULL,
+  `claimed_at` datetime DEFAULT NULL,
+  `scheduled_at` datetime DEFAULT NULL,
   PRIMARY KEY (`send_log_id`),
+  UNIQUE KEY `uq_sendlogs_run_user_cand` (`run_id`,`user_id`,`candidate_id`),
   KEY `idx_runs_user_time` (`user_id`,`created_at`),
   KEY `idx_runs_campaign` (`campaign_goal`,`step_id`,`channel`),
   KEY `idx_sendlogs_run_user_time` (`run_id`,`user_id`,`created_at`),
+  KEY `idx_sendlogs_status_run_sched` (`status`,`run_id`,`scheduled_at`),
   CONSTRAINT `fk_sendlogs_run` FOREIGN KEY (`run_id`) REFERENCES `campaign_runs` (`run_id`) ON DELETE CASCADE,
   CONSTRAINT `fk_sendlogs_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
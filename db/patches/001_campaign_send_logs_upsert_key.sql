@@ -0,0 +1,21 @@
+-- 이미 떠 있는 DB(볼륨 재사용)용 패치. 새로 init 하는 경우는 fianl.sql 에 반영되어 있음
+-- campaign_send_logs: (run_id, user_id, candidate_id) unique → INSERT ... ON DUPLICATE KEY UPDATE 로 재실행
+--
+-- mysql -u <user> -p crm < db/patches/001_campaign_send_logs_upsert_key.sql
+
+UPDATE campaign_send_logs SET candidate_id = '' WHERE candidate_id IS NULL;
+
+-- 같은 key 가 여러 개면 SENT 우선, 그다음 최신 1건만 남김
+DELETE l1 FROM campaign_send_logs l1
+JOIN campaign_send_logs l2
+  ON l2.run_id = l1.run_id
+ AND l2.user_id = l1.user_id
+ AND l2.candidate_id = l1.candidate_id
+ AND (
+      (l2.status = 'SENT' AND l1.status <> 'SENT')
+   OR ((l2.status = 'SENT') = (l1.status = 'SENT') AND l2.send_log_id > l1.send_log_id)
+ );
+
+ALTER TABLE campaign_send_logs
+  MODIFY `candidate_id` varchar(16) NOT NULL DEFAULT '',
+  ADD UNIQUE KEY `uq_sendlogs_run_user_cand` (`run_id`, `user_id`, `candidate_id`);
@@ -0,0 +1,9 @@
+-- 이미 떠 있는 DB(볼륨 재사용)용 패치. 새로 init 하는 경우는 fianl.sql 에 반영되어 있음
+-- delivery dispatcher: SENDING 상태(claim 후 발송 중) + claimed_at(lease) + claim 용 index
+--
+-- mysql -u <user> -p crm < db/patches/002_campaign_send_logs_dispatch.sql
+
+ALTER TABLE campaign_send_logs
+  MODIFY `status` enum('CREATED','SENDING','SENT','FAILED','SKIPPED','PREVIEW') NOT NULL DEFAULT 'CREATED',
+  ADD COLUMN `claimed_at` datetime DEFAULT NULL AFTER `sent_at`,
+  ADD KEY `idx_sendlogs_status_run` (`status`, `run_id`);
@@ -0,0 +1,9 @@
+-- 이미 떠 있는 DB(볼륨 재사용)용 패치. 새로 init 하는 경우는 fianl.sql 에 반영되어 있음
+-- delivery scheduler: scheduled_at(이 시각 이후에만 claim) + claim index 에 scheduled_at 추가
+--
+-- mysql -u <user> -p crm < db/patches/003_campaign_send_logs_schedule.sql
+
+ALTER TABLE campaign_send_logs
+  ADD COLUMN `scheduled_at` datetime DEFAULT NULL AFTER `claimed_at`,
+  DROP KEY `idx_sendlogs_status_run`,
+  ADD KEY `idx_sendlogs_status_run_sched` (`status`, `run_id`, `scheduled_at`);
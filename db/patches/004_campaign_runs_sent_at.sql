@@ -0,0 +1,7 @@
+-- 이미 떠 있는 DB(볼륨 재사용)용 패치. 새로 init 하는 경우는 fianl.sql 에 반영되어 있음
+-- delivery dispatcher: run 의 send log 를 다 보내면 campaign_runs.status = SENT 와 함께 sent_at 기록
+--
+-- mysql -u <user> -p crm < db/patches/004_campaign_runs_sent_at.sql
+
+ALTER TABLE campaign_runs
+  ADD COLUMN `sent_at` datetime DEFAULT NULL AFTER `final_payload_json`;
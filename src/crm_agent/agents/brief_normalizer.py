@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
-import os
-import json
+from typing import Any, Dict
 import re
 
-from openai import OpenAI
+from crm_agent.agents.llm import call_structured, validate_model
+from crm_agent.agents.schemas import NormalizedBrief
+from crm_agent.services import metrics
 
 
 SYSTEM = """
@@ -42,34 +42,23 @@ Return JSON schema:
 """
 
 
-def _extract_json(text: str) -> Dict[str, Any]:
-    m = re.search(r"\{.*\}", text or "", flags=re.DOTALL)
-    if not m:
-        raise RuntimeError(f"LLM did not return JSON. RAW:\n{text[:1500]}")
-    return json.loads(m.group(0))
-
-
-def _call_openai(prompt: str) -> Dict[str, Any]:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is missing")
-
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-
-    client = OpenAI(api_key=api_key)
-    resp = client.responses.create(
-        model=model,
-        input=prompt,
+def _call_openai(system: str, user: str) -> Dict[str, Any]:
+    """
+    NormalizedBrief JSON schema로 제약된 생성. 깨진 JSON은 재호출 없이 부분 복구 후 검증.
+    """
+    out, info = call_structured(
+        system=system,
+        user=user,
+        model_cls=NormalizedBrief,
+        name="normalized_brief",
     )
+    if info.get("repaired"):
+        metrics.incr("normalize.repaired")
 
-    text = getattr(resp, "output_text", None)
-    if not text:
-        try:
-            text = json.dumps(resp.model_dump(), ensure_ascii=False)
-        except Exception:
-            text = str(resp)
-
-    return _extract_json(text)
+    m = validate_model(out, NormalizedBrief)
+    if m is None:
+        raise RuntimeError(f"normalized brief schema mismatch: {str(out)[:500]}")
+    return m.model_dump()
 
 
 def normalize_campaign_text(campaign_text: str) -> Dict[str, Any]:
@@ -92,11 +81,11 @@ def normalize_campaign_text(campaign_text: str) -> Dict[str, Any]:
             "confidence": 0.0,
         }
 
-    prompt = (SYSTEM.strip() + "\n\n" + USER_TEMPLATE.format(campaign_text=campaign_text)).strip()
-
+    metrics.incr("normalize.calls")
     try:
-        out = _call_openai(prompt)
+        out = _call_openai(SYSTEM.strip(), USER_TEMPLATE.format(campaign_text=campaign_text).strip())
     except Exception as e:
+        metrics.incr("normalize.fallback")
         # fallback: 아주 단순 키워드화(공백/특수문자 기반)
         toks = re.sub(r"[^\w가-힣\s]", " ", campaign_text)
         toks = [t for t in toks.split() if t]
@@ -3,10 +3,24 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, List
 
+from crm_agent.validators.rule_engine import FAIL, WARN, LengthRule, PhraseRule, check_batch, register_rules
+
 
 SLOT_PATTERN = re.compile(r"\{([a-zA-Z0-9_]+)\}")
 
 
+# 과장/확정 표현 (샘플) → FAIL, 너무 길면 WARN (채널별 상세 룰은 추후 강화)
+OVERCLAIM_PHRASES = ["100% 효과", "완치", "무조건"]
+MAX_BODY_LEN = 220
+
+PROFILE = "agents.candidates"
+
+register_rules(PROFILE, (
+    [PhraseRule(p, FAIL, "과장/확정 표현 가능성") for p in OVERCLAIM_PHRASES]
+    + [LengthRule({"*": MAX_BODY_LEN}, WARN, "문구가 길 수 있음(채널별 길이 가이드 확인 필요)")]
+))
+
+
 def _extract_slots(text: str) -> List[str]:
     return sorted(set(SLOT_PATTERN.findall(text or "")))
 
@@ -16,15 +30,17 @@ def validate_candidates(candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
     결과 형태:
     {
       "results": [
-        {"template_id": "...", "status": "PASS|WARN|FAIL", "reasons": [...], "found_slots":[...]}
+        {"template_id": "...", "status": "PASS|WARN|FAIL", "reasons": [...], "found_slots":[...],
+         "hits": [{"phrase", "start", "end", "severity"}]}
       ]
     }
     """
     results = []
+    bodies = [c.get("body_with_slots", "") or "" for c in candidates]
+    verdicts = check_batch(bodies, PROFILE)
 
-    for c in candidates:
+    for c, body, v in zip(candidates, bodies, verdicts):
         tid = c.get("template_id", "")
-        body = c.get("body_with_slots", "") or ""
         schema = (c.get("slot_schema") or {})
         required = schema.get("required") or []
 
@@ -39,16 +55,10 @@ def validate_candidates(candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
             status = "FAIL"
             reasons.append(f"필수 슬롯 누락: {missing}")
 
-        # 과장/확정 표현 (샘플)
-        if any(x in body for x in ["100% 효과", "완치", "무조건"]):
-            status = "FAIL"
-            reasons.append("과장/확정 표현 가능성")
-
-        # 너무 길면 WARN (채널별 상세 룰은 추후 강화)
-        if len(body) > 220:
-            if status != "FAIL":
-                status = "WARN"
-            reasons.append("문구가 길 수 있음(채널별 길이 가이드 확인 필요)")
+        # 과장/확정 표현 FAIL + 길이 WARN (rule_engine)
+        reasons.extend(v.reasons)
+        if v.status == "FAIL" or (v.status == "WARN" and status != "FAIL"):
+            status = v.status
 
         results.append(
             {
@@ -56,6 +66,10 @@ def validate_candidates(candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
                 "status": status,
                 "reasons": reasons,
                 "found_slots": found,
+                "hits": [
+                    {"phrase": h.phrase, "start": h.start, "end": h.end, "severity": h.severity}
+                    for h in v.hits if h.phrase
+                ],
             }
         )
 
@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import os
+import re
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from crm_agent.agents.schemas import strict_json_schema
+from crm_agent.services import metrics, tracing
+from crm_agent.services.rate_limit import get_gate, remaining, retry_call
+from crm_agent.services.singleflight import SingleFlight, request_key
+from crm_agent.services.tokens import count_tokens
+
+# 같은 model/schema/prompt 요청이 동시에 들어오면 1번만 호출(더블클릭, 비슷한 brief 동시 제출)
+_FLIGHT = SingleFlight("llm")
+
+# 429/5xx 재시도는 여기서(SDK 자체 재시도는 끔) → RPM/TPM bucket, 동시성 조정과 같은 곳에서 관리
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+# TPM bucket 차감용 출력 토큰 예상치(완료 후 실제 usage로 보정)
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("OPENAI_EXPECTED_OUTPUT_TOKENS", "800"))
+
+
+# -----------------------------
+# OpenAI Responses API 공용 호출 (structured output)
+# -----------------------------
+def _client():
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is missing")
+
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, max_retries=0)
+
+
+def text_format(model_cls: Type[BaseModel], name: str) -> Dict[str, Any]:
+    """
+    responses.create(text=...) 인자. 모델이 schema를 벗어난 JSON을 못 내도록 강제(strict)
+    """
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": name,
+            "schema": strict_json_schema(model_cls),
+            "strict": True,
+        }
+    }
+
+
+def usage_of(resp: Any) -> Dict[str, int]:
+    usage = getattr(resp, "usage", None)
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": int(getattr(usage, "input_tokens", 0) or 0),
+        "cached_tokens": int(getattr(details, "cached_tokens", 0) or 0),
+        "output_tokens": int(getattr(usage, "output_tokens", 0) or 0),
+    }
+
+
+def _create(client, req: Dict[str, Any], *, fmt: Optional[Dict[str, Any]], cache_key: Optional[str]):
+    """
+    returns: (response, headers)
+    구버전 SDK/모델이 text.format 또는 prompt_cache_key를 모르면 빼고 재시도.
+    deadline_scope 안이면 남은 시간을 요청 timeout으로 넘김
+    """
+    extra: Dict[str, Any] = {}
+    if fmt:
+        extra["text"] = fmt
+    if cache_key:
+        extra["prompt_cache_key"] = cache_key
+    left = remaining()
+    if left is not None:
+        extra["timeout"] = max(0.5, left)
+    raw_api = getattr(client.responses, "with_raw_response", None)
+    while True:
+        try:
+            if raw_api is not None:
+                raw = raw_api.create(**req, **extra)
+                return raw.parse(), dict(raw.headers)
+            return client.responses.create(**req, **extra), {}
+        except TypeError:
+            if "prompt_cache_key" in extra:
+                extra.pop("prompt_cache_key")
+            elif "text" in extra:
+                extra.pop("text")
+            elif "timeout" in extra:
+                extra.pop("timeout")
+            else:
+                raise
+
+
+def _send(client, req: Dict[str, Any], *, system: str, user: str,
+          fmt: Optional[Dict[str, Any]], cache_key: Optional[str]):
+    """
+    RPM/TPM bucket + 적응형 동시성(gate) 통과 후 호출, 429/5xx는 jitter backoff 재시도.
+    returns: (response, 예상 토큰)
+    """
+    gate = get_gate("openai")
+    est = count_tokens(system) + count_tokens(user) + EXPECTED_OUTPUT_TOKENS
+
+    def _on_retry(e: Exception, attempt: int, delay: float) -> None:
+        metrics.incr("ratelimit.openai.retries")
+
+    out = retry_call(
+        lambda: gate.call(
+            lambda: _create(client, req, fmt=fmt, cache_key=cache_key),
+            tokens=est,
+            headers_of_result=lambda r: r[1],
+        ),
+        max_retries=OPENAI_MAX_RETRIES,
+        base_delay=0.5,
+        max_delay=20.0,
+        on_retry=_on_retry,
+    )
+    return out[0], est
+
+
+def _settle_tokens(est: int, usage: Dict[str, Any]) -> None:
+    used = int(usage.get("input_tokens", 0) or 0) + int(usage.get("output_tokens", 0) or 0)
+    if used:
+        get_gate("openai").limiter.adjust(used - est)
+
+
+def _messages(system: str, user: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+def _output_text(resp: Any) -> str:
+    text = getattr(resp, "output_text", None)
+    if not text:
+        try:
+            text = json.dumps(resp.model_dump(), ensure_ascii=False)
+        except Exception:
+            text = str(resp)
+    return text
+
+
+# -----------------------------
+# parsing / repair
+# -----------------------------
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```\s*$", flags=re.IGNORECASE)
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    잘린/깨진 JSON을 싸게 복구(재호출 없음).
+    - 코드블록 제거, 첫 '{' 부터 사용
+    - 끝에서부터 "완결된 값" 경계(직전 ',' 또는 닫는 괄호)로 자르고 열린 괄호를 닫아봄
+    """
+    s = _FENCE_RE.sub("", (text or "").strip())
+    start = s.find("{")
+    if start < 0:
+        return None
+    s = s[start:]
+
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []   # (잘라낼 위치, 그 시점의 닫는 괄호들)
+    in_str = False
+    esc = False
+    for i, ch in enumerate(s):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                # 최상위 object가 끝남 → 그 뒤 잡음은 버림
+                try:
+                    return json.loads(s[: i + 1])
+                except ValueError:
+                    break
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch == ",":
+            cuts.append((i, "".join(reversed(stack))))
+
+    # 끝까지 왔는데 안 닫힘: 그대로 닫아보기 → 완결 경계로 후퇴
+    tail = s + ('"' if in_str else "") + "".join(reversed(stack))
+    for cand in [tail] + [s[:pos] + closers for pos, closers in reversed(cuts[-50:])]:
+        try:
+            return json.loads(cand)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_json(text: str) -> Tuple[Optional[Any], bool]:
+    """
+    returns: (obj, repaired)
+    """
+    raw = (text or "").strip()
+    try:
+        return json.loads(raw), False
+    except ValueError:
+        pass
+    m = re.search(r"\{.*\}", raw, flags=re.DOTALL)
+    if m:
+        try:
+            return json.loads(m.group(0)), False
+        except ValueError:
+            pass
+    obj = repair_json(raw)
+    return obj, obj is not None
+
+
+def validate_model(obj: Any, model_cls: Type[BaseModel]) -> Optional[BaseModel]:
+    try:
+        return model_cls.model_validate(obj)
+    except ValidationError:
+        return None
+
+
+# -----------------------------
+# calls
+# -----------------------------
+def call_structured(
+        *,
+        system: str,
+        user: str,
+        model_cls: Type[BaseModel],
+        name: str,
+        cache_key: Optional[str] = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    JSON schema로 제약된 생성 1회.
+    returns: (json obj(검증 전), info) / info: usage + latency_ms + repaired (+ coalesced)
+    파싱 불가면 RuntimeError(복구까지 실패한 경우만)
+    진행 중인 동일 요청이 있으면 새로 호출하지 않고 그 결과를 같이 받음
+    """
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    key = request_key(model, name, system, user)
+    leader = []
+
+    def _run() -> Tuple[Any, Dict[str, Any]]:
+        leader.append(True)
+        return _call_structured(model=model, system=system, user=user, model_cls=model_cls, name=name,
+                                cache_key=cache_key)
+
+    obj, info = _FLIGHT.do(key, _run)
+    if not leader:
+        info = {**info, "coalesced": True}
+    return obj, info
+
+
+def _call_structured(
+        *,
+        model: str,
+        system: str,
+        user: str,
+        model_cls: Type[BaseModel],
+        name: str,
+        cache_key: Optional[str],
+) -> Tuple[Any, Dict[str, Any]]:
+    client = _client()
+
+    t0 = time.perf_counter()
+    with tracing.span(f"llm.{name}", kind="llm", model=model) as sp:
+        resp, est = _send(
+            client,
+            dict(model=model, input=_messages(system, user)),
+            system=system,
+            user=user,
+            fmt=text_format(model_cls, name),
+            cache_key=cache_key,
+        )
+        info: Dict[str, Any] = usage_of(resp)
+        if sp is not None:
+            sp.set(**info)
+    _settle_tokens(est, info)
+    info["latency_ms"] = int((time.perf_counter() - t0) * 1000)
+
+    text = _output_text(resp)
+    obj, repaired = parse_json(text)
+    if obj is None:
+        raise RuntimeError(f"LLM did not return JSON. RAW:\n{text[:1500]}")
+    info["repaired"] = repaired
+    return obj, info
+
+
+def stream_structured(
+        *,
+        system: str,
+        user: str,
+        model_cls: Type[BaseModel],
+        name: str,
+        cache_key: Optional[str] = None,
+        usage_out: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """
+    streaming 버전. output_text delta를 그대로 흘려보냄.
+    usage_out에 usage + ttft_ms/latency_ms 기록(완료 시).
+    """
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    client = _client()
+
+    t0 = time.perf_counter()
+    # generator라 with span()으로 감싸지 않고 끝난 뒤 기록(yield 사이 caller의 span 부모가 꼬이지 않게)
+    start_ns = time.time_ns()
+    usage: Dict[str, Any] = {}
+    ttft_ms: Optional[int] = None
+    error: Optional[str] = None
+    try:
+        stream, est = _send(
+            client,
+            dict(model=model, input=_messages(system, user), stream=True),
+            system=system,
+            user=user,
+            fmt=text_format(model_cls, name),
+            cache_key=cache_key,
+        )
+        for ev in stream:
+            typ = getattr(ev, "type", "")
+            if typ == "response.output_text.delta":
+                if ttft_ms is None:
+                    ttft_ms = int((time.perf_counter() - t0) * 1000)
+                yield getattr(ev, "delta", "") or ""
+            elif typ == "response.completed":
+                usage = usage_of(getattr(ev, "response", None))
+            elif typ in ("response.failed", "response.incomplete", "error"):
+                raise RuntimeError(f"LLM stream {typ}")
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        tracing.record(
+            f"llm.{name}", "llm", start_ns, start_ns + int((time.perf_counter() - t0) * 1e9),
+            error=error, model=model, stream=True, ttft_ms=ttft_ms, **usage,
+        )
+
+    _settle_tokens(est, usage)
+    usage["ttft_ms"] = ttft_ms if ttft_ms is not None else -1
+    usage["latency_ms"] = int((time.perf_counter() - t0) * 1000)
+    if usage_out is not None:
+        usage_out.update(usage)
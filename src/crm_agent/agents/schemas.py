@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# -----------------------------
+# LLM 출력 스키마
+# - 파싱/검증은 관대하게(기본값 허용) 하고,
+# - provider에 보내는 JSON schema는 strict(모든 필드 required, 추가 필드 금지)로 변환해서 사용
+# -----------------------------
+class DefaultSlotValues(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    cta: str = "{deep_link}"
+    subject: str = ""
+
+
+class TemplateCandidateOut(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    title: str = ""
+    body_with_slots: str = ""
+    default_slot_values: DefaultSlotValues = Field(default_factory=DefaultSlotValues)
+
+
+class TemplateCandidatesOut(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    candidates: List[TemplateCandidateOut] = Field(default_factory=list)
+
+
+class NormalizedBrief(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    normalized_text: str = ""
+    keywords: List[str] = Field(default_factory=list)
+    category: str = ""
+    occasion: str = ""
+    finish_or_texture: List[str] = Field(default_factory=list)
+    mood_or_style: List[str] = Field(default_factory=list)
+    negative: List[str] = Field(default_factory=list)
+    confidence: float = 0.5
+
+
+def _strictify(node: Any) -> Any:
+    if isinstance(node, dict):
+        # "properties"/"$defs"는 이름 → schema 매핑이라 키(예: "title" 필드)를 건드리면 안 됨
+        if isinstance(node.get("title"), str):
+            node.pop("title")
+        node.pop("default", None)
+        if node.get("type") == "object" and "properties" in node:
+            node["required"] = list(node["properties"].keys())
+            node["additionalProperties"] = False
+        for key, v in node.items():
+            if key in ("properties", "$defs") and isinstance(v, dict):
+                for sub in v.values():
+                    _strictify(sub)
+            else:
+                _strictify(v)
+    elif isinstance(node, list):
+        for v in node:
+            _strictify(v)
+    return node
+
+
+def strict_json_schema(model_cls: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    structured output(strict) 규칙에 맞춘 JSON schema.
+    (모든 object: required=전체 필드, additionalProperties=false / default·title 제거)
+    """
+    return _strictify(copy.deepcopy(model_cls.model_json_schema()))
@@ -1,13 +1,25 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import os
 import json
 import re
-from difflib import SequenceMatcher
-
-from crm_agent.services.tone_guide import load_tone_guide
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from crm_agent.services.tone_guide import get_tone_guide
+from crm_agent.services.prompt_budget import PromptSection, allocate, split_rag_context
+from crm_agent.services.tokens import count_tokens
 from crm_agent.agents.brief_normalizer import normalize_campaign_text
+from crm_agent.agents.compilance import validate_candidates
+from crm_agent.agents.llm import call_structured, stream_structured, validate_model
+from crm_agent.agents.schemas import TemplateCandidateOut, TemplateCandidatesOut
+from crm_agent.services import metrics
+from crm_agent.services.rate_limit import deadline_scope
+from crm_agent.services.diversity import DEFAULT_THRESHOLD, DiversityIndex, similarity
+from crm_agent.services.template_library import TemplateLibrary
 
 
 REQUIRED_SLOTS_BY_CHANNEL = {
@@ -27,6 +39,22 @@ OPTIONAL_SLOTS = [
 
 DEFAULT_NUM_CANDIDATES = 5
 
+# prompt 전체 입력 토큰 상한(고정 지시문 + 가변 섹션)
+PROMPT_INPUT_TOKENS = int(os.getenv("PROMPT_INPUT_TOKENS", "4000"))
+
+# 생성 모드: single(5개 한 번에) / parallel(각도별 1개씩 동시 호출 + deadline)
+TEMPLATE_GEN_MODE = os.getenv("TEMPLATE_GEN_MODE", "single").strip().lower()
+TEMPLATE_GEN_DEADLINE_SEC = float(os.getenv("TEMPLATE_GEN_DEADLINE_SEC", "8"))
+
+# 내부 angle(A1~A5) → 다양성 규칙의 각도 설명
+ANGLE_GUIDES = {
+    "A1": "초간단(1~2줄)",
+    "A2": "문제-해결(고민→제안→CTA)",
+    "A3": "루틴제안(1/2 step 형태)",
+    "A4": "리마인드(다시/놓치지 않게 등 완곡)",
+    "A5": "안심/문의(문의/확인 유도)",
+}
+
 
 # -----------------------------
 # helpers
@@ -108,32 +136,167 @@ def _format_target_context(target: Optional[Dict[str, Any]]) -> str:
     return "\n".join(lines).strip()
 
 
-def _call_openai(prompt: str) -> Dict[str, Any]:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is missing")
+# prefix cache 적중 통계(프로세스 누적)
+_CACHE_STATS_LOCK = threading.Lock()
+_CACHE_STATS: Dict[str, int] = {"calls": 0, "hits": 0, "input_tokens": 0, "cached_tokens": 0}
 
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
+def _record_cache_usage(usage: Dict[str, int]) -> None:
+    with _CACHE_STATS_LOCK:
+        _CACHE_STATS["calls"] += 1
+        _CACHE_STATS["hits"] += 1 if usage.get("cached_tokens", 0) > 0 else 0
+        _CACHE_STATS["input_tokens"] += usage.get("input_tokens", 0)
+        _CACHE_STATS["cached_tokens"] += usage.get("cached_tokens", 0)
 
-    resp = client.responses.create(
-        model=model,
-        input=prompt,
+
+def prompt_cache_stats() -> Dict[str, Any]:
+    """
+    프로세스 누적 prefix cache 통계(hit_rate=캐시 토큰이 1개 이상인 호출 비율).
+    """
+    with _CACHE_STATS_LOCK:
+        st = dict(_CACHE_STATS)
+    st["hit_rate"] = round(st["hits"] / st["calls"], 4) if st["calls"] else 0.0
+    st["cached_ratio"] = round(st["cached_tokens"] / st["input_tokens"], 4) if st["input_tokens"] else 0.0
+    return st
+
+
+def _call_openai(prefix: str, suffix: str, *, cache_key: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    prefix는 system, suffix는 user 메시지로 분리해서 보냄(prefix가 같으면 provider cache 적중).
+    출력은 TemplateCandidatesOut JSON schema로 제약(strict), 깨진 JSON은 재호출 없이 부분 복구.
+    returns: (parsed_json, usage) / usage: input/cached/output tokens + latency_ms + repaired
+    """
+    out, usage = call_structured(
+        system=prefix,
+        user=suffix,
+        model_cls=TemplateCandidatesOut,
+        name="template_candidates",
+        cache_key=cache_key,
     )
+    # 동시 동일 요청에 합쳐진 호출은 provider에 간 적이 없으니 cache 통계에서 제외
+    if not usage.get("coalesced"):
+        _record_cache_usage(usage)
+    return out if isinstance(out, dict) else {}, usage
 
-    text = getattr(resp, "output_text", None)
-    if not text:
-        try:
-            text = json.dumps(resp.model_dump(), ensure_ascii=False)
-        except Exception:
-            text = str(resp)
 
-    m = re.search(r"\{.*\}", text, flags=re.DOTALL)
-    if not m:
-        raise RuntimeError(f"LLM did not return JSON. RAW:\n{text[:1500]}")
-    return json.loads(m.group(0))
+def _stream_openai(
+        prefix: str,
+        suffix: str,
+        *,
+        cache_key: Optional[str] = None,
+        usage_out: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """
+    streaming 버전(_call_openai와 같은 schema). 완료 시 usage_out에 usage/ttft 기록.
+    """
+    usage: Dict[str, Any] = {}
+    yield from stream_structured(
+        system=prefix,
+        user=suffix,
+        model_cls=TemplateCandidatesOut,
+        name="template_candidates",
+        cache_key=cache_key,
+        usage_out=usage,
+    )
+    if "input_tokens" in usage:
+        _record_cache_usage(usage)
+    if usage_out is not None:
+        usage_out.update(usage)
+
+
+def _validated_raw_candidates(out: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    candidates 원소를 하나씩 schema 검증(깨진 원소만 버리고 나머지는 살림)
+    """
+    raw = (out or {}).get("candidates", []) or []
+    if not isinstance(raw, list):
+        return []
+    ok: List[Dict[str, Any]] = []
+    for rc in raw:
+        m = validate_model(rc, TemplateCandidateOut)
+        if m is not None and m.body_with_slots.strip():
+            ok.append(m.model_dump())
+    return ok
+
+
+class _CandidateStreamParser:
+    """
+    {"candidates": [ {...}, {...} ]} 스트림에서 배열 원소 object가 닫히는 즉시 꺼냄.
+    문자열 안의 괄호/escape는 무시하고, 처리한 앞부분은 버퍼에서 버림.
+    """
+
+    _ARRAY_RE = re.compile(r'"candidates"\s*:\s*\[')
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._start = -1
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        if self._done or not delta:
+            return []
+        self._buf += delta
+        out: List[Dict[str, Any]] = []
+
+        if not self._in_array:
+            m = self._ARRAY_RE.search(self._buf)
+            if not m:
+                # 키가 delta 경계에 걸칠 수 있으니 꼬리만 남김
+                self._buf = self._buf[-32:]
+                return out
+            self._in_array = True
+            self._buf = self._buf[m.end():]
+            self._pos = 0
+
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        obj = json.loads(buf[self._start:i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        out.append(obj)
+                    buf = buf[i + 1:]
+                    i = 0
+                    self._start = -1
+                    continue
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                buf = ""
+                break
+            i += 1
+
+        self._buf = buf
+        self._pos = i
+        return out
+
+
+def _validate_one(cand: Dict[str, Any]) -> Dict[str, Any]:
+    res = (validate_candidates([cand]).get("results") or [{}])[0]
+    return res
 
 
 # -----------------------------
@@ -220,32 +383,17 @@ def _make_headline(angle: str, normalized: Dict[str, Any], campaign_goal: str) -
 # -----------------------------
 # prompt (NO variants)
 # -----------------------------
-def _build_prompt(
-        *,
-        channel: str,
-        tone_id: str,
-        tone_guide_md: str,
-        campaign_goal: str,
-        campaign_text_normalized: str,
-        rag_context: str,
-        target_context: str,
-        required_slots: List[str],
-        k: int,
-) -> str:
-    """
-    title은 "내부 태그(A1..)"가 아니라 "실제 헤드라인"으로 생성하도록 강제
-    angle은 JSON에 따로 넣지 말고, 본문 구조만 다르게 하라고 지시
-    """
-    channel_guide = {
-        "SMS": "SMS는 짧고 명확하게(가능하면 90자 내외), 수신거부 슬롯({unsubscribe})을 포함.",
-        "PUSH": "PUSH는 1~2문장 + CTA 중심으로 간결하게.",
-        "KAKAO": "KAKAO는 친근/가독성(줄바꿈) + CTA 명확.",
-        "EMAIL": "EMAIL은 body는 짧게, subject는 슬롯 템플릿 형태로 제공.",
-    }.get(channel, "")
-
-    tone_guide_block = tone_guide_md.strip() if tone_guide_md else "(없음: 기본 톤 가이드를 따르세요.)"
+# provider prefix cache(OpenAI 자동 prompt caching)는 "앞부분이 byte 단위로 같은" 요청끼리만 적중함.
+# → 브랜드별로 변하지 않는 지시문/톤 요약/스키마를 prefix(system)로 앞에 두고,
+#   run마다 바뀌는 입력(channel/goal/정규화 문구/타겟/RAG)은 suffix(user)로 뒤에 둠.
+_CHANNEL_GUIDES = {
+    "SMS": "SMS는 짧고 명확하게(가능하면 90자 내외), 수신거부 슬롯({unsubscribe})을 포함.",
+    "PUSH": "PUSH는 1~2문장 + CTA 중심으로 간결하게.",
+    "KAKAO": "KAKAO는 친근/가독성(줄바꿈) + CTA 명확.",
+    "EMAIL": "EMAIL은 body는 짧게, subject는 슬롯 템플릿 형태로 제공.",
+}
 
-    diversity_rules = """
+_DIVERSITY_RULES = """
 [다양성 규칙(매우 중요)]
 - candidates 5개는 서로 '구조/길이/줄바꿈/CTA 위치'가 확실히 달라야 한다.
 - 다섯 후보는 아래 5가지 각도를 각각 하나씩 사용하되, 각도 라벨(A1/A2...)은 title에 절대 쓰지 마라.
@@ -260,6 +408,16 @@ def _build_prompt(
 - 같은 단어/문장/패턴 반복 금지.
 """.strip()
 
+
+def _build_prompt_prefix(*, tone_id: str, tone_guide_md: str) -> str:
+    """
+    cache 가능한 고정 prefix: 핵심 원칙 + 브랜드 톤 요약 + 슬롯/채널 규칙(전 채널) + 출력 스키마.
+    같은 브랜드면 run/채널과 무관하게 항상 동일한 문자열이어야 함(가변 값 금지).
+    """
+    tone_guide_block = tone_guide_md.strip() if tone_guide_md else "(없음: 기본 톤 가이드를 따르세요.)"
+    required_lines = "\n".join(f"  - {ch}: {slots}" for ch, slots in REQUIRED_SLOTS_BY_CHANNEL.items())
+    channel_lines = "\n".join(f"- {ch}: {g}" for ch, g in _CHANNEL_GUIDES.items())
+
     return f"""
 너는 화장품/뷰티 CRM 마케터를 돕는 "Template Agent"다.
 
@@ -271,40 +429,30 @@ def _build_prompt(
    - 금지 예: "100% 효과", "완치", "기적", "즉시 변화", "놓치면 손해"
 3) 출력은 JSON만. 코드블록/설명/문장 추가 금지.
 
-[입력]
-- channel: {channel}
+[브랜드 톤 가이드(요약) - 최우선 준수]
 - tone_id(brand): {tone_id}
-- campaign_goal: {campaign_goal}
-- campaign_text (normalized):
-{campaign_text_normalized}
-
-[사용자 선택/타겟 컨텍스트 - 사용자가 고른 조건이므로 문구에 자연스럽게 반영]
-{target_context}
-
-[브랜드 톤 가이드(md) - 최우선 준수]
 {tone_guide_block}
 
-[RAG 컨텍스트(근거) - 참고만(사실 확정 금지, “스타일/규칙” 위주로 반영)]
-{rag_context}
-
 [슬롯 규칙]
-- 필수 슬롯(required): {required_slots}
+- 채널별 필수 슬롯(required):
+{required_lines}
 - 옵션 슬롯(optional): {OPTIONAL_SLOTS}
-- body_with_slots에는 “필수 슬롯 4개가 모두 등장”해야 한다:
-  {{customer_name}}, {{product_name}}, {{offer}}, {{cta}}
+- body_with_slots에는 입력 channel의 필수 슬롯이 “모두 등장”해야 한다.
 - 슬롯 표기: 반드시 {{slot_name}} 형태(중괄호 1쌍)
 - {{cta}}는 “문구”가 아니라 “사용자가 클릭할 대상(딥링크/버튼)”을 대표하는 슬롯이다.
   (예: "지금 앱에서 확인해 보세요: {{cta}}" 처럼 문장 안에 포함)
 
 [채널 가이드]
-- {channel_guide}
+{channel_lines}
 
 [반영 체크리스트(모든 candidate에 적용)]
 - (정규화 키워드/무드/제형)에서 최소 2개 이상을 “자연스럽게” 녹여라.
   예: "겨울/건조/보습/촉촉", "루틴", "재구매 리마인드", "친근하지만 과하지 않게"
 - “기존 구매 고객의 재구매 유도” 맥락이 드러나야 한다(단, 과도한 압박 금지).
+- [사용자 선택/타겟 컨텍스트]는 사용자가 고른 조건이므로 문구에 자연스럽게 반영.
+- [RAG 컨텍스트]는 참고만(사실 확정 금지, “스타일/규칙” 위주로 반영).
 
-{diversity_rules}
+{_DIVERSITY_RULES}
 
 [출력 JSON 스키마]
 {{
@@ -319,12 +467,76 @@ def _build_prompt(
     }}
   ]
 }}
+""".strip()
 
-요청: candidates를 정확히 {k}개 생성하라.
+
+def _build_prompt_suffix(
+        *,
+        channel: str,
+        campaign_goal: str,
+        campaign_text_normalized: str,
+        rag_context: str,
+        target_context: str,
+        required_slots: List[str],
+        k: int,
+        angle: str = "",
+) -> str:
+    """
+    run마다 바뀌는 입력만 모은 suffix.
+    angle을 주면 해당 각도 1개만 만들도록 지시(병렬 per-angle 생성용)
+    """
+    angle_line = ""
+    if angle in ANGLE_GUIDES:
+        angle_line = f"\n이번 요청은 다양성 규칙의 각도 중 '{ANGLE_GUIDES[angle]}' 하나만 사용하라(title에 각도 라벨 금지)."
+    return f"""
+[입력]
+- channel: {channel}
+- required_slots: {required_slots}
+- campaign_goal: {campaign_goal}
+- campaign_text (normalized):
+{campaign_text_normalized}
+
+[사용자 선택/타겟 컨텍스트]
+{target_context}
+
+[RAG 컨텍스트(근거)]
+{rag_context}
+
+요청: candidates를 정확히 {k}개 생성하라.{angle_line}
 반드시 JSON만 출력.
 """.strip()
 
 
+def _build_prompt(
+        *,
+        channel: str,
+        tone_id: str,
+        tone_guide_md: str,
+        campaign_goal: str,
+        campaign_text_normalized: str,
+        rag_context: str,
+        target_context: str,
+        required_slots: List[str],
+        k: int,
+) -> Tuple[str, str]:
+    """
+    returns: (prefix, suffix)
+    title은 "내부 태그(A1..)"가 아니라 "실제 헤드라인"으로 생성하도록 강제
+    angle은 JSON에 따로 넣지 말고, 본문 구조만 다르게 하라고 지시
+    """
+    prefix = _build_prompt_prefix(tone_id=tone_id, tone_guide_md=tone_guide_md)
+    suffix = _build_prompt_suffix(
+        channel=channel,
+        campaign_goal=campaign_goal,
+        campaign_text_normalized=campaign_text_normalized,
+        rag_context=rag_context,
+        target_context=target_context,
+        required_slots=required_slots,
+        k=k,
+    )
+    return prefix, suffix
+
+
 # -----------------------------
 # diversity postprocess
 # -----------------------------
@@ -333,7 +545,7 @@ def _similarity(a: str, b: str) -> float:
     b = (b or "").strip()
     if not a or not b:
         return 0.0
-    return SequenceMatcher(None, a, b).ratio()
+    return similarity(a, b)
 
 
 def _diversify_body_by_angle(*, angle: str, channel: str) -> str:
@@ -386,6 +598,58 @@ def _diversify_body_by_angle(*, angle: str, channel: str) -> str:
     return b.strip()
 
 
+def _postprocess_one(
+        c: Dict[str, Any],
+        i: int,
+        seen: DiversityIndex,
+        *,
+        channel: str,
+        required: List[str],
+        normalized: Dict[str, Any],
+        campaign_goal: str,
+        similarity_threshold: float = DEFAULT_THRESHOLD,
+        history: Optional[DiversityIndex] = None,
+) -> Dict[str, Any]:
+    """
+    후보 1개 보정(앞서 확정된 후보 seen, 선택적으로 과거 템플릿 history와 비교)
+    → streaming에서도 도착 순서대로 적용 가능. 확정된 body는 seen에 추가됨
+    """
+    angles = ["A1", "A2", "A3", "A4", "A5"]
+    angle = angles[i % len(angles)]
+
+    # 1) title 보정: A1_... 같은 게 들어오면 제거하고 헤드라인 재생성
+    title = (c.get("title") or "").strip()
+    if not title or _is_angle_title(title):
+        title = _clean_title(title)
+        # 제거했는데도 비었거나 너무 애매하면 자동 생성
+        if not title or len(title) < 4:
+            title = _make_headline(angle=angle, normalized=normalized, campaign_goal=campaign_goal)
+    # 너무 길면 컷
+    if len(title) > 18:
+        title = title[:18].rstrip()
+    c["title"] = title
+
+    # 2) body 다양성 보정
+    body = (c.get("body_with_slots") or "").strip()
+    sim = seen.max_similarity(body)[0] if body else 0.0
+    if history is not None and len(history) and body:
+        sim = max(sim, history.max_similarity(body)[0])
+    if sim >= similarity_threshold:
+        body = _diversify_body_by_angle(angle=angle, channel=channel)
+
+    body_fixed, missing = _ensure_required_slots_in_text(body, required)
+    c["body_with_slots"] = body_fixed
+    c.setdefault("notes", {})
+    c["notes"]["missing_slots_fixed"] = missing
+    # 내부 angle을 notes에만 남겨 디버깅/분석 가능
+    c["notes"]["angle"] = angle
+
+    # variants 키가 있으면 제거
+    c.pop("variants", None)
+    seen.add(body_fixed, key=c.get("template_id"))
+    return c
+
+
 def _postprocess_diversity(
         *,
         candidates: List[Dict[str, Any]],
@@ -393,48 +657,28 @@ def _postprocess_diversity(
         required: List[str],
         normalized: Dict[str, Any],
         campaign_goal: str,
-        similarity_threshold: float = 0.86,
+        similarity_threshold: float = DEFAULT_THRESHOLD,
+        history: Optional[DiversityIndex] = None,
 ) -> List[Dict[str, Any]]:
     """
     title은 헤드라인으로 유지/보정
     다양성 angle은 "index 기반"으로 내부에서만 적용 (title에 의존 X)
+    유사도: 문자 3-gram MinHash 추정 Jaccard(history를 주면 과거 템플릿과도 비교)
     """
-    angles = ["A1", "A2", "A3", "A4", "A5"]
-
+    seen = DiversityIndex(capacity=max(8, len(candidates)))
     fixed: List[Dict[str, Any]] = []
     for i, c in enumerate(candidates):
-        angle = angles[i % len(angles)]
-
-        # 1) title 보정: A1_... 같은 게 들어오면 제거하고 헤드라인 재생성
-        title = (c.get("title") or "").strip()
-        if not title or _is_angle_title(title):
-            title = _clean_title(title)
-            # 제거했는데도 비었거나 너무 애매하면 자동 생성
-            if not title or len(title) < 4:
-                title = _make_headline(angle=angle, normalized=normalized, campaign_goal=campaign_goal)
-        # 너무 길면 컷
-        if len(title) > 18:
-            title = title[:18].rstrip()
-        c["title"] = title
-
-        # 2) body 다양성 보정
-        body = (c.get("body_with_slots") or "").strip()
-        too_similar = any(_similarity(body, prev.get("body_with_slots", "")) >= similarity_threshold for prev in fixed)
-        if too_similar:
-            body = _diversify_body_by_angle(angle=angle, channel=channel)
-
-        body_fixed, missing = _ensure_required_slots_in_text(body, required)
-        c["body_with_slots"] = body_fixed
-        c.setdefault("notes", {})
-        c["notes"]["missing_slots_fixed"] = missing
-        # 내부 angle을 notes에만 남겨 디버깅/분석 가능
-        c["notes"]["angle"] = angle
-
-        # variants 키가 있으면 제거
-        c.pop("variants", None)
-
-        fixed.append(c)
-
+        fixed.append(_postprocess_one(
+            c,
+            i,
+            seen,
+            channel=channel,
+            required=required,
+            normalized=normalized,
+            campaign_goal=campaign_goal,
+            similarity_threshold=similarity_threshold,
+            history=history,
+        ))
     return fixed
 
 
@@ -487,128 +731,486 @@ def _fallback_candidates(*, channel: str, tone_id: str, required: List[str], nor
     return {"candidates": cands}
 
 
+# -----------------------------
+# prompt budget
+# -----------------------------
+def _budget_prompt_sections(
+        *,
+        prompt_kwargs: Dict[str, Any],
+        normalized_prompt_text: str,
+        target_context_text: str,
+        rag_context: str,
+        budget_tokens: Optional[int] = None,
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    고정 지시문(prefix + suffix 골격) 토큰을 뺀 나머지 budget을 우선순위대로 배분.
+    brief(정규화) > 타겟 > RAG 근거(점수 낮은 chunk부터 통째로 drop)
+    톤 요약은 cache prefix에 들어가므로 자르지 않고 고정 비용으로 취급.
+    """
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    budget_tokens = int(budget_tokens or PROMPT_INPUT_TOKENS)
+    prefix, skeleton = _build_prompt(
+        **prompt_kwargs,
+        campaign_text_normalized="",
+        rag_context="",
+        target_context="",
+    )
+    prefix_tokens = count_tokens(prefix, model)
+    fixed = prefix_tokens + count_tokens(skeleton, model)
+
+    texts, report = allocate(
+        [
+            PromptSection("campaign_text_normalized", 0, text=normalized_prompt_text),
+            PromptSection("target_context", 1, text=target_context_text),
+            PromptSection("rag_context", 2, chunks=split_rag_context(rag_context)),
+        ],
+        budget=budget_tokens - fixed,
+        model=model,
+    )
+    report["prefix"] = prefix_tokens
+    report["fixed"] = fixed
+    report["total"] = fixed + report["used"]
+    if report["over_budget"]:
+        # 고정 지시문만으로 PROMPT_INPUT_TOKENS 초과 → 가변 섹션은 전부 빠짐
+        metrics.incr("template.prompt_over_budget")
+    return texts, report
+
+
 # -----------------------------
 # main entry
 # -----------------------------
-def generate_template_candidates(
+def _prepare_generation(
         *,
         brief: dict,
         channel: str,
         tone: str,
         rag_context: str,
-        target: Optional[Dict[str, Any]] = None,
-        k: int = DEFAULT_NUM_CANDIDATES,
+        target: Optional[Dict[str, Any]],
+        k: int,
+        normalized: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
-    후보는 5개(k=5)
-    title은 실제 헤드라인(발송 제목)로 생성/보정
-    내부 angle은 notes에만 보관(다양성 유지용)
+    일반/streaming 생성이 공유하는 입력 정리(정규화 LLM 호출 포함, prompt는 아직 안 만듦)
+    normalized: 이미 정규화한 brief가 있으면 재사용(배치 실행에서 같은 campaign_text 공유)
     """
     channel = _normalize_channel(channel)
-    required = REQUIRED_SLOTS_BY_CHANNEL[channel]
-
     tone_id = (tone or "amoremall").strip().lower()
-    tone_guide_md = load_tone_guide(tone_id)
+    # md 원문 대신 파싱해 둔 요약(digest)만 prompt에 넣음
+    tone_guide = get_tone_guide(tone_id)
 
     raw_campaign_text = (brief or {}).get("campaign_text", "").strip()
     campaign_goal = (brief or {}).get("goal", "").strip() or (brief or {}).get("campaign_goal", "").strip()
 
-    rag_context = (rag_context or "").strip()[:2500]
-
-    normalized = normalize_campaign_text(raw_campaign_text)
-    normalized_prompt_text = _format_normalized_campaign_text(normalized, raw_campaign_text)
+    if normalized is None:
+        normalized = normalize_campaign_text(raw_campaign_text)
     target_context_text = _format_target_context(target)
 
-    notes_common = {
+    return {
+        "channel": channel,
+        "required": REQUIRED_SLOTS_BY_CHANNEL[channel],
+        "tone_id": tone_id,
+        "tone_guide_md": tone_guide.digest if tone_guide else "",
         "campaign_goal": campaign_goal,
-        "brand_tone_id": tone_id,
-        "principle": "Template agent must not decide product/offer. Keep as slots.",
-        "campaign_text_normalized": normalized,
-        "target_context": target_context_text,
+        "normalized": normalized,
+        "normalized_prompt_text": _format_normalized_campaign_text(normalized, raw_campaign_text),
+        "target_context_text": target_context_text,
+        "rag_context": (rag_context or "").strip(),
+        "k": k,
+        "notes_common": {
+            "campaign_goal": campaign_goal,
+            "brand_tone_id": tone_id,
+            "tone_guide_tokens": tone_guide.digest_tokens if tone_guide else 0,
+            "principle": "Template agent must not decide product/offer. Keep as slots.",
+            "campaign_text_normalized": normalized,
+            "target_context": target_context_text,
+        },
     }
 
-    try:
-        max_k = max(1, min(int(k), DEFAULT_NUM_CANDIDATES))
 
-        prompt = _build_prompt(
-            channel=channel,
-            tone_id=tone_id,
-            tone_guide_md=tone_guide_md,
-            campaign_goal=campaign_goal,
-            campaign_text_normalized=normalized_prompt_text,
-            rag_context=rag_context,
-            target_context=target_context_text,
-            required_slots=required,
-            k=max_k,
+def _prepare_prompt(ctx: Dict[str, Any]) -> Tuple[str, str, str]:
+    """
+    budget 배분 후 (prefix, suffix, cache_key). ctx["max_k"], notes_common["prompt_budget"] 채움.
+    """
+    ctx["max_k"] = max(1, min(int(ctx["k"]), DEFAULT_NUM_CANDIDATES))
+
+    prompt_kwargs = dict(
+        channel=ctx["channel"],
+        tone_id=ctx["tone_id"],
+        campaign_goal=ctx["campaign_goal"],
+        required_slots=ctx["required"],
+        k=ctx["max_k"],
+        tone_guide_md=ctx["tone_guide_md"],
+    )
+    sections, budget_report = _budget_prompt_sections(
+        prompt_kwargs=prompt_kwargs,
+        normalized_prompt_text=ctx["normalized_prompt_text"],
+        target_context_text=ctx["target_context_text"],
+        rag_context=ctx["rag_context"],
+    )
+    ctx["notes_common"]["prompt_budget"] = budget_report
+
+    ctx["prompt_kwargs"] = prompt_kwargs
+    ctx["sections"] = sections
+
+    prefix, suffix = _build_prompt(**prompt_kwargs, **sections)
+    prefix_hash = hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
+    ctx["notes_common"]["prompt_cache"] = {"prefix_hash": prefix_hash, "prefix_tokens": budget_report.get("prefix", 0)}
+    return prefix, suffix, f"template:{ctx['tone_id']}:{prefix_hash}"
+
+
+def _make_candidate(rc: Dict[str, Any], idx: int, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    LLM raw candidate 1개 → 표준 candidate(필수 슬롯 보정 포함)
+    """
+    channel = ctx["channel"]
+    required = ctx["required"]
+
+    title = (rc.get("title") or "").strip()
+    body = (rc.get("body_with_slots") or "").strip()
+
+    body_fixed, missing = _ensure_required_slots_in_text(body, required)
+
+    dsv = rc.get("default_slot_values") if isinstance(rc.get("default_slot_values"), dict) else {}
+    dsv = dsv or {}
+    dsv.setdefault("cta", "{deep_link}")
+    if channel == "EMAIL":
+        dsv.setdefault("subject", "{campaign_goal} 안내 | {product_name} {offer}")
+    else:
+        dsv.setdefault("subject", "")
+
+    cand = {
+        "template_id": f"T{idx:03d}",
+        "title": title,
+        "slot_schema": {"required": required, "optional": OPTIONAL_SLOTS},
+        "body_with_slots": body_fixed,
+        "channel": channel,
+        "tone": ctx["tone_id"],
+        "notes": {**ctx["notes_common"], "missing_slots_fixed": missing, "fallback": False},
+        "default_slot_values": dsv,
+    }
+
+    # 혹시 LLM이 variants를 끼워 넣어도 제거
+    cand.pop("variants", None)
+    return cand
+
+
+def _fallback_for(ctx: Dict[str, Any], llm_error: str) -> Dict[str, Any]:
+    fb = _fallback_candidates(
+        channel=ctx["channel"],
+        tone_id=ctx["tone_id"],
+        required=ctx["required"],
+        normalized=ctx["normalized"],
+        campaign_goal=ctx["campaign_goal"],
+    )
+    for c in fb["candidates"]:
+        c.setdefault("notes", {})
+        c["notes"].update({**ctx["notes_common"], "llm_error": llm_error})
+    return fb
+
+
+def _generate_parallel(ctx: Dict[str, Any], deadline_sec: float) -> List[Dict[str, Any]]:
+    """
+    각도(A1~A5)별로 후보 1개씩 동시에 생성. 공통 prefix는 그대로라 cache도 공유.
+    deadline이 지나면 남은 호출은 버리고(결과 미사용) 빈 자리는 같은 각도의 fallback으로 채움.
+    """
+    prefix, _, cache_key = _prepare_prompt(ctx)
+    max_k = ctx["max_k"]
+    angles = list(ANGLE_GUIDES.keys())[:max_k]
+    kw = ctx["prompt_kwargs"]
+    sections = ctx["sections"]
+
+    def _one(angle: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        suffix = _build_prompt_suffix(
+            channel=kw["channel"],
+            campaign_goal=kw["campaign_goal"],
+            campaign_text_normalized=sections["campaign_text_normalized"],
+            rag_context=sections["rag_context"],
+            target_context=sections["target_context"],
+            required_slots=kw["required_slots"],
+            k=1,
+            angle=angle,
         )
+        out, usage = _call_openai(prefix, suffix, cache_key=cache_key)
+        raw = _validated_raw_candidates(out)
+        return (raw[0] if raw else None), usage
+
+    ex = ThreadPoolExecutor(max_workers=len(angles), thread_name_prefix="tmpl-angle")
+    # deadline을 각 호출까지 전파(rate limit 대기/재시도/HTTP timeout이 deadline을 넘지 않게)
+    with deadline_scope(deadline_sec):
+        futures = {ex.submit(contextvars.copy_context().run, _one, a): i for i, a in enumerate(angles)}
+    done, pending = wait(futures, timeout=max(0.1, deadline_sec))
+    # 실행 중인 HTTP 호출은 중단 불가 → 기다리지 않고 결과만 버림
+    ex.shutdown(wait=False, cancel_futures=True)
+
+    raw_by_idx: Dict[int, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    usages: List[Dict[str, Any]] = []
+    for f in done:
+        i = futures[f]
+        try:
+            rc, usage = f.result()
+        except Exception as e:
+            errors[angles[i]] = repr(e)
+            continue
+        usages.append(usage)
+        if rc is None:
+            errors[angles[i]] = "empty_candidate"
+        else:
+            raw_by_idx[i] = rc
+    for f in pending:
+        errors[angles[futures[f]]] = "deadline"
+
+    metrics.incr("template.angle_calls", len(angles))
+    metrics.incr("template.angle_timeouts", len(pending))
+    metrics.incr("template.angle_errors", len(errors) - len(pending))
+
+    ctx["notes_common"]["prompt_cache"].update({
+        "input_tokens": sum(u.get("input_tokens", 0) for u in usages),
+        "cached_tokens": sum(u.get("cached_tokens", 0) for u in usages),
+        "output_tokens": sum(u.get("output_tokens", 0) for u in usages),
+        "latency_ms": max([u.get("latency_ms", 0) for u in usages] or [0]),
+    })
+    ctx["notes_common"]["generation"] = {
+        "mode": "parallel",
+        "deadline_sec": deadline_sec,
+        "completed": len(raw_by_idx),
+        "errors": errors,
+    }
 
-        out = _call_openai(prompt)
-
-        raw_cands = (out or {}).get("candidates", []) or []
-        if not isinstance(raw_cands, list) or len(raw_cands) < 1:
-            fb = _fallback_candidates(
-                channel=channel,
-                tone_id=tone_id,
-                required=required,
-                normalized=normalized,
-                campaign_goal=campaign_goal,
-            )
-            for c in fb["candidates"]:
-                c.setdefault("notes", {})
-                c["notes"].update({**notes_common, "llm_error": "empty_candidates"})
-            return fb
-
-        final: List[Dict[str, Any]] = []
-        for idx, rc in enumerate(raw_cands[:max_k], start=1):
-            title = (rc.get("title") or "").strip()
-            body = (rc.get("body_with_slots") or "").strip()
-
-            body_fixed, missing = _ensure_required_slots_in_text(body, required)
-
-            dsv = rc.get("default_slot_values") if isinstance(rc.get("default_slot_values"), dict) else {}
-            dsv = dsv or {}
-            dsv.setdefault("cta", "{deep_link}")
-            if channel == "EMAIL":
-                dsv.setdefault("subject", "{campaign_goal} 안내 | {product_name} {offer}")
-            else:
-                dsv.setdefault("subject", "")
-
-            cand = {
-                "template_id": f"T{idx:03d}",
-                "title": title,
-                "slot_schema": {"required": required, "optional": OPTIONAL_SLOTS},
-                "body_with_slots": body_fixed,
-                "channel": channel,
-                "tone": tone_id,
-                "notes": {**notes_common, "missing_slots_fixed": missing, "fallback": False},
-                "default_slot_values": dsv,
-            }
+    fb = _fallback_for(ctx, "angle_gap")["candidates"]
+    seen = DiversityIndex()
+    final: List[Dict[str, Any]] = []
+    for i in range(len(angles)):
+        if i in raw_by_idx:
+            cand = _make_candidate(raw_by_idx[i], i + 1, ctx)
+        else:
+            cand = fb[i]
+            cand["notes"]["llm_error"] = errors.get(angles[i], "angle_gap")
+        final.append(_postprocess_one(
+            cand,
+            i,
+            seen,
+            channel=ctx["channel"],
+            required=ctx["required"],
+            normalized=ctx["normalized"],
+            campaign_goal=ctx["campaign_goal"],
+            history=ctx.get("history"),
+        ))
+    return final
+
+
+def _library_candidates(ctx: Dict[str, Any], library: Optional[TemplateLibrary], total_k: int) -> List[Dict[str, Any]]:
+    """
+    승인 템플릿 라이브러리에서 거의 같은 brief의 템플릿을 찾아 후보로 (LLM 호출 없음)
+    """
+    if library is None or not len(library):
+        return []
+    hits = library.lookup(
+        channel=ctx["channel"],
+        tone=ctx["tone_id"],
+        campaign_goal=ctx["campaign_goal"],
+        normalized=ctx["normalized"],
+        target_context=ctx["target_context_text"],
+        k=total_k,
+    )
+    if not hits:
+        metrics.incr("template.library_miss")
+        return []
+
+    metrics.incr("template.library_hit")
+    cached = library.candidates_for(hits)
+    for i, c in enumerate(cached, start=1):
+        c["template_id"] = f"T{i:03d}"
+        c["channel"] = ctx["channel"]
+        c["tone"] = ctx["tone_id"]
+        c["slot_schema"] = {"required": ctx["required"], "optional": OPTIONAL_SLOTS}
+        c["body_with_slots"], missing = _ensure_required_slots_in_text(c.get("body_with_slots", ""), ctx["required"])
+        c["notes"]["missing_slots_fixed"] = missing
+
+    # 새로 만들 후보는 재사용 후보와도 달라야 함
+    history = DiversityIndex()
+    for c in cached:
+        history.add(c["body_with_slots"], key=c["template_id"])
+    ctx["history"] = history
+    return cached
+
+
+def _generate(ctx: Dict[str, Any], mode: Optional[str], deadline_sec: Optional[float]) -> Dict[str, Any]:
+    mode = (mode or TEMPLATE_GEN_MODE or "single").strip().lower()
+    if mode == "parallel":
+        try:
+            final = _generate_parallel(ctx, float(deadline_sec or TEMPLATE_GEN_DEADLINE_SEC))
+        except Exception as e:
+            metrics.incr("template.fallback")
+            return _fallback_for(ctx, repr(e))
+        if all(c["notes"].get("fallback") for c in final):
+            metrics.incr("template.fallback")
+        elif any(c["notes"].get("fallback") for c in final):
+            metrics.incr("template.partial_fallback")
+        return {"candidates": final}
+
+    try:
+        prefix, suffix, cache_key = _prepare_prompt(ctx)
+
+        out, usage = _call_openai(prefix, suffix, cache_key=cache_key)
+        ctx["notes_common"]["prompt_cache"].update(usage)
+        if usage.get("repaired"):
+            metrics.incr("template.repaired")
 
-            # 혹시 LLM이 variants를 끼워 넣어도 제거
-            cand.pop("variants", None)
-            final.append(cand)
+        raw_cands = _validated_raw_candidates(out)
+        if not raw_cands:
+            metrics.incr("template.fallback")
+            return _fallback_for(ctx, "empty_candidates")
+
+        final = [_make_candidate(rc, idx, ctx) for idx, rc in enumerate(raw_cands[:ctx["max_k"]], start=1)]
 
         # title 헤드라인 보정 + 다양성 후처리
         final = _postprocess_diversity(
             candidates=final,
-            channel=channel,
-            required=required,
-            normalized=normalized,
-            campaign_goal=campaign_goal,
-            similarity_threshold=0.86,
+            channel=ctx["channel"],
+            required=ctx["required"],
+            normalized=ctx["normalized"],
+            campaign_goal=ctx["campaign_goal"],
+            history=ctx.get("history"),
         )
 
-        return {"candidates": final[:max_k]}
+        # 일부만 살아남았으면 LLM 재호출 대신 모자란 자리만 fallback으로 채움
+        if len(final) < ctx["max_k"]:
+            metrics.incr("template.partial_fallback")
+            fb = _fallback_for(ctx, "short_candidates")["candidates"]
+            for c in fb[len(final):ctx["max_k"]]:
+                c["template_id"] = f"T{len(final) + 1:03d}"
+                final.append(c)
+
+        return {"candidates": final[:ctx["max_k"]]}
 
     except Exception as e:
-        fb = _fallback_candidates(
-            channel=channel,
-            tone_id=tone_id,
-            required=required,
-            normalized=normalized,
-            campaign_goal=campaign_goal,
+        metrics.incr("template.fallback")
+        return _fallback_for(ctx, repr(e))
+
+
+def generate_template_candidates(
+        *,
+        brief: dict,
+        channel: str,
+        tone: str,
+        rag_context: str,
+        target: Optional[Dict[str, Any]] = None,
+        k: int = DEFAULT_NUM_CANDIDATES,
+        mode: Optional[str] = None,
+        deadline_sec: Optional[float] = None,
+        library: Optional[TemplateLibrary] = None,
+        library_top_up: bool = True,
+        normalized: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    후보는 5개(k=5)
+    title은 실제 헤드라인(발송 제목)로 생성/보정
+    내부 angle은 notes에만 보관(다양성 유지용)
+    mode="parallel"(또는 env TEMPLATE_GEN_MODE): 각도별 동시 생성 + deadline 후 fallback으로 채움
+    library: 거의 같은 brief의 승인 템플릿이 있으면 그대로 후보로 사용,
+             모자란 수만큼만 새로 생성(library_top_up=False면 재사용 후보만 반환)
+    normalized: 미리 정규화한 brief(없으면 내부에서 normalize_campaign_text 호출)
+    """
+    ctx = _prepare_generation(
+        brief=brief, channel=channel, tone=tone, rag_context=rag_context, target=target, k=k, normalized=normalized
+    )
+    metrics.incr("template.calls")
+
+    total_k = max(1, min(int(k), DEFAULT_NUM_CANDIDATES))
+    cached = _library_candidates(ctx, library, total_k)
+    if cached and (len(cached) >= total_k or not library_top_up):
+        return {"candidates": cached[:total_k]}
+    if cached:
+        ctx["k"] = total_k - len(cached)
+
+    # fallback 은 ctx["k"]와 무관하게 5개를 주므로 모자란 수만큼만
+    fresh = _generate(ctx, mode, deadline_sec)["candidates"][:total_k - len(cached)]
+    for i, c in enumerate(fresh, start=len(cached) + 1):
+        c["template_id"] = f"T{i:03d}"
+    return {"candidates": cached + fresh}
+
+
+def stream_template_candidates(
+        *,
+        brief: dict,
+        channel: str,
+        tone: str,
+        rag_context: str,
+        target: Optional[Dict[str, Any]] = None,
+        k: int = DEFAULT_NUM_CANDIDATES,
+        library: Optional[TemplateLibrary] = None,
+        library_top_up: bool = True,
+        normalized: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    streaming 버전. 후보 object가 닫히는 즉시 보정(필수 슬롯/헤드라인/다양성) + compliance 후 yield.
+    events:
+      {"type": "candidate", "index": i, "candidate": {...}, "compliance": {...}}
+      {"type": "done", "candidates": [...], "compliance": {"results": [...]}}
+    라이브러리 재사용 후보가 있으면 먼저 즉시 내보내고 나머지만 생성.
+    스트림이 중간에 끊기면 남은 자리는 fallback 후보로 채움(notes.llm_error).
+    """
+    ctx = _prepare_generation(
+        brief=brief, channel=channel, tone=tone, rag_context=rag_context, target=target, k=k, normalized=normalized
+    )
+
+    final: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+    seen = DiversityIndex()
+
+    def _record(cand: Dict[str, Any]) -> Dict[str, Any]:
+        comp = _validate_one(cand)
+        final.append(cand)
+        results.append(comp)
+        return {"type": "candidate", "index": len(final) - 1, "candidate": cand, "compliance": comp}
+
+    def _emit(cand: Dict[str, Any]) -> Dict[str, Any]:
+        cand = _postprocess_one(
+            cand,
+            len(final),
+            seen,
+            channel=ctx["channel"],
+            required=ctx["required"],
+            normalized=ctx["normalized"],
+            campaign_goal=ctx["campaign_goal"],
+            history=ctx.get("history"),
         )
-        for c in fb["candidates"]:
-            c.setdefault("notes", {})
-            c["notes"].update({**notes_common, "llm_error": repr(e)})
-        return fb
+        return _record(cand)
+
+    metrics.incr("template.calls")
+    total_k = max(1, min(int(k), DEFAULT_NUM_CANDIDATES))
+
+    cached = _library_candidates(ctx, library, total_k)
+    for c in cached[:total_k]:
+        yield _record(c)
+    if cached and (len(cached) >= total_k or not library_top_up):
+        yield {"type": "done", "candidates": final, "compliance": {"results": results}}
+        return
+    if cached:
+        ctx["k"] = total_k - len(cached)
+
+    llm_error = ""
+    try:
+        prefix, suffix, cache_key = _prepare_prompt(ctx)
+        parser = _CandidateStreamParser()
+        usage: Dict[str, Any] = {}
+        for delta in _stream_openai(prefix, suffix, cache_key=cache_key, usage_out=usage):
+            for rc in _validated_raw_candidates({"candidates": parser.feed(delta)}):
+                if len(final) >= total_k:
+                    break
+                yield _emit(_make_candidate(rc, len(final) + 1, ctx))
+        ctx["notes_common"]["prompt_cache"].update(usage)
+        if len(final) == len(cached):
+            llm_error = "empty_candidates"
+    except Exception as e:
+        llm_error = repr(e)
+
+    if len(final) < total_k:
+        metrics.incr("template.fallback" if len(final) == len(cached) else "template.partial_fallback")
+        fb = _fallback_for(ctx, llm_error or "short_candidates")["candidates"]
+        for c in fb[len(final) - len(cached):total_k - len(cached)]:
+            c["template_id"] = f"T{len(final) + 1:03d}"
+            yield _emit(c)
+
+    yield {"type": "done", "candidates": final, "compliance": {"results": results}}
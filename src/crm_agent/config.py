@@ -13,6 +13,8 @@ class Settings:
     mysql_user: str = os.getenv("MYSQL_USER", "crm_user")
     mysql_password: str = os.getenv("MYSQL_PASSWORD", "crm_pass123!")
     mysql_db: str = os.getenv("MYSQL_DB", "crm")
+    # LOAD DATA LOCAL INFILE 허용(send log bulk 적재용). 서버 local_infile=ON 도 필요
+    mysql_local_infile: bool = os.getenv("MYSQL_LOCAL_INFILE", "0").strip() in ("1", "true", "True")
 
     # --- OpenAI ---
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
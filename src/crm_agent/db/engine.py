@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from crm_agent.config import settings
+from crm_agent.services.tracing import install_sqlalchemy
 
 def mysql_url() -> str:
     return (
@@ -9,5 +10,12 @@ def mysql_url() -> str:
         f"?charset=utf8mb4"
     )
 
-engine = create_engine(mysql_url(), pool_pre_ping=True, future=True)
+engine = create_engine(
+    mysql_url(),
+    pool_pre_ping=True,
+    future=True,
+    connect_args={"local_infile": True} if settings.mysql_local_infile else {},
+)
+# 활성 trace(run)가 있을 때만 execute마다 db span 기록
+install_sqlalchemy(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
@@ -371,6 +371,27 @@ class Repo:
             out.append({**dict(r), "payload_json": payload})
         return out
 
+    def list_handoffs_by_stage(self, run_id: str, stage: str) -> List[dict]:
+        rows = self.db.execute(
+            text(
+                """
+                SELECT handoff_id, run_id, stage, payload_json, payload_version, created_at
+                FROM handoffs
+                WHERE run_id = :run_id AND stage = :stage
+                ORDER BY created_at ASC
+                """
+            ),
+            {"run_id": run_id, "stage": stage},
+        ).mappings().all()
+
+        out = []
+        for r in rows:
+            payload = r["payload_json"]
+            if isinstance(payload, str):
+                payload = json.loads(payload)
+            out.append({**dict(r), "payload_json": payload})
+        return out
+
     # approvals -> handoff로 저장
     def add_approval(self, run_id: str, marketer_id: str, decision: str, comment: str = "") -> str:
         payload = {
@@ -402,6 +423,63 @@ class Repo:
             out.append({**dict(r), "payload_json": payload})
         return out
 
+    def list_approved_templates(self, limit_n: int = 2000) -> List[dict]:
+        """
+        최신 APPROVAL이 APPROVED 인 run의 최신 SELECTED_TEMPLATE (최근 승인 순)
+        반환: [{"run_id", "channel", "tone", "approved_at", "template": {...}}, ...]
+        """
+        rows = self.db.execute(
+            text(
+                """
+                WITH last_appr AS (
+                  SELECT run_id, MAX(created_at) AS max_at
+                  FROM handoffs
+                  WHERE stage = 'APPROVAL'
+                  GROUP BY run_id
+                ),
+                last_sel AS (
+                  SELECT run_id, MAX(created_at) AS max_at
+                  FROM handoffs
+                  WHERE stage = 'SELECTED_TEMPLATE'
+                  GROUP BY run_id
+                )
+                SELECT r.run_id, r.channel, r.tone, a.payload_json AS approval_json,
+                       s.payload_json AS template_json, a.created_at AS approved_at
+                FROM last_appr la
+                JOIN handoffs a
+                  ON a.run_id = la.run_id AND a.stage = 'APPROVAL' AND a.created_at = la.max_at
+                JOIN last_sel ls
+                  ON ls.run_id = la.run_id
+                JOIN handoffs s
+                  ON s.run_id = ls.run_id AND s.stage = 'SELECTED_TEMPLATE' AND s.created_at = ls.max_at
+                JOIN campaign_runs r
+                  ON r.run_id = la.run_id
+                ORDER BY a.created_at DESC
+                LIMIT :limit_n
+                """
+            ),
+            {"limit_n": int(limit_n)},
+        ).mappings().all()
+
+        out = []
+        for r in rows:
+            appr = r["approval_json"]
+            if isinstance(appr, str):
+                appr = json.loads(appr)
+            if ((appr or {}).get("decision") or "").strip().upper() != "APPROVED":
+                continue
+            tpl = r["template_json"]
+            if isinstance(tpl, str):
+                tpl = json.loads(tpl)
+            out.append({
+                "run_id": r["run_id"],
+                "channel": r["channel"],
+                "tone": r["tone"],
+                "approved_at": r["approved_at"],
+                "template": tpl or {},
+            })
+        return out
+
 
     # crm_agent/db/repo.py (class Repo 내부에 추가)
 
@@ -0,0 +1,3 @@
+from .providers import CHANNELS, FakeProvider, Provider, SendRequest, SendResult, get_provider, register_provider
+from .dispatcher import Dispatcher, dispatch, dispatch_async
+from .scheduler import plan_schedule, schedule_run
@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text, bindparam
+
+from crm_agent.db.engine import SessionLocal
+from crm_agent.db.repo import Repo
+from crm_agent.delivery.limits import ChannelLimit, SlidingWindow, channel_limits
+from crm_agent.delivery.providers import ADDRESS_COLUMN, Provider, SendRequest, SendResult, get_provider
+from crm_agent.delivery.scheduler import next_open, quiet_hours
+from crm_agent.services import metrics, tracing
+
+# -----------------------------
+# CREATED send log → 채널 provider 발송 → SENT / FAILED
+# - claim : CREATED 를 batch 로 FOR UPDATE SKIP LOCKED → SENDING(claimed_at) 으로 바꾸고 commit
+#           (dispatcher 여러 개가 떠도 같은 row 를 안 가져감. 죽은 dispatcher 의 SENDING 은 lease 지나면 회수)
+#           scheduler 가 scheduled_at 을 정해둔 row 는 그 시각이 지난 것만. follow=True 면 다음 slot 까지 기다렸다 이어감
+#           야간 광고 전송 제한(quiet hours) 동안은 scheduled_at 과 상관없이 아무것도 claim 하지 않음
+# - send  : 채널별 Semaphore(동시 요청) + SlidingWindow(messages/sec) 안에서 provider.send_batch
+# - update: 결과를 모아 SENT / FAILED(error_code 별) 를 IN (...) UPDATE 로 한 번에
+# -----------------------------
+DELIVERY_CLAIM_BATCH = int(os.getenv("DELIVERY_CLAIM_BATCH", "2000"))
+DELIVERY_FLUSH_ROWS = int(os.getenv("DELIVERY_FLUSH_ROWS", "2000"))
+DELIVERY_MAX_INFLIGHT = int(os.getenv("DELIVERY_MAX_INFLIGHT", "64"))  # 동시에 떠 있는 provider 호출 수(전체)
+DELIVERY_LEASE_SEC = float(os.getenv("DELIVERY_LEASE_SEC", "600"))
+DELIVERY_FOLLOW_MAX_SLEEP = float(os.getenv("DELIVERY_FOLLOW_MAX_SLEEP", "30"))
+
+_UPDATE_CHUNK = 1000
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _chunks(xs: List[Any], n: int):
+    for i in range(0, len(xs), n):
+        yield xs[i:i + n]
+
+
+class Dispatcher:
+    def __init__(
+            self,
+            *,
+            run_id: Optional[str] = None,
+            channels: Optional[List[str]] = None,
+            claim_batch: int = DELIVERY_CLAIM_BATCH,
+            flush_rows: int = DELIVERY_FLUSH_ROWS,
+            max_inflight: int = DELIVERY_MAX_INFLIGHT,
+            limits: Optional[Dict[str, ChannelLimit]] = None,
+            providers: Optional[Dict[str, Provider]] = None,
+            quiet: Optional[str] = None,
+    ):
+        self.run_id = run_id
+        self.channels = [c.upper() for c in channels] if channels else None
+        self.claim_batch = max(1, int(claim_batch))
+        self.flush_rows = max(1, int(flush_rows))
+        self.max_inflight = max(1, int(max_inflight))
+        self.limits = limits or channel_limits()
+        self.quiet = quiet_hours(quiet)
+        self._providers = dict(providers or {})
+        self._sem: Dict[str, asyncio.Semaphore] = {}
+        self._rl: Dict[str, SlidingWindow] = {}
+        self._results: List[SendResult] = []
+        self.stats: Dict[str, Any] = {"claimed": 0, "sent": 0, "failed": 0, "calls": 0, "by_channel": {}}
+
+    # -----------------------------
+    # DB (sync, to_thread 로 호출)
+    # -----------------------------
+    def _scope_sql(self) -> Tuple[str, Dict[str, Any]]:
+        where = ""
+        params: Dict[str, Any] = {}
+        if self.run_id:
+            where += " AND l.run_id = :run_id"
+            params["run_id"] = self.run_id
+        if self.channels:
+            where += " AND l.channel IN :channels"
+            params["channels"] = self.channels
+        return where, params
+
+    def _bind(self, sql: str, params: Dict[str, Any]):
+        q = text(sql)
+        for name in ("ids", "channels"):
+            if name in params:
+                q = q.bindparams(bindparam(name, expanding=True))
+        return q
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        now = datetime.now()
+        if next_open(now, self.quiet) > now:
+            return []
+        where, params = self._scope_sql()
+        db = SessionLocal()
+        try:
+            ids = [r[0] for r in db.execute(self._bind(
+                f"""
+                SELECT l.send_log_id
+                FROM campaign_send_logs l
+                WHERE l.status = 'CREATED'{where}
+                  AND (l.scheduled_at IS NULL OR l.scheduled_at <= :now)
+                ORDER BY l.send_log_id
+                LIMIT :n
+                FOR UPDATE SKIP LOCKED
+                """, params), {**params, "n": int(limit), "now": _now()}).all()]
+            if not ids:
+                db.commit()
+                return []
+            db.execute(
+                self._bind(
+                    "UPDATE campaign_send_logs SET status = 'SENDING', claimed_at = :now WHERE send_log_id IN :ids",
+                    {"ids": ids}),
+                {"ids": ids, "now": _now()},
+            )
+            cols = ", ".join(f"u.{c}" for c in sorted(set(ADDRESS_COLUMN.values())))
+            rows = db.execute(self._bind(
+                f"""
+                SELECT l.send_log_id, l.user_id, l.channel, l.rendered_text, {cols}
+                FROM campaign_send_logs l
+                LEFT JOIN users u ON u.user_id = l.user_id
+                WHERE l.send_log_id IN :ids
+                """, {"ids": ids}), {"ids": ids}).mappings().all()
+            db.commit()
+            return [dict(r) for r in rows]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def reclaim_stale(self, lease_sec: float = DELIVERY_LEASE_SEC) -> int:
+        """
+        claimed_at 이 lease 보다 오래된 SENDING(발송 중 죽은 dispatcher) → CREATED
+        """
+        where, params = self._scope_sql()
+        cutoff = (datetime.now() - timedelta(seconds=lease_sec)).strftime("%Y-%m-%d %H:%M:%S")
+        db = SessionLocal()
+        try:
+            res = db.execute(self._bind(
+                f"""
+                UPDATE campaign_send_logs AS l
+                SET status = 'CREATED', claimed_at = NULL
+                WHERE l.status = 'SENDING' AND l.claimed_at < :cutoff{where}
+                """, params), {**params, "cutoff": cutoff})
+            db.commit()
+            return int(res.rowcount or 0)
+        finally:
+            db.close()
+
+    def write_results(self, results: List[SendResult]) -> None:
+        if not results:
+            return
+        now = _now()
+        ok_ids = [r.send_log_id for r in results if r.ok]
+        failed: Dict[Tuple[str, str], List[int]] = {}
+        for r in results:
+            if not r.ok:
+                key = ((r.error_code or "SEND_FAILED")[:64], (r.error_message or "")[:255])
+                failed.setdefault(key, []).append(r.send_log_id)
+
+        db = SessionLocal()
+        try:
+            for ids in _chunks(ok_ids, _UPDATE_CHUNK):
+                db.execute(self._bind(
+                    """
+                    UPDATE campaign_send_logs
+                    SET status = 'SENT', sent_at = :now, error_code = NULL, error_message = NULL
+                    WHERE send_log_id IN :ids AND status = 'SENDING'
+                    """, {"ids": ids}), {"ids": ids, "now": now})
+            for (code, msg), all_ids in failed.items():
+                for ids in _chunks(all_ids, _UPDATE_CHUNK):
+                    db.execute(self._bind(
+                        """
+                        UPDATE campaign_send_logs
+                        SET status = 'FAILED', error_code = :code, error_message = :msg
+                        WHERE send_log_id IN :ids AND status = 'SENDING'
+                        """, {"ids": ids}), {"ids": ids, "code": code, "msg": msg})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def remaining(self) -> int:
+        where, params = self._scope_sql()
+        db = SessionLocal()
+        try:
+            return int(db.execute(self._bind(
+                f"SELECT COUNT(*) FROM campaign_send_logs l WHERE l.status IN ('CREATED', 'SENDING'){where}",
+                params), params).scalar() or 0)
+        finally:
+            db.close()
+
+    def next_due(self) -> Optional[float]:
+        """
+        남은 CREATED 중 가장 이른 발송 가능 시각(scheduled_at, 없으면 지금 → quiet hours 면 끝나는 시각)까지
+        남은 초(CREATED 가 없으면 None)
+        """
+        where, params = self._scope_sql()
+        now = datetime.now().replace(microsecond=0)
+        db = SessionLocal()
+        try:
+            v = db.execute(self._bind(
+                f"SELECT MIN(COALESCE(l.scheduled_at, :now)) FROM campaign_send_logs l WHERE l.status = 'CREATED'{where}",
+                params), {**params, "now": now.strftime("%Y-%m-%d %H:%M:%S")}).scalar()
+        finally:
+            db.close()
+        if v is None:
+            return None
+        if isinstance(v, str):
+            v = datetime.strptime(v[:19], "%Y-%m-%d %H:%M:%S")
+        return max(0.0, (next_open(max(v, now), self.quiet) - datetime.now()).total_seconds())
+
+    # -----------------------------
+    # send
+    # -----------------------------
+    def _provider(self, channel: str) -> Provider:
+        p = self._providers.get(channel)
+        if p is None:
+            p = get_provider(channel)
+            self._providers[channel] = p
+        return p
+
+    def _limit(self, channel: str) -> Tuple[asyncio.Semaphore, Optional[SlidingWindow]]:
+        sem = self._sem.get(channel)
+        if sem is None:
+            lim = self.limits.get(channel) or ChannelLimit(mps=0, concurrency=4)
+            sem = self._sem[channel] = asyncio.Semaphore(lim.concurrency)
+            if lim.mps > 0:
+                self._rl[channel] = SlidingWindow(lim.mps)
+        return sem, self._rl.get(channel)
+
+    async def _send(self, channel: str, reqs: List[SendRequest]) -> List[SendResult]:
+        sem, rl = self._limit(channel)
+        async with sem:
+            if rl is not None:
+                while True:
+                    wait = rl.try_acquire(len(reqs))
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(min(wait, 1.0))
+            provider = self._provider(channel)
+            t0 = time.time_ns()
+            err = None
+            try:
+                results = await provider.send_batch(reqs)
+                if len(results) != len(reqs):
+                    raise RuntimeError(f"provider returned {len(results)} results for {len(reqs)} requests")
+            except Exception as e:
+                err = f"{type(e).__name__}: {e}"[:255]
+                results = [SendResult(r.send_log_id, False, error_code="PROVIDER_ERROR", error_message=err) for r in reqs]
+            tracing.record(f"deliver.{channel}", "delivery", t0, time.time_ns(), error=err, messages=len(reqs))
+            self.stats["calls"] += 1
+            return results
+
+    def _requests(self, rows: List[Dict[str, Any]]) -> Tuple[Dict[str, List[SendRequest]], List[SendResult]]:
+        by_ch: Dict[str, List[SendRequest]] = {}
+        rejected: List[SendResult] = []
+        for r in rows:
+            ch = str(r.get("channel") or "").upper()
+            col = ADDRESS_COLUMN.get(ch)
+            addr = r.get(col) if col else None
+            if not addr:
+                rejected.append(SendResult(int(r["send_log_id"]), False, error_code="NO_ADDRESS",
+                                           error_message=f"user has no {col or 'address'} for {ch}"))
+                continue
+            by_ch.setdefault(ch, []).append(SendRequest(
+                send_log_id=int(r["send_log_id"]),
+                user_id=str(r["user_id"]),
+                channel=ch,
+                address=str(addr),
+                text=r.get("rendered_text") or "",
+            ))
+        return by_ch, rejected
+
+    def _collect(self, results: List[SendResult], channel: Optional[str] = None) -> None:
+        self._results.extend(results)
+        ok = sum(1 for r in results if r.ok)
+        self.stats["sent"] += ok
+        self.stats["failed"] += len(results) - ok
+        if channel:
+            c = self.stats["by_channel"].setdefault(channel, {"sent": 0, "failed": 0})
+            c["sent"] += ok
+            c["failed"] += len(results) - ok
+
+    async def _flush(self, force: bool = False) -> None:
+        if self._results and (force or len(self._results) >= self.flush_rows):
+            batch, self._results = self._results, []
+            await asyncio.to_thread(self.write_results, batch)
+
+    async def run(self, max_messages: Optional[int] = None, follow: bool = False) -> Dict[str, Any]:
+        """
+        지금 보낼 수 있는 CREATED 가 없을 때까지(또는 max_messages 까지) claim → send → 상태 반영.
+        follow=True 면 예약(scheduled_at)된 CREATED 가 남아있는 동안 다음 시각까지 기다렸다 계속
+        """
+        t0 = time.perf_counter()
+        await asyncio.to_thread(self.reclaim_stale)
+        pending: Set[asyncio.Task] = set()
+
+        async def _drain(until: int) -> None:
+            nonlocal pending
+            while len(pending) > until:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    ch, res = t.result()
+                    self._collect(res, ch)
+                await self._flush()
+
+        async def _task(ch: str, reqs: List[SendRequest]):
+            return ch, await self._send(ch, reqs)
+
+        while max_messages is None or self.stats["claimed"] < max_messages:
+            n = self.claim_batch if max_messages is None else min(self.claim_batch, max_messages - self.stats["claimed"])
+            rows = await asyncio.to_thread(self.claim, n)
+            if not rows:
+                wait = await asyncio.to_thread(self.next_due) if follow else None
+                if wait is None:
+                    break
+                # 기다리는 동안 이미 보낸 것들은 마무리해서 반영
+                await _drain(0)
+                await self._flush(force=True)
+                await asyncio.sleep(min(max(wait, 0.05), DELIVERY_FOLLOW_MAX_SLEEP))
+                continue
+            self.stats["claimed"] += len(rows)
+            by_ch, rejected = self._requests(rows)
+            self._collect(rejected)
+            for ch, reqs in by_ch.items():
+                size = max(1, int(getattr(self._provider(ch), "max_batch", 1)))
+                for part in (reqs[i:i + size] for i in range(0, len(reqs), size)):
+                    pending.add(asyncio.create_task(_task(ch, part)))
+                    if len(pending) >= self.max_inflight:
+                        await _drain(self.max_inflight - 1)
+
+        await _drain(0)
+        await self._flush(force=True)
+
+        elapsed = time.perf_counter() - t0
+        self.stats["elapsed_sec"] = round(elapsed, 3)
+        self.stats["messages_per_sec"] = round((self.stats["sent"] + self.stats["failed"]) / elapsed, 1) if elapsed > 0 else None
+        metrics.incr("delivery.sent", self.stats["sent"])
+        metrics.incr("delivery.failed", self.stats["failed"])
+        return self.stats
+
+
+async def dispatch_async(
+        run_id: Optional[str] = None, max_messages: Optional[int] = None, follow: bool = False, **kw: Any,
+) -> Dict[str, Any]:
+    return await Dispatcher(run_id=run_id, **kw).run(max_messages=max_messages, follow=follow)
+
+
+def dispatch(
+        run_id: Optional[str] = None, max_messages: Optional[int] = None, follow: bool = False, **kw: Any,
+) -> Dict[str, Any]:
+    """
+    sync 진입점. run_id 가 있으면 그 run 의 CREATED 만, 다 보내면 campaign_runs 상태도 SENT(sent_at) 로
+    run 상태 반영 결과는 stats["run_status"], 실패하면 stats["run_status_error"]
+    """
+    tr = None
+    try:
+        with tracing.trace(run_id or "delivery", "delivery.dispatch") as tr:
+            stats = asyncio.run(dispatch_async(run_id, max_messages=max_messages, follow=follow, **kw))
+        if run_id and stats["claimed"]:
+            if Dispatcher(run_id=run_id).remaining() == 0:
+                repo = Repo(SessionLocal())
+                try:
+                    repo.update_run(run_id, status="SENT", sent_at=_now())
+                    stats["run_status"] = "SENT"
+                except Exception as e:
+                    repo.db.rollback()
+                    metrics.incr("delivery.run_update_failed")
+                    stats["run_status_error"] = f"{type(e).__name__}: {e}"[:500]
+                finally:
+                    repo.db.close()
+        return stats
+    finally:
+        if tr is not None and run_id:
+            repo = Repo(SessionLocal())
+            try:
+                tracing.save_perf(repo, tr)
+            finally:
+                repo.db.close()
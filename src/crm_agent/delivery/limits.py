@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Tuple
+
+from crm_agent.delivery.providers import CHANNELS
+
+# 채널별 벤더 처리량 기본값 (messages/sec, 동시 요청 수). 계약 한도에 맞춰 env 로 덮어씀
+#   DELIVERY_SMS_MPS=200 DELIVERY_SMS_CONCURRENCY=16 ...
+_DEFAULTS = {
+    "SMS": (100.0, 8),
+    "KAKAO": (300.0, 16),
+    "PUSH": (1000.0, 32),
+    "EMAIL": (50.0, 8),
+}
+
+
+@dataclass(frozen=True)
+class ChannelLimit:
+    mps: float          # <= 0 이면 제한 없음
+    concurrency: int
+
+
+def channel_limits() -> Dict[str, ChannelLimit]:
+    out = {}
+    for ch in CHANNELS:
+        mps, conc = _DEFAULTS[ch]
+        out[ch] = ChannelLimit(
+            mps=float(os.getenv(f"DELIVERY_{ch}_MPS", str(mps))),
+            concurrency=max(1, int(os.getenv(f"DELIVERY_{ch}_CONCURRENCY", str(conc)))),
+        )
+    return out
+
+
+class SlidingWindow:
+    """
+    최근 window 초 동안 보낸 수가 rate * window 를 넘지 않게. token bucket 은 처음(또는 쉬고 난 뒤) 가득 찬
+    bucket + 그 1초 동안 채워지는 양이 같이 나가서 1초 구간에 최대 2배까지 나감 → 벤더 초당 한도에는 이걸 씀
+    (services.rate_limit.RateLimiter 는 분 단위라 1분치가 몰려 나갈 수 있음)
+    """
+
+    def __init__(self, rate: float, window: float = 1.0):
+        self.window = float(window)
+        self.limit = float(rate) * self.window
+        self._log: Deque[Tuple[float, int]] = deque()   # (보낸 시각, 개수)
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, n: int = 1) -> float:
+        """
+        통과하면 0.0(기록), 아니면 기다려야 할 초
+        """
+        with self._lock:
+            now = time.monotonic()
+            log = self._log
+            while log and log[0][0] <= now - self.window:
+                self._used -= log.popleft()[1]
+            # batch 가 한도보다 크면 window 가 비었을 때 통과(영원히 대기 방지)
+            if self._used and self._used + n > self.limit:
+                # 앞에서부터 만료돼야 할 양만큼 지나갈 때까지
+                free = self._used + min(float(n), self.limit) - self.limit
+                for ts, k in log:
+                    free -= k
+                    if free <= 0:
+                        break
+                return max(ts + self.window - now, 1e-3)
+            log.append((now, int(n)))
+            self._used += int(n)
+            return 0.0
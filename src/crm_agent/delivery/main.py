@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import argparse
+import json
+from datetime import datetime
+
+from crm_agent.delivery.dispatcher import DELIVERY_CLAIM_BATCH, dispatch
+from crm_agent.delivery.scheduler import schedule_run
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--run_id", default=None, help="없으면 전체 run 의 CREATED")
+    p.add_argument("--channels", default="", help="쉼표 구분 (예: SMS,KAKAO). 없으면 전체 채널")
+    p.add_argument("--claim_batch", type=int, default=DELIVERY_CLAIM_BATCH)
+    p.add_argument("--max_messages", type=int, default=None)
+    p.add_argument("--schedule", action="store_true", help="발송 전에 run 의 CREATED 에 scheduled_at 배정(--run_id 필요)")
+    p.add_argument("--start_at", default=None, help="schedule 시작 시각 'YYYY-MM-DD HH:MM:SS' (기본 지금)")
+    p.add_argument("--quiet_hours", default=None, help="발송 금지 시간 (기본 21-8, off 면 없음)")
+    p.add_argument("--follow", action="store_true", help="예약된 CREATED(또는 quiet hours 에 걸린 것)가 남아있으면 시각이 될 때까지 기다렸다 발송")
+    args = p.parse_args()
+
+    channels = [c.strip() for c in args.channels.split(",") if c.strip()] or None
+    if args.schedule:
+        if not args.run_id:
+            p.error("--schedule 은 --run_id 가 필요")
+        start = datetime.strptime(args.start_at, "%Y-%m-%d %H:%M:%S") if args.start_at else None
+        plan = schedule_run(args.run_id, start_at=start, channels=channels, quiet=args.quiet_hours)
+        print(json.dumps(plan, ensure_ascii=False, indent=2))
+    stats = dispatch(args.run_id, channels=channels, claim_batch=args.claim_batch,
+                     max_messages=args.max_messages, follow=args.follow, quiet=args.quiet_hours)
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+import zlib
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# -----------------------------
+# 채널별 발송 provider adapter
+# - Provider.send_batch(reqs) 를 async 로 구현하면 dispatcher 가 채널 semaphore/rate limit 안에서 호출
+# - 실제 벤더(SMS 대행사, 카카오 알림톡, FCM/APNs, SES 등)는 Provider 를 상속해서 register_provider()
+# - FakeProvider: 지연/실패율만 흉내내는 로컬 provider (offline throughput 측정용)
+# -----------------------------
+CHANNELS = ("SMS", "KAKAO", "PUSH", "EMAIL")
+
+# 채널별 수신 주소 컬럼(users)
+ADDRESS_COLUMN = {
+    "SMS": "phone_e164",
+    "KAKAO": "kakao_user_key",
+    "PUSH": "push_token",
+    "EMAIL": "email",
+}
+
+
+@dataclass
+class SendRequest:
+    send_log_id: int
+    user_id: str
+    channel: str
+    address: str
+    text: str
+
+
+@dataclass
+class SendResult:
+    send_log_id: int
+    ok: bool
+    provider_message_id: Optional[str] = None
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+
+
+class Provider:
+    """
+    한 번 호출에 max_batch 건까지 받는 발송 adapter.
+    send_batch 는 요청 순서와 같은 길이의 SendResult 를 돌려줘야 하고, 예외는 batch 전체 실패로 처리됨
+    """
+
+    name = "base"
+    max_batch = 1
+
+    async def send(self, req: SendRequest) -> SendResult:
+        raise NotImplementedError
+
+    async def send_batch(self, reqs: List[SendRequest]) -> List[SendResult]:
+        return list(await asyncio.gather(*(self.send(r) for r in reqs)))
+
+    async def aclose(self) -> None:
+        return None
+
+
+class FakeProvider(Provider):
+    """
+    latency_ms: batch 한 번 호출 지연, error_rate: 건별 실패 비율(send_log_id 기준으로 결정적)
+    """
+
+    name = "fake"
+
+    def __init__(self, channel: str, *, latency_ms: float = 20.0, error_rate: float = 0.0, max_batch: int = 100):
+        self.channel = channel
+        self.latency_ms = float(latency_ms)
+        self.error_rate = float(error_rate)
+        self.max_batch = max(1, int(max_batch))
+        self.calls = 0
+        self.sent = 0
+
+    def _fails(self, send_log_id: int) -> bool:
+        if self.error_rate <= 0:
+            return False
+        return (zlib.crc32(str(send_log_id).encode()) % 10_000) < self.error_rate * 10_000
+
+    async def send_batch(self, reqs: List[SendRequest]) -> List[SendResult]:
+        self.calls += 1
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000.0)
+        out = []
+        for r in reqs:
+            if self._fails(r.send_log_id):
+                out.append(SendResult(r.send_log_id, False, error_code="FAKE_REJECTED",
+                                      error_message=f"fake {self.channel} provider rejected"))
+            else:
+                self.sent += 1
+                out.append(SendResult(r.send_log_id, True, provider_message_id=f"fake-{self.channel.lower()}-{r.send_log_id}"))
+        return out
+
+    async def send(self, req: SendRequest) -> SendResult:
+        return (await self.send_batch([req]))[0]
+
+
+# 채널별 기본 batch 크기(벤더 API 한 번에 받는 수신자 수 기준)
+_FAKE_MAX_BATCH = {"SMS": 100, "KAKAO": 100, "PUSH": 500, "EMAIL": 50}
+
+_PROVIDERS: Dict[str, Provider] = {}
+
+
+def register_provider(channel: str, provider: Provider) -> None:
+    _PROVIDERS[channel.upper()] = provider
+
+
+def get_provider(channel: str) -> Provider:
+    """
+    등록된 provider, 없으면 DELIVERY_PROVIDER=fake 일 때 FakeProvider 생성
+    """
+    ch = channel.upper()
+    p = _PROVIDERS.get(ch)
+    if p is not None:
+        return p
+    kind = os.getenv("DELIVERY_PROVIDER", "fake").strip().lower()
+    if kind != "fake":
+        raise RuntimeError(f"no delivery provider registered for {ch} (DELIVERY_PROVIDER={kind})")
+    p = FakeProvider(
+        ch,
+        latency_ms=float(os.getenv("DELIVERY_FAKE_LATENCY_MS", "20")),
+        error_rate=float(os.getenv("DELIVERY_FAKE_ERROR_RATE", "0")),
+        max_batch=_FAKE_MAX_BATCH.get(ch, 100),
+    )
+    _PROVIDERS[ch] = p
+    return p
+
+
+def reset_providers() -> None:
+    _PROVIDERS.clear()
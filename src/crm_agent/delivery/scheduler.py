@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text, bindparam
+
+from crm_agent.db.engine import SessionLocal
+from crm_agent.delivery.limits import ChannelLimit, channel_limits
+from crm_agent.delivery.providers import CHANNELS
+
+# -----------------------------
+# CREATED send log → scheduled_at 배정 (dispatcher 는 scheduled_at <= now 인 것만 claim)
+# - 채널별 messages/sec 로 slot(slot_sec 초) 하나에 들어갈 수를 정하고 순서대로 slot 에 채움
+# - 같은 채널 안에서는 preferred_channel 이 그 채널인 user 먼저
+# - 야간 광고 전송 제한(기본 21~08시)은 slot 시간축에서 빼고 계산 → 밤에 걸리면 다음 날 08시부터 이어감
+# - audience 전체를 numpy 로 한 번에 계산(row 별 loop 없음). DB datetime 은 서버 로컬(KST) 기준
+# -----------------------------
+DELIVERY_QUIET_HOURS = os.getenv("DELIVERY_QUIET_HOURS", "21-8")  # "" / "off" 면 제한 없음
+DELIVERY_SLOT_SEC = int(os.getenv("DELIVERY_SLOT_SEC", "60"))
+
+_DAY = 86400
+_UPDATE_CHUNK = 1000
+
+
+def quiet_hours(spec: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    "21-8" → (21, 8). 시작 시각부터 끝 시각 전까지 발송 금지
+    """
+    s = (DELIVERY_QUIET_HOURS if spec is None else spec).strip().lower()
+    if not s or s in ("off", "none", "0"):
+        return None
+    a, _, b = s.partition("-")
+    start, end = int(a) % 24, int(b) % 24
+    if start == end:
+        return None
+    return start, end
+
+
+def next_open(at: datetime, quiet: Optional[Tuple[int, int]]) -> datetime:
+    """
+    at 이 발송 금지 시간이면 그 금지 시간이 끝나는 시각, 아니면 at 그대로
+    """
+    if quiet is None:
+        return at
+    q_start, q_end = quiet
+    h = at.hour
+    inside = (q_start <= h or h < q_end) if q_start > q_end else (q_start <= h < q_end)
+    if not inside:
+        return at
+    end = at.replace(hour=q_end, minute=0, second=0, microsecond=0)
+    return end if end > at else end + timedelta(days=1)
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch(dt: datetime) -> int:
+    # naive wall clock 그대로 초로 (KST 는 DST 가 없어서 그대로 더하고 빼도 됨)
+    return int((dt - _EPOCH).total_seconds())
+
+
+def _fmt(v: int) -> str:
+    return (_EPOCH + timedelta(seconds=int(v))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def plan_schedule(
+        channel: np.ndarray,
+        preferred: np.ndarray,
+        send_log_id: np.ndarray,
+        *,
+        start: datetime,
+        limits: Dict[str, ChannelLimit],
+        quiet: Optional[Tuple[int, int]] = None,
+        slot_sec: int = DELIVERY_SLOT_SEC,
+) -> np.ndarray:
+    """
+    row 별 scheduled_at(epoch 초, int64). 입력 순서 그대로 돌려줌
+    """
+    n = len(send_log_id)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    slot_sec = max(1, int(slot_sec))
+    channel = np.asarray(channel).astype(str)
+    preferred = np.asarray(preferred).astype(str)
+    ids = np.asarray(send_log_id, dtype=np.int64)
+
+    # 채널 code, 채널별 slot 당 정원(mps <= 0 이면 제한 없음 → 전부 첫 slot)
+    names = np.array(sorted(set(CHANNELS) | set(channel.tolist())))
+    code = np.searchsorted(names, channel)
+    mps = np.array([getattr(limits.get(c), "mps", 0.0) for c in names], dtype=np.float64)
+    per_slot = np.where(mps > 0, np.maximum(1, (mps * slot_sec).astype(np.int64)), np.iinfo(np.int64).max)
+
+    # (채널, 선호 채널 아님, send_log_id) 순으로 정렬 → 채널 안 순번
+    not_pref = (channel != preferred).astype(np.int8)
+    order = np.lexsort((ids, not_pref, code))
+    sc = code[order]
+    first = np.r_[True, sc[1:] != sc[:-1]]
+    group_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - group_start
+    offset = (rank // per_slot[code]) * slot_sec
+
+    t0 = _epoch(start)
+    if quiet is None:
+        return t0 + offset
+
+    # 발송 가능 구간만 이어 붙인 시간축: 하루 = [end, end + open_len) 시각
+    q_start, q_end = quiet
+    open_len = ((q_start - q_end) % 24) * 3600
+    shift = q_end * 3600
+    s = t0 - shift
+    day0 = s // _DAY
+    o0 = day0 * open_len + min(s - day0 * _DAY, open_len)   # 밤이면 그날 open 끝 = 다음 날 시작
+    o = o0 + offset
+    return (o // open_len) * _DAY + (o % open_len) + shift
+
+
+def _load(db, run_id: str, channels: Optional[List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    where = ""
+    params: Dict[str, Any] = {"run_id": run_id}
+    if channels:
+        where = " AND l.channel IN :channels"
+        params["channels"] = channels
+    q = text(f"""
+        SELECT l.send_log_id, l.channel, COALESCE(u.preferred_channel, '') AS preferred_channel
+        FROM campaign_send_logs l
+        LEFT JOIN users u ON u.user_id = l.user_id
+        WHERE l.run_id = :run_id AND l.status = 'CREATED'{where}
+    """)
+    if channels:
+        q = q.bindparams(bindparam("channels", expanding=True))
+    rows = db.execute(q, params).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=str), np.zeros(0, dtype=str)
+    ids, ch, pref = zip(*rows)
+    return np.array(ids, dtype=np.int64), np.array(ch, dtype=str), np.array(pref, dtype=str)
+
+
+def _write(db, ids: np.ndarray, ts: np.ndarray) -> int:
+    """
+    같은 scheduled_at 끼리 묶어서 IN (...) UPDATE. slot 단위라 묶음 수 = 사용한 slot 수
+    """
+    q = text(
+        "UPDATE campaign_send_logs SET scheduled_at = :ts WHERE send_log_id IN :ids AND status = 'CREATED'"
+    ).bindparams(bindparam("ids", expanding=True))
+    if len(ids) == 0:
+        return 0
+    order = np.argsort(ts, kind="stable")
+    ids, ts = ids[order], ts[order]
+    cut = np.flatnonzero(np.r_[True, ts[1:] != ts[:-1], True])
+    written = 0
+    for a, b in zip(cut[:-1], cut[1:]):
+        at = _fmt(ts[a])
+        for i in range(a, b, _UPDATE_CHUNK):
+            part = ids[i:min(b, i + _UPDATE_CHUNK)].tolist()
+            res = db.execute(q, {"ids": part, "ts": at})
+            written += int(res.rowcount or 0)
+    return written
+
+
+def schedule_run(
+        run_id: str,
+        *,
+        start_at: Optional[datetime] = None,
+        channels: Optional[List[str]] = None,
+        limits: Optional[Dict[str, ChannelLimit]] = None,
+        quiet: Optional[str] = None,
+        slot_sec: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    run 의 CREATED send log 전체에 scheduled_at 배정(다시 부르면 남은 CREATED 를 start_at 부터 재배정)
+    """
+    start = (start_at or datetime.now()).replace(microsecond=0)
+    limits = limits or channel_limits()
+    q = quiet_hours(quiet)
+    slot = int(slot_sec or DELIVERY_SLOT_SEC)
+    chans = [c.upper() for c in channels] if channels else None
+
+    db = SessionLocal()
+    try:
+        ids, ch, pref = _load(db, run_id, chans)
+        ts = plan_schedule(ch, pref, ids, start=start, limits=limits, quiet=q, slot_sec=slot)
+        written = _write(db, ids, ts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    by_channel: Dict[str, Any] = {}
+    for c in np.unique(ch):
+        m = ch == c
+        by_channel[str(c)] = {
+            "messages": int(m.sum()),
+            "preferred": int((pref[m] == c).sum()),
+            "first_at": _fmt(ts[m].min()),
+            "last_at": _fmt(ts[m].max()),
+        }
+    return {
+        "run_id": run_id,
+        "scheduled": written,
+        "start_at": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "quiet_hours": list(q) if q else None,
+        "slot_sec": slot,
+        "last_at": _fmt(ts.max()) if len(ts) else None,
+        "by_channel": by_channel,
+    }
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
-from typing import TypedDict, Any, Dict, List
+import os
+import copy
+import time
+import threading
+from typing import TypedDict, Any, Callable, Dict, List, Optional, Union
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 from langgraph.graph import StateGraph, END
 
@@ -9,6 +14,8 @@ from crm_agent.db.engine import SessionLocal
 from crm_agent.db.repo import Repo
 from crm_agent.services.targeting import build_target
 from crm_agent.rag.retriever import RagRetriever, build_context_text
+from crm_agent.services.template_library import load_library
+from crm_agent.services import tracing
 
 ST_BRIEF = "BRIEF"
 ST_TARGET_INPUT = "TARGET_INPUT"
@@ -20,11 +27,26 @@ ST_COMPLIANCE = "COMPLIANCE"
 ST_SELECTED_TEMPLATE = "SELECTED_TEMPLATE"
 ST_EXECUTION_RESULT = "EXECUTION_RESULT"
 
+# hybrid(BM25+vector) 검색으로 recall이 올라가서 vector-only(10) 대비 줄임
+RAG_TOP_K = 6
+
+# 승인 템플릿 라이브러리 재사용(거의 같은 brief면 LLM 생성 생략)
+TEMPLATE_LIBRARY_ENABLED = os.getenv("TEMPLATE_LIBRARY", "1").strip() not in ("0", "false", "False", "")
+
+# 배치 실행 동시 run 수(DB 커넥션 풀 기본 5+10 안쪽으로)
+BATCH_MAX_WORKERS = int(os.getenv("CRM_BATCH_MAX_WORKERS", "4"))
+
 
 try:
-    from crm_agent.agents.template_agent import generate_template_candidates
+    from crm_agent.agents.template_agent import generate_template_candidates, stream_template_candidates
 except Exception:
     generate_template_candidates = None
+    stream_template_candidates = None
+
+try:
+    from crm_agent.agents.brief_normalizer import normalize_campaign_text
+except Exception:
+    normalize_campaign_text = None
 
 try:
     from crm_agent.agents.compliance import validate_candidates
@@ -54,6 +76,13 @@ class CRMState(TypedDict, total=False):
     selected_template: dict
     execution_result: dict
 
+    # streaming 시 후보 1개가 확정될 때마다 호출(UI 진행 표시용, 저장 X)
+    on_candidate: Any
+    # False면 승인 템플릿 라이브러리 재사용 없이 전부 새로 생성(재생성 버튼)
+    use_library: bool
+    # 배치 실행 시 run 간 공유 결과(BatchShared, 저장 X)
+    batch: Any
+
 
 def _repo() -> Repo:
     db = SessionLocal()
@@ -67,6 +96,60 @@ def _close_repo(repo: Repo) -> None:
         pass
 
 
+# Pinecone/OpenAI client는 프로세스당 1번만 생성(run마다 새로 만들지 않음). BM25 index는 retrieve 때 mtime 보고 다시 로드
+_RETRIEVER_LOCK = threading.Lock()
+_RETRIEVER: Optional[RagRetriever] = None
+
+
+def _shared_retriever() -> RagRetriever:
+    global _RETRIEVER
+    with _RETRIEVER_LOCK:
+        if _RETRIEVER is None:
+            _RETRIEVER = RagRetriever()
+        return _RETRIEVER
+
+
+class BatchShared:
+    """
+    배치 실행 중 run들이 공유하는 결과.
+    같은 (kind, key)는 먼저 도착한 thread가 1번만 계산하고, 동시에 온 나머지는 기다렸다가 재사용.
+    실패한 key는 남기지 않음(다음 run이 다시 시도)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[Any, Future] = {}
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.shared: Dict[str, int] = defaultdict(int)
+
+    def once(self, kind: str, key: Any, fn: Callable[[], Any]) -> Any:
+        k = (kind, key)
+        with self._lock:
+            fut = self._results.get(k)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._results[k] = fut
+                self.calls[kind] += 1
+            else:
+                self.shared[kind] += 1
+
+        if owner:
+            try:
+                fut.set_result(fn())
+            except BaseException as e:
+                with self._lock:
+                    self._results.pop(k, None)
+                fut.set_exception(e)
+        # 호출한 쪽에서 고쳐 써도 다른 run에 새지 않도록 복사본 반환
+        return copy.deepcopy(fut.result())
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {kind: {"calls": self.calls[kind], "shared": self.shared[kind]}
+                    for kind in sorted(set(self.calls) | set(self.shared))}
+
+
 def _build_rag_evidence(
         retrieved: Dict[str, Any],
         max_each_source: int = 3,
@@ -355,15 +438,23 @@ def node_rag(state: CRMState) -> CRMState:
             "주의: 상품/혜택/가격은 확정하지 말고 슬롯으로 남기는 방향의 가이드만 찾아라."
         )
 
-        retriever = RagRetriever()
-        retrieved = retriever.retrieve(query=query, filters=None, top_k=10)
+        batch = state.get("batch")
+        if batch is not None:
+            retrieved = batch.once(
+                "rag",
+                (query, RAG_TOP_K),
+                lambda: _shared_retriever().retrieve(query=query, filters=None, top_k=RAG_TOP_K),
+            )
+        else:
+            retrieved = _shared_retriever().retrieve(query=query, filters=None, top_k=RAG_TOP_K)
 
         context = build_context_text(retrieved, max_each=3)
         evidence = _build_rag_evidence(retrieved, max_each_source=3, max_text_chars=800)
 
         rag_payload = {
             "query": query,
-            "top_k": 10,
+            "top_k": RAG_TOP_K,
+            "retrieval_mode": retrieved.get("mode", "vector"),
             "channel": channel,
             "tone": tone,
             "goal": goal,
@@ -396,6 +487,14 @@ def node_candidates(state: CRMState) -> CRMState:
         target = state.get("target") or {}
         channel = state.get("channel") or "PUSH"
         tone = state.get("tone") or "amoremall"
+        library = load_library(repo) if (TEMPLATE_LIBRARY_ENABLED and state.get("use_library", True)) else None
+
+        # 배치 실행이면 같은 campaign_text 정규화는 run 간 1번만
+        normalized = None
+        batch = state.get("batch")
+        if batch is not None and normalize_campaign_text is not None:
+            campaign_text = (brief.get("campaign_text") or "").strip()
+            normalized = batch.once("normalize", campaign_text, lambda: normalize_campaign_text(campaign_text))
 
         if generate_template_candidates is None:
             candidates = {
@@ -408,6 +507,23 @@ def node_candidates(state: CRMState) -> CRMState:
                     }
                 ]
             }
+        elif state.get("on_candidate") and stream_template_candidates is not None:
+            on_candidate = state["on_candidate"]
+            candidates = {"candidates": []}
+            for ev in stream_template_candidates(
+                brief=brief,
+                channel=channel,
+                tone=tone,
+                rag_context=rag.get("context", ""),
+                target=target,
+                k=5,
+                library=library,
+                normalized=normalized,
+            ):
+                if ev.get("type") == "candidate":
+                    on_candidate(ev)
+                elif ev.get("type") == "done":
+                    candidates = {"candidates": ev.get("candidates") or []}
         else:
             candidates = generate_template_candidates(
                 brief=brief,
@@ -416,6 +532,8 @@ def node_candidates(state: CRMState) -> CRMState:
                 rag_context=rag.get("context", ""),
                 target=target,
                 k=5,  # 후보 5개 유지
+                library=library,
+                normalized=normalized,
             )
             
         candidates = postprocess_candidates_payload(candidates, channel=channel)
@@ -508,12 +626,12 @@ def route_after_compliance(state: CRMState) -> str:
 def build_graph():
     g = StateGraph(CRMState)
 
-    g.add_node("stage_load_brief", node_load_brief)
-    g.add_node("stage_target", node_targeting)
-    g.add_node("stage_rag", node_rag)
-    g.add_node("stage_candidates", node_candidates)
-    g.add_node("stage_compliance", node_compliance)
-    g.add_node("stage_execute", node_execute)
+    g.add_node("stage_load_brief", tracing.traced_node("stage_load_brief", node_load_brief))
+    g.add_node("stage_target", tracing.traced_node("stage_target", node_targeting))
+    g.add_node("stage_rag", tracing.traced_node("stage_rag", node_rag))
+    g.add_node("stage_candidates", tracing.traced_node("stage_candidates", node_candidates))
+    g.add_node("stage_compliance", tracing.traced_node("stage_compliance", node_compliance))
+    g.add_node("stage_execute", tracing.traced_node("stage_execute", node_execute))
 
     g.set_entry_point("stage_load_brief")
     g.add_edge("stage_load_brief", "stage_target")
@@ -537,9 +655,135 @@ def build_graph():
 GRAPH = build_graph()
 
 
-def run_until_candidates(run_id: str, channel: str, tone: str) -> Dict[str, Any]:
-    init_state: CRMState = {"run_id": run_id, "channel": channel, "tone": tone}
-    return GRAPH.invoke(init_state)
+def _save_perf(tr: Optional[tracing.Trace]) -> None:
+    if tr is None:
+        return
+    repo = _repo()
+    try:
+        tracing.save_perf(repo, tr)
+    finally:
+        _close_repo(repo)
+
+
+def _traced_invoke(run_id: str, name: str, init_state: CRMState) -> Dict[str, Any]:
+    """
+    GRAPH.invoke + run 단위 trace(node/DB/LLM/embedding/vector span) → PERF handoff
+    """
+    tr = None
+    try:
+        with tracing.trace(run_id, name) as tr:
+            return GRAPH.invoke(init_state)
+    finally:
+        _save_perf(tr)
+
+
+def run_until_candidates(
+        run_id: str,
+        channel: str,
+        tone: str,
+        on_candidate: Optional[Callable[[Dict[str, Any]], None]] = None,
+        use_library: bool = True,
+) -> Dict[str, Any]:
+    """
+    on_candidate를 넘기면 후보를 streaming으로 생성하고, 확정되는 순서대로 콜백 호출
+    (event: {"type": "candidate", "index", "candidate", "compliance"})
+    use_library=False: 승인 템플릿 재사용 없이 새로 생성
+    """
+    init_state: CRMState = {"run_id": run_id, "channel": channel, "tone": tone, "use_library": use_library}
+    if on_candidate is not None:
+        init_state["on_candidate"] = on_candidate
+    return _traced_invoke(run_id, "crm.until_candidates", init_state)
+
+
+def run_batch_until_candidates(
+        runs: List[Union[str, Dict[str, Any]]],
+        *,
+        max_workers: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        use_library: bool = True,
+) -> Dict[str, Any]:
+    """
+    캠페인 캘린더처럼 brief 여러 개를 한 번에 후보 생성까지 실행.
+    runs: run_id 또는 {"run_id", "channel"(선택), "tone"(선택)}
+    - 동시 run 수는 max_workers(기본 env CRM_BATCH_MAX_WORKERS)로 제한
+    - retriever client / 승인 템플릿 라이브러리는 공유,
+      같은 campaign_text 정규화 / 같은 RAG query는 run 간 1번만 호출
+    - run 하나가 실패해도 나머지는 계속 진행(결과에 error 기록)
+    on_progress(event): {"run_id", "status": started|stage|done|error, "stage", "done", "total", "elapsed_ms", "error"}
+    returns: {"results": {run_id: {...}}, "shared": {kind: {"calls", "shared"}}, "elapsed_ms"}
+    """
+    specs: List[Dict[str, Any]] = [r if isinstance(r, dict) else {"run_id": r} for r in runs]
+    total = len(specs)
+    batch = BatchShared()
+    results: Dict[str, Dict[str, Any]] = {}
+    done = 0
+    progress_lock = threading.Lock()
+
+    def _emit(ev: Dict[str, Any]) -> None:
+        if on_progress is None:
+            return
+        with progress_lock:
+            ev = {**ev, "done": done, "total": total}
+            try:
+                on_progress(ev)
+            except Exception:
+                pass
+
+    def _one(spec: Dict[str, Any]) -> Dict[str, Any]:
+        run_id = spec["run_id"]
+        t0 = time.perf_counter()
+        init_state: CRMState = {
+            "run_id": run_id,
+            "use_library": use_library,
+            "batch": batch,
+        }
+        if spec.get("channel"):
+            init_state["channel"] = spec["channel"]
+        if spec.get("tone"):
+            init_state["tone"] = spec["tone"]
+
+        _emit({"run_id": run_id, "status": "started"})
+        final: Dict[str, Any] = {}
+        tr = None
+        try:
+            with tracing.trace(run_id, "crm.batch_until_candidates") as tr:
+                for update in GRAPH.stream(init_state, stream_mode="updates"):
+                    for stage, st in (update or {}).items():
+                        final = st or final
+                        _emit({"run_id": run_id, "status": "stage", "stage": stage,
+                               "elapsed_ms": int((time.perf_counter() - t0) * 1000)})
+        finally:
+            _save_perf(tr)
+        return {
+            "ok": True,
+            "channel": final.get("channel"),
+            "tone": final.get("tone"),
+            "num_candidates": len((final.get("candidates") or {}).get("candidates") or []),
+            "compliance": final.get("compliance") or {},
+            "elapsed_ms": int((time.perf_counter() - t0) * 1000),
+        }
+
+    t_start = time.perf_counter()
+    workers = max(1, int(max_workers or BATCH_MAX_WORKERS))
+    with ThreadPoolExecutor(max_workers=min(workers, max(1, total))) as ex:
+        futs = {ex.submit(_one, spec): spec["run_id"] for spec in specs}
+        for fut in as_completed(futs):
+            run_id = futs[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                res = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            with progress_lock:
+                results[run_id] = res
+                done += 1
+            _emit({"run_id": run_id, "status": "done" if res.get("ok") else "error",
+                   "elapsed_ms": res.get("elapsed_ms"), "error": res.get("error")})
+
+    return {
+        "results": results,
+        "shared": batch.stats(),
+        "elapsed_ms": int((time.perf_counter() - t_start) * 1000),
+    }
 
 
 def run_with_selection(run_id: str, selected_template: dict) -> Dict[str, Any]:
@@ -551,4 +795,4 @@ def run_with_selection(run_id: str, selected_template: dict) -> Dict[str, Any]:
         _close_repo(repo)
 
     init_state: CRMState = {"run_id": run_id, "selected_template": selected_template}
-    return GRAPH.invoke(init_state)
+    return _traced_invoke(run_id, "crm.with_selection", init_state)
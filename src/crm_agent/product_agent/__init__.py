@@ -1 +1,2 @@
-from .workflow import run_product_agent
\ No newline at end of file
+from .workflow import run_product_agent
+from .sharding import run_product_agent_sharded
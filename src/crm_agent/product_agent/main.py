@@ -3,15 +3,28 @@ from __future__ import annotations
 import argparse
 import json
 
-from crm_agent.product_agent.workflow import run_product_agent
+from crm_agent.product_agent.services.routing import PRODUCT_AGENT_ROUTING, ROUTING_MODES
+from crm_agent.product_agent.sharding import PRODUCT_AGENT_WORKERS, run_product_agent_sharded
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--run_id", required=True)
     p.add_argument("--top_k_products", type=int, default=3)
+    p.add_argument("--chunk_size", type=int, default=None, help="checkpoint 단위 사용자 수(기본 PRODUCT_AGENT_CHUNK_SIZE)")
+    p.add_argument("--resume", action="store_true", help="마지막 checkpoint 다음 chunk 부터 이어서 실행")
+    p.add_argument("--workers", type=int, default=PRODUCT_AGENT_WORKERS, help="user_id hash shard 수(process 수). 1이면 단일 process")
+    p.add_argument("--routing", choices=ROUTING_MODES, default=PRODUCT_AGENT_ROUTING,
+                   help="fallback: run 채널 opt-in 이 없으면 opt-in 된 다른 채널로 발송")
     args = p.parse_args()
 
-    out = run_product_agent(args.run_id, top_k_products=args.top_k_products)
+    out = run_product_agent_sharded(
+        args.run_id,
+        workers=args.workers,
+        top_k_products=args.top_k_products,
+        resume=args.resume,
+        chunk_size=args.chunk_size,
+        routing=args.routing,
+    )
     print(json.dumps(out.get("summary", {}), ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+
+# -----------------------------
+# 사용자별 발송 채널 routing
+# - fixed   : run 채널 그대로(opt-in 아니면 PREVIEW) — 기존 동작
+# - fallback: preferred_channel → run 채널 → FALLBACK_ORDER 순으로 opt-in 된 첫 채널
+#             어느 채널도 opt-in 이 없으면 run 채널 + PREVIEW
+# chunk 의 user 컬럼을 (n, 4) mask 로 만들어 argmin 한 번으로 고름
+# -----------------------------
+CHANNELS = ("SMS", "KAKAO", "PUSH", "EMAIL")
+OPT_IN_COLUMNS = tuple(f"{c.lower()}_opt_in" for c in CHANNELS)
+
+ROUTING_MODES = ("fixed", "fallback")
+PRODUCT_AGENT_ROUTING = os.getenv("PRODUCT_AGENT_ROUTING", "fixed").strip().lower()
+
+# 선호/run 채널이 안 될 때 순서(건당 비용 낮은 순)
+FALLBACK_ORDER = tuple(
+    c.strip().upper() for c in os.getenv("PRODUCT_AGENT_FALLBACK_ORDER", "PUSH,KAKAO,EMAIL,SMS").split(",")
+    if c.strip()
+)
+
+# 광고성 메시지 수신거부 안내가 본문에 있어야 하는 채널 → 없으면 붙일 줄(template_agent 와 같은 모양)
+_UNSUB_LINES = {"SMS": "수신거부: {unsubscribe}", "EMAIL": "{unsubscribe}"}
+
+# EMAIL 필수 슬롯 subject 기본값(template_agent default_slot_values 와 같음)
+DEFAULT_EMAIL_SUBJECT = "{campaign_goal} 안내 | {product_name} {offer}"
+
+_CH = np.array(CHANNELS)
+_NO = np.iinfo(np.int16).max
+
+
+@dataclass
+class Routes:
+    channel: np.ndarray   # user 별 발송 채널(str)
+    eligible: np.ndarray  # 그 채널 opt-in 여부(False 면 PREVIEW)
+
+    def counts(self) -> Dict[str, int]:
+        names, cnt = np.unique(self.channel[self.eligible], return_counts=True)
+        return {str(k): int(v) for k, v in zip(names, cnt)}
+
+
+def route_channels(users: List[Dict[str, Any]], run_channel: str, mode: str = "fallback") -> Routes:
+    n = len(users)
+    run_channel = (run_channel or "SMS").upper()
+    if n == 0:
+        return Routes(np.zeros(0, dtype=_CH.dtype), np.zeros(0, dtype=bool))
+
+    opt = np.array([[int(u.get(c) or 0) for c in OPT_IN_COLUMNS] for u in users], dtype=np.int8) == 1
+    run_idx = CHANNELS.index(run_channel) if run_channel in CHANNELS else -1
+
+    if mode == "fixed":
+        eligible = opt[:, run_idx] if run_idx >= 0 else np.ones(n, dtype=bool)
+        return Routes(np.full(n, run_channel), eligible)
+    if mode != "fallback":
+        raise ValueError(f"unknown routing mode: {mode}")
+
+    # 우선순위(작을수록 먼저): preferred 0, run 채널 1, 나머지는 FALLBACK_ORDER 순
+    base = np.array([2 + FALLBACK_ORDER.index(c) if c in FALLBACK_ORDER else 2 + len(CHANNELS) for c in CHANNELS],
+                    dtype=np.int16)
+    prio = np.tile(base, (n, 1))
+    if run_idx >= 0:
+        prio[:, run_idx] = 1
+    pref = np.array([str(u.get("preferred_channel") or "").upper() for u in users])
+    prio[pref[:, None] == _CH[None, :]] = 0
+
+    best = np.where(opt, prio, _NO).argmin(axis=1)
+    eligible = opt.any(axis=1)
+    channel = np.where(eligible, _CH[best], run_channel).astype(str)
+    return Routes(channel, eligible)
+
+
+def adapt_body(body: str, from_channel: str, to_channel: str) -> str:
+    """
+    run 채널용 본문을 다른 채널용으로: 채널 전용 슬롯 줄만 추가/제거
+    - {unsubscribe}: SMS/EMAIL 이면 없을 때 한 줄 추가, 그 외 채널이면 그 슬롯이 든 줄("수신거부: {unsubscribe}" 등) 제거
+    - {subject}: EMAIL 이면 없을 때 맨 앞 줄에 추가, 그 외 채널이면 그 슬롯이 든 줄 제거
+    """
+    to_channel = (to_channel or "").upper()
+    body = body or ""
+    if to_channel == (from_channel or "").upper():
+        return body
+    lines = body.splitlines()
+
+    unsub = _UNSUB_LINES.get(to_channel)
+    if unsub is None:
+        lines = [ln for ln in lines if "{unsubscribe}" not in ln]
+    elif "{unsubscribe}" not in body:
+        lines.append(unsub)
+
+    if to_channel == "EMAIL":
+        if "{subject}" not in body:
+            lines.insert(0, "{subject}")
+    else:
+        lines = [ln for ln in lines if "{subject}" not in ln]
+    return "\n".join(lines)
+
+
+def email_subject(selected: Dict[str, Any]) -> str:
+    """
+    EMAIL {subject} 슬롯 값 템플릿(슬롯 포함). 선택 템플릿 default_slot_values.subject 우선
+    """
+    dsv = selected.get("default_slot_values") or {}
+    return (dsv.get("subject") if isinstance(dsv, dict) else None) or DEFAULT_EMAIL_SUBJECT
+
+
+def channel_variants(selected: Dict[str, Any], run_channel: str) -> Dict[str, str]:
+    """
+    채널 → body_with_slots. SELECTED_TEMPLATE 에 channel_variants={채널: 본문} 이 있으면 그걸 쓰고
+    없는 채널은 run 채널 본문을 adapt_body 로 변환
+    """
+    body = selected.get("body_with_slots") or selected.get("body") or ""
+    explicit = {str(k).upper(): v for k, v in (selected.get("channel_variants") or {}).items() if v}
+    return {ch: explicit.get(ch) or adapt_body(body, run_channel, ch) for ch in CHANNELS}
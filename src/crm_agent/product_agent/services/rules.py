@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
+
+from crm_agent.validators.rule_engine import FAIL, PASS, LengthRule, PhraseRule, register_rules, scan
 
 # MVP용 기본 규칙(팀 회의에서 '공통제약' 합의되면 여기로 옮기면 됨)
 CHANNEL_MAX_LEN = {
@@ -16,17 +18,22 @@ BANNED_PHRASES = [
     "부작용 없음",
 ]
 
-def validate_message(text: str, channel: str) -> Tuple[str, List[str]]:
-    reasons: List[str] = []
-    t = (text or "").strip()
+PROFILE = "product_agent.message"
 
-    max_len = CHANNEL_MAX_LEN.get((channel or "").upper())
-    if max_len and len(t) > max_len:
-        reasons.append(f"길이 초과: {len(t)} > {max_len} (channel={channel})")
+# reasons 순서: 길이 → 금칙 표현
+register_rules(PROFILE, (
+    [LengthRule(CHANNEL_MAX_LEN, FAIL, "길이 초과: {length} > {limit} (channel={channel})")]
+    + [PhraseRule(p, FAIL, "금칙 표현 포함: {phrase}") for p in BANNED_PHRASES]
+))
 
-    for p in BANNED_PHRASES:
-        if p in t:
-            reasons.append(f"금칙 표현 포함: {p}")
+def validate_message(text: str, channel: str) -> Tuple[str, List[str]]:
+    return validate_messages([text], [channel])[0]
 
-    status = "PASS" if not reasons else "FAIL"
-    return status, reasons
+def validate_messages(texts: Sequence[str], channels: Sequence[Optional[str]]) -> List[Tuple[str, List[str]]]:
+    """
+    렌더링된 문장 batch 를 한 번에 검사(automaton 한 번). 결과는 입력 순서대로 (PASS|FAIL, reasons)
+    """
+    bad = scan([(t or "").strip() for t in texts], PROFILE, list(channels))
+    if not bad:
+        return [(PASS, []) for _ in texts]
+    return [(bad[k].status, bad[k].reasons) if k in bad else (PASS, []) for k in range(len(texts))]
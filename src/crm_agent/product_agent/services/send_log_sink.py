@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import text
+
+from crm_agent.config import settings
+
+# -----------------------------
+# campaign_send_logs bulk writer
+# - add()로 넣은 row를 batch_rows 단위로 multi-row INSERT ... VALUES (...), (...) 한 번에 전송
+# - commit_rows 마다 commit (한 transaction이 수백만 row 로 커지지 않게)
+# - mode="load_data": batch 를 TSV 로 만들어 LOAD DATA LOCAL INFILE (MySQL + MYSQL_LOCAL_INFILE=1 필요)
+# - upsert=True: (run_id, user_id, candidate_id) unique key 기준 ON DUPLICATE KEY UPDATE.
+#   이미 SENT / SENDING(dispatcher 가 가져감) 인 row 는 건드리지 않음. LOAD DATA 는 update 가 없어서 IGNORE(새 key 전용)
+# -----------------------------
+SEND_LOG_BATCH_ROWS = int(os.getenv("SEND_LOG_BATCH_ROWS", "1000"))
+SEND_LOG_COMMIT_ROWS = int(os.getenv("SEND_LOG_COMMIT_ROWS", "50000"))
+SEND_LOG_MODE = os.getenv("SEND_LOG_MODE", "values").strip().lower()
+
+SEND_LOG_COLUMNS = (
+    "run_id", "user_id", "campaign_goal", "channel", "step_id", "candidate_id",
+    "status", "rendered_text", "error_code", "error_message", "created_at",
+)
+
+MODES = ("values", "load_data")
+
+# upsert 시 갱신하는 컬럼. status 는 마지막(MySQL 은 SET 을 왼쪽부터 적용하므로 앞 컬럼들이 기존 status 를 봄)
+UPSERT_COLUMNS = ("campaign_goal", "channel", "step_id", "rendered_text", "error_code", "error_message", "created_at")
+
+# LOAD DATA 기본 escape(ESCAPED BY '\\') 규칙
+_TSV_ESCAPE = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+
+def _tsv_field(v: Any) -> str:
+    if v is None:
+        return "\\N"
+    return str(v).translate(_TSV_ESCAPE)
+
+
+class SendLogSink:
+    """
+    with SendLogSink(db) as sink:
+        for row in rows:
+            sink.add(row)
+    정상 종료 시 남은 batch flush + commit. 예외 시 미전송 batch는 버리고 rollback
+    """
+
+    def __init__(
+            self,
+            db,
+            *,
+            batch_rows: Optional[int] = None,
+            commit_rows: Optional[int] = None,
+            mode: Optional[str] = None,
+            columns: Sequence[str] = SEND_LOG_COLUMNS,
+            table: str = "campaign_send_logs",
+            upsert: bool = False,
+    ):
+        self.db = db
+        self.batch_rows = max(1, int(batch_rows or SEND_LOG_BATCH_ROWS))
+        self.commit_rows = max(self.batch_rows, int(commit_rows or SEND_LOG_COMMIT_ROWS))
+        self.columns = tuple(columns)
+        self.table = table
+        self.upsert = upsert
+        self.mode = self._resolve_mode(mode or SEND_LOG_MODE)
+        self.written = 0
+        self.batches = 0
+        self._buf: List[Dict[str, Any]] = []
+        self._uncommitted = 0
+        self._stmts: Dict[int, Any] = {}
+
+    def _resolve_mode(self, mode: str) -> str:
+        if mode not in MODES:
+            raise ValueError(f"unknown send log mode: {mode}")
+        if mode == "load_data":
+            # LOAD DATA LOCAL 은 MySQL + 클라이언트 local_infile 허용일 때만. 아니면 VALUES 로
+            dialect = getattr(getattr(self.db, "bind", None), "dialect", None)
+            if getattr(dialect, "name", "") != "mysql" or not settings.mysql_local_infile:
+                return "values"
+        return mode
+
+    def __enter__(self) -> "SendLogSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._buf.clear()
+            self.db.rollback()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self._buf.append(row)
+        if len(self._buf) >= self.batch_rows:
+            self.flush()
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for r in rows:
+            self.add(r)
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        rows, self._buf = self._buf, []
+        if self.mode == "load_data":
+            self._load_data(rows)
+        else:
+            self._insert_values(rows)
+        self.written += len(rows)
+        self.batches += 1
+        self._uncommitted += len(rows)
+        if self._uncommitted >= self.commit_rows:
+            self.db.commit()
+            self._uncommitted = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.db.commit()
+        self._uncommitted = 0
+
+    # -----------------------------
+    # writers
+    # -----------------------------
+    def _values_stmt(self, n: int):
+        """
+        n행짜리 INSERT 문. batch 크기가 일정하면 같은 문자열이라 compile cache 재사용
+        """
+        stmt = self._stmts.get(n)
+        if stmt is None:
+            cols = ", ".join(self.columns)
+            groups = ", ".join(
+                "(" + ", ".join(f":{c}_{i}" for c in self.columns) + ")" for i in range(n)
+            )
+            sql = f"INSERT INTO {self.table} ({cols}) VALUES {groups}"
+            if self.upsert:
+                sql += " " + self._upsert_clause()
+            stmt = text(sql)
+            if len(self._stmts) < 4:
+                self._stmts[n] = stmt
+        return stmt
+
+    def _upsert_clause(self) -> str:
+        keep = "status IN ('SENT', 'SENDING')"
+        sets = [
+            f"{c} = CASE WHEN {keep} THEN {c} ELSE VALUES({c}) END"
+            for c in UPSERT_COLUMNS if c in self.columns
+        ]
+        sets.append(f"status = CASE WHEN {keep} THEN status ELSE VALUES(status) END")
+        return "ON DUPLICATE KEY UPDATE " + ", ".join(sets)
+
+    def _insert_values(self, rows: List[Dict[str, Any]]) -> None:
+        params: Dict[str, Any] = {}
+        for i, r in enumerate(rows):
+            for c in self.columns:
+                params[f"{c}_{i}"] = r.get(c)
+        self.db.execute(self._values_stmt(len(rows)), params)
+
+    def _load_data(self, rows: List[Dict[str, Any]]) -> None:
+        body = "".join(
+            "\t".join(_tsv_field(r.get(c)) for c in self.columns) + "\n" for r in rows
+        )
+        # pymysql 은 파일 경로만 받으므로 batch 하나를 tmpfs(/dev/shm)에 잠깐 씀
+        tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        fd, path = tempfile.mkstemp(prefix="send_logs_", suffix=".tsv", dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(body)
+            cols = ", ".join(self.columns)
+            self.db.execute(text(
+                f"LOAD DATA LOCAL INFILE '{path}' {'IGNORE ' if self.upsert else ''}"
+                f"INTO TABLE {self.table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({cols})"
+            ))
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+import zlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from crm_agent.services import tracing
+
+# -----------------------------
+# Product Agent sharded 실행
+# - audience 를 user_id hash 로 count 개 shard 로 나눠 process pool 에서 병렬 처리
+# - worker 마다 자기 DB connection(pool) + 자기 SendLogSink, checkpoint 도 shard 별
+# - 부모가 shard summary 를 합쳐 PRODUCT_AGENT_RESULT 하나로 저장
+# -----------------------------
+PRODUCT_AGENT_WORKERS = int(os.getenv("PRODUCT_AGENT_WORKERS", "1"))
+
+
+def shard_of(user_id: str, count: int) -> int:
+    """
+    프로세스가 달라도 같은 값이어야 해서 hash() 대신 crc32
+    """
+    if count <= 1:
+        return 0
+    return zlib.crc32(str(user_id).encode("utf-8")) % count
+
+
+def _mp_context():
+    # fork 가 가능하면 fork(import 비용 없음). 상속한 connection pool 은 worker 초기화에서 버림
+    if "fork" in mp.get_all_start_methods():
+        return mp.get_context("fork")
+    return mp.get_context()
+
+
+def _init_worker() -> None:
+    from crm_agent.product_agent import workflow
+
+    bind = workflow.SessionLocal.kw.get("bind")
+    if bind is not None:
+        # 부모 socket 을 닫지 않고 pool 만 새로(부모 connection 공유 방지)
+        bind.dispose(close=False)
+
+
+def _run_shard(run_id: str, index: int, count: int, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    from crm_agent.product_agent.workflow import run_product_agent
+
+    out = run_product_agent(run_id, shard=(index, count), **kwargs)
+    return out.get("summary") or {}
+
+
+def merge_summaries(shards: List[Dict[str, Any]], max_preview: int = 5) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "total_users_in": 0,
+        "logs_written": 0,
+        "logs_unchanged": 0,
+        "failed": 0,
+        "skipped": 0,
+        "rerouted": 0,
+        "chunks": 0,
+        "by_channel": {},
+        "sample": [],
+    }
+    for s in shards:
+        for k in ("total_users_in", "logs_written", "logs_unchanged", "failed", "skipped", "rerouted", "chunks"):
+            out[k] += int(s.get(k) or 0)
+        for ch, n in (s.get("by_channel") or {}).items():
+            out["by_channel"][ch] = out["by_channel"].get(ch, 0) + int(n)
+        for t in s.get("sample") or []:
+            if len(out["sample"]) >= max_preview:
+                break
+            out["sample"].append(t)
+    return out
+
+
+def run_product_agent_sharded(
+        run_id: str,
+        workers: Optional[int] = None,
+        top_k_products: int = 3,
+        ignore_opt_in: bool = True,
+        max_preview: int = 5,
+        resume: bool = False,
+        chunk_size: Optional[int] = None,
+        routing: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    workers <= 1 이면 run_product_agent 그대로.
+    shard 하나라도 실패하면 나머지가 끝난 뒤 예외(끝난 shard 는 checkpoint 가 있어 resume 으로 이어감)
+    """
+    from crm_agent.product_agent import workflow
+
+    workers = int(workers or PRODUCT_AGENT_WORKERS)
+    kwargs = {
+        "top_k_products": top_k_products,
+        "ignore_opt_in": ignore_opt_in,
+        "max_preview": max_preview,
+        "resume": resume,
+        "chunk_size": chunk_size,
+        "routing": routing,
+    }
+    if workers <= 1:
+        return workflow.run_product_agent(run_id, **kwargs)
+
+    tr = None
+    try:
+        with tracing.trace(run_id, "product.sharded") as tr:
+            with tracing.span("shards", kind="node", workers=workers):
+                with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(),
+                                         initializer=_init_worker) as ex:
+                    futures = [ex.submit(_run_shard, run_id, i, workers, kwargs) for i in range(workers)]
+                    results: List[Dict[str, Any]] = []
+                    errors: List[str] = []
+                    for i, f in enumerate(futures):
+                        try:
+                            results.append(f.result())
+                        except Exception as e:
+                            errors.append(f"shard {i}/{workers}: {type(e).__name__}: {e}")
+                if errors:
+                    raise RuntimeError("; ".join(errors)[:1000])
+
+            with tracing.span("finalize", kind="node"):
+                repo = workflow._repo()
+                try:
+                    ctx = workflow._load_run_context(repo, run_id)
+                    removed = workflow._remove_stale_logs(
+                        repo.db, run_id, ctx["user_ids"], ctx.get("candidate_id") or "")
+                    summary = {
+                        "run_id": run_id,
+                        "channel": ctx["channel"],
+                        "campaign_goal": ctx["campaign_goal"],
+                        "template_id": (ctx.get("selected_template") or {}).get("template_id"),
+                        **merge_summaries(results, max_preview=max_preview),
+                        "logs_removed": removed,
+                        "workers": workers,
+                        "shards": [
+                            {k: s.get(k) for k in ("shard", "total_users_in", "logs_written", "chunks", "resumed_from")}
+                            for s in results
+                        ],
+                        "created_at": workflow._now(),
+                    }
+                    workflow._publish_result(repo, run_id, summary)
+                finally:
+                    workflow._close(repo)
+            return {"run_id": run_id, "summary": summary}
+    finally:
+        if tr is not None:
+            repo = workflow._repo()
+            try:
+                tracing.save_perf(repo, tr)
+            finally:
+                workflow._close(repo)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Any, Optional, Tuple
 
 class ProductState(TypedDict, total = False):
     run_id: str
@@ -19,7 +19,16 @@ class ProductState(TypedDict, total = False):
     users: List[Dict[str, Any]]
     recommendations: Dict[str, List[Dict[str, Any]]]
 
-    # outputs
+    # chunk / checkpoint
+    chunk_size: int
+    resume: bool
+    cursor: int
+    chunk_user_ids: List[str]
+    progress: Dict[str, Any]
+    shard: Tuple[int, int]  # (index, count) — sharded 실행 시 worker 몫
+    routing: str            # fixed | fallback (services/routing.py)
+
+    # outputs (send_logs 는 마지막 chunk 분)
     send_logs: List[Dict[str, Any]]
     summary: Dict[str, Any]
 
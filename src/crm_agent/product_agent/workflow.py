@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import os
+import bisect
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Sequence
 
 from langgraph.graph import StateGraph, END
 from sqlalchemy import text, bindparam
@@ -10,8 +12,12 @@ from crm_agent.db.engine import SessionLocal
 from crm_agent.db.repo import Repo
 from crm_agent.product_agent.state import ProductState
 from crm_agent.product_agent.services.slot_fill import extract_slots, fill_slots
-from crm_agent.product_agent.services.rules import validate_message
+from crm_agent.product_agent.services.rules import validate_messages
 from crm_agent.product_agent.services.product_catalog import ProductCatalog
+from crm_agent.product_agent.services.send_log_sink import SendLogSink
+from crm_agent.product_agent.services.routing import PRODUCT_AGENT_ROUTING, channel_variants, email_subject, route_channels
+from crm_agent.product_agent.sharding import shard_of
+from crm_agent.services import tracing
 
 # handoff stages (Template Agent가 이미 쓰는 것과 맞춤)
 ST_BRIEF = "BRIEF"
@@ -21,6 +27,13 @@ ST_EXECUTION_RESULT = "EXECUTION_RESULT"
 
 # 디버깅/요약용(새 stage)
 ST_PRODUCT_AGENT_RESULT = "PRODUCT_AGENT_RESULT"
+# chunk 단위 checkpoint (재시작 시 watermark 다음 user_id 부터)
+ST_PRODUCT_AGENT_PROGRESS = "PRODUCT_AGENT_PROGRESS"
+
+PRODUCT_AGENT_CHUNK_SIZE = int(os.getenv("PRODUCT_AGENT_CHUNK_SIZE", "5000"))
+
+# dispatcher 가 가져갔거나(SENDING) 보낸(SENT) 로그는 재실행해도 건드리지 않음
+_LOCKED_STATUSES = ("SENT", "SENDING")
 
 def _now() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -35,51 +48,76 @@ def _close(repo: Repo):
     except Exception:
         pass
 
+def _load_run_context(repo: Repo, run_id: str) -> Dict[str, Any]:
+    """
+    run + BRIEF / SELECTED_TEMPLATE / TARGET_AUDIENCE handoff → 실행 context (sharding 부모도 사용)
+    """
+    run = repo.get_run(run_id)
+    if not run:
+        raise RuntimeError(f"run not found: {run_id}")
+
+    brief = (run.get("brief_json") or {})
+    h_brief = repo.get_latest_handoff(run_id, ST_BRIEF)
+    if h_brief:
+        brief = h_brief["payload_json"] or brief
+
+    h_sel = repo.get_latest_handoff(run_id, ST_SELECTED_TEMPLATE)
+    if not h_sel:
+        raise RuntimeError("SELECTED_TEMPLATE가 없습니다. Step3에서 확정 후 진행하세요.")
+    selected = h_sel["payload_json"] or {}
+
+    h_aud = repo.get_latest_handoff(run_id, ST_TARGET_AUDIENCE)
+    if not h_aud:
+        raise RuntimeError("TARGET_AUDIENCE가 없습니다. Step2에서 타겟 생성 후 진행하세요.")
+    target_audience = h_aud["payload_json"] or {}
+
+    channel = (run.get("channel") or brief.get("channel_hint") or "SMS").upper()
+    campaign_goal = str(brief.get("campaign_goal") or "").strip() or "unknown_goal"
+
+    candidate_id = selected.get("template_id") or selected.get("candidate_id")
+    if isinstance(candidate_id, str):
+        candidate_id = candidate_id[:16]
+    else:
+        candidate_id = None
+
+    user_ids = target_audience.get("user_ids") or []
+    if not isinstance(user_ids, list):
+        user_ids = []
+    # watermark(마지막 처리 user_id) 비교로 이어서 하려면 처리 순서가 고정돼야 함
+    user_ids = sorted({str(x) for x in user_ids})
+
+    return {
+        "brief": brief,
+        "selected_template": selected,
+        "target_audience": target_audience,
+        "channel": channel,
+        "campaign_goal": campaign_goal,
+        "candidate_id": candidate_id,
+        "user_ids": user_ids,
+    }
+
 def node_load_context(state: ProductState) -> ProductState:
     repo = _repo()
     try:
         run_id = state["run_id"]
-        run = repo.get_run(run_id)
-        if not run:
-            raise RuntimeError(f"run not found: {run_id}")
-
-        brief = (run.get("brief_json") or {})
-        h_brief = repo.get_latest_handoff(run_id, ST_BRIEF)
-        if h_brief:
-            brief = h_brief["payload_json"] or brief
-
-        h_sel = repo.get_latest_handoff(run_id, ST_SELECTED_TEMPLATE)
-        if not h_sel:
-            raise RuntimeError("SELECTED_TEMPLATE가 없습니다. Step3에서 확정 후 진행하세요.")
-        selected = h_sel["payload_json"] or {}
-
-        h_aud = repo.get_latest_handoff(run_id, ST_TARGET_AUDIENCE)
-        if not h_aud:
-            raise RuntimeError("TARGET_AUDIENCE가 없습니다. Step2에서 타겟 생성 후 진행하세요.")
-        target_audience = h_aud["payload_json"] or {}
-
-        channel = (run.get("channel") or brief.get("channel_hint") or "SMS").upper()
-        campaign_goal = str(brief.get("campaign_goal") or "").strip() or "unknown_goal"
-
-        candidate_id = selected.get("template_id") or selected.get("candidate_id")
-        if isinstance(candidate_id, str):
-            candidate_id = candidate_id[:16]
-        else:
-            candidate_id = None
+        ctx = _load_run_context(repo, run_id)
+
+        # sharded 실행이면 이 worker 몫(user_id hash)만
+        shard = state.get("shard")
+        user_ids = ctx["user_ids"]
+        if shard:
+            user_ids = [u for u in user_ids if shard_of(u, shard[1]) == shard[0]]
 
-        user_ids = target_audience.get("user_ids") or []
-        if not isinstance(user_ids, list):
-            user_ids = []
+        progress = _start_progress(repo, run_id, len(user_ids), resume=bool(state.get("resume")), shard=shard)
+        watermark = progress.get("watermark")
+        cursor = bisect.bisect_right(user_ids, watermark) if watermark is not None else 0
 
         return {
             **state,
-            "brief": brief,
-            "selected_template": selected,
-            "target_audience": target_audience,
-            "channel": channel,
-            "campaign_goal": campaign_goal,
-            "candidate_id": candidate_id,
+            **ctx,
             "user_ids": user_ids,
+            "cursor": cursor,
+            "progress": progress,
         }
     finally:
         _close(repo)
@@ -88,7 +126,9 @@ def node_load_users(state: ProductState) -> ProductState:
     repo = _repo()
     try:
         db = repo.db
-        user_ids = state.get("user_ids") or []
+        cursor = int(state.get("cursor") or 0)
+        chunk_size = int(state.get("chunk_size") or PRODUCT_AGENT_CHUNK_SIZE)
+        user_ids = (state.get("user_ids") or [])[cursor:cursor + chunk_size]
         if not user_ids:
             return {**state, "users": []}
 
@@ -106,24 +146,13 @@ def node_load_users(state: ProductState) -> ProductState:
         ).bindparams(bindparam("ids", expanding=True))
 
         rows = db.execute(q, {"ids": user_ids}).mappings().all()
-        users = [dict(r) for r in rows]
+        # IN 결과 순서는 보장되지 않으므로 chunk 순서(user_id 정렬)로 맞춤
+        users = sorted((dict(r) for r in rows), key=lambda u: str(u["user_id"]))
 
-        return {**state, "users": users}
+        return {**state, "users": users, "chunk_user_ids": user_ids}
     finally:
         _close(repo)
 
-def _opt_in_ok(user: Dict[str, Any], channel: str) -> bool:
-    ch = (channel or "").upper()
-    if ch == "SMS":
-        return int(user.get("sms_opt_in") or 0) == 1
-    if ch == "KAKAO":
-        return int(user.get("kakao_opt_in") or 0) == 1
-    if ch == "PUSH":
-        return int(user.get("push_opt_in") or 0) == 1
-    if ch == "EMAIL":
-        return int(user.get("email_opt_in") or 0) == 1
-    return True
-
 def _default_offer(campaign_goal: str) -> str:
     g = (campaign_goal or "").lower()
     if "browse" in g:
@@ -167,6 +196,30 @@ def node_recommend_products(state: ProductState) -> ProductState:
     finally:
         _close(repo)
 
+def _log_digest(row: Dict[str, Any]) -> int:
+    return hash((row.get("status"), row.get("rendered_text"), row.get("error_code"), row.get("error_message")))
+
+def _load_existing_logs(db, run_id: str, user_ids: List[str]) -> Dict[tuple, tuple]:
+    """
+    (user_id, candidate_id) -> (send_log_id, status, digest). 재실행 시 diff 용(chunk 사용자만)
+    """
+    if not user_ids:
+        return {}
+    rows = db.execute(
+        text(
+            """
+            SELECT send_log_id, user_id, candidate_id, status, rendered_text, error_code, error_message
+            FROM campaign_send_logs
+            WHERE run_id = :run_id AND user_id IN :ids
+            """
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"run_id": run_id, "ids": user_ids},
+    ).mappings()
+    return {
+        (r["user_id"], r["candidate_id"] or ""): (r["send_log_id"], r["status"], _log_digest(r))
+        for r in rows
+    }
+
 def node_render_and_write(state: ProductState) -> ProductState:
     repo = _repo()
     try:
@@ -176,23 +229,50 @@ def node_render_and_write(state: ProductState) -> ProductState:
         campaign_goal = state.get("campaign_goal") or "unknown_goal"
         selected = state.get("selected_template") or {}
         candidate_id = state.get("candidate_id")
-
-        body = selected.get("body_with_slots") or selected.get("body") or ""
+        # unique key (run_id, user_id, candidate_id) 라서 NULL 대신 ''
+        log_candidate_id = candidate_id or ""
 
         users = state.get("users") or []
         recs = state.get("recommendations") or {}
 
+        # user 별 채널(routing=fallback 이면 opt-in 된 다른 채널로) + 채널별 본문
+        routes = route_channels(users, channel, mode=state.get("routing") or PRODUCT_AGENT_ROUTING)
+        bodies = channel_variants(selected, channel)
+        subject_tpl = email_subject(selected)
+        route_channel = routes.channel.tolist()
+        route_ok = routes.eligible.tolist()
+        rerouted_count = 0
+
         send_logs: List[Dict[str, Any]] = []
         fail_count = 0
         skip_count = 0
+        now = _now()
+
+        # ✅ 재실행 시 전체 DELETE 대신 기존 로그와 비교해서 바뀐 row만 upsert
+        existing = _load_existing_logs(db, run_id, state.get("chunk_user_ids") or [])
+        unchanged_count = 0
+
+        # row는 만들어지는 대로 sink에 넣고, sink가 batch/commit 단위로 나눠서 씀
+        # 새 key 는 new_sink(LOAD DATA 가능), 이미 있는 key 는 upd_sink(ON DUPLICATE KEY UPDATE)
+        new_sink = SendLogSink(db, upsert=True)
+        upd_sink = SendLogSink(db, upsert=True, mode="values")
+
+        def _write(row: Dict[str, Any]) -> None:
+            nonlocal unchanged_count
+            old = existing.get((row["user_id"], row["candidate_id"]))
+            if old is None:
+                new_sink.add(row)
+            elif old[1] in _LOCKED_STATUSES or old[2] == _log_digest(row):
+                # 이미 발송(중)이거나 내용이 같으면 건드리지 않음
+                unchanged_count += 1
+            else:
+                upd_sink.add(row)
 
-        for u in users:
-            uid = str(u.get("user_id"))
-
-            # ✅ opt-in 여부는 체크하되, 렌더링을 막지 않기 위해 변수로만 둔다
-            opt_ok = _opt_in_ok(u, channel)
-
-            products = recs.get(uid) or []
+        # ✅ 렌더링(슬롯 채움)은 무조건 수행
+        rendered_all: List[str] = []
+        for i, u in enumerate(users):
+            ch = route_channel[i]
+            products = recs.get(str(u.get("user_id"))) or []
             p0 = products[0] if products else {}
 
             values = {
@@ -200,15 +280,27 @@ def node_render_and_write(state: ProductState) -> ProductState:
                 "product_name": (p0.get("name") or ""),
                 "deep_link": (p0.get("deep_link") or ""),
                 "offer": _default_offer(campaign_goal),
-                "cta": _default_cta(channel),
-                "unsubscribe": _default_unsub(channel),
+                "cta": _default_cta(ch),
+                "unsubscribe": _default_unsub(ch),
             }
+            if ch == "EMAIL":
+                values["subject"] = fill_slots(subject_tpl, {**values, "campaign_goal": campaign_goal}).strip()
+            rendered_all.append(fill_slots(bodies.get(ch, ""), values, keep_unknown=True).strip())
+
+        # ✅ 룰 체크는 chunk 전체를 한 번에(길이 한도는 실제 보낼 채널 기준)
+        checks = validate_messages(rendered_all, route_channel)
 
-            # ✅ 렌더링(슬롯 채움)은 무조건 수행
-            rendered = fill_slots(body, values, keep_unknown=True).strip()
+        for i, u in enumerate(users):
+            uid = str(u.get("user_id"))
+
+            # ✅ opt-in 여부는 체크하되, 렌더링을 막지 않기 위해 변수로만 둔다
+            ch = route_channel[i]
+            opt_ok = route_ok[i]
+            if ch != channel:
+                rerouted_count += 1
 
-            # ✅ 룰 체크는 그대로
-            status, reasons = validate_message(rendered, channel)
+            rendered = rendered_all[i]
+            status, reasons = checks[i]
 
             if status == "FAIL":
                 fail_count += 1
@@ -216,14 +308,16 @@ def node_render_and_write(state: ProductState) -> ProductState:
                     "run_id": run_id,
                     "user_id": uid,
                     "campaign_goal": campaign_goal,
-                    "channel": channel,
+                    "channel": ch,
                     "step_id": "S1",
-                    "candidate_id": candidate_id,
+                    "candidate_id": log_candidate_id,
                     "status": "FAILED",
                     "rendered_text": rendered,  # FAIL이어도 완성 문장 확인 가능
                     "error_code": "RULE_FAIL",
                     "error_message": "; ".join(reasons)[:255],
+                    "created_at": now,
                 })
+                _write(send_logs[-1])
                 continue
 
             # ✅ 여기서 opt-in이 true면 실제 발송 payload(CREATED)
@@ -233,13 +327,14 @@ def node_render_and_write(state: ProductState) -> ProductState:
                     "run_id": run_id,
                     "user_id": uid,
                     "campaign_goal": campaign_goal,
-                    "channel": channel,
+                    "channel": ch,
                     "step_id": "S1",
-                    "candidate_id": candidate_id,
+                    "candidate_id": log_candidate_id,
                     "status": "CREATED",
                     "rendered_text": rendered,
                     "error_code": None,
                     "error_message": None,
+                    "created_at": now,
                 })
             else:
                 # opt-in이 false여도 "완성 텍스트를 보고싶다" 목적을 위해 PREVIEW로 남김
@@ -248,96 +343,253 @@ def node_render_and_write(state: ProductState) -> ProductState:
                     "run_id": run_id,
                     "user_id": uid,
                     "campaign_goal": campaign_goal,
-                    "channel": channel,
+                    "channel": ch,
                     "step_id": "S1",
-                    "candidate_id": candidate_id,
+                    "candidate_id": log_candidate_id,
                     "status": "PREVIEW",
                     "rendered_text": rendered,
                     "error_code": "OPT_OUT_PREVIEW",
                     "error_message": "preview generated although opt-in is false",
+                    "created_at": now,
                 })
+            _write(send_logs[-1])
 
+        new_sink.close()
+        upd_sink.close()
 
-        # ✅ 테스트 반복 시 중복 방지용: 같은 run_id의 기존 로그 제거
-        # 운영에서 '이력 보존'이 필요하면 이 줄을 주석 처리해.
-        db.execute(text("DELETE FROM campaign_send_logs WHERE run_id = :run_id"), {"run_id": run_id})
-
-        if send_logs:
-            insert_sql = text(
-                """
-                INSERT INTO campaign_send_logs
-                (run_id, user_id, campaign_goal, channel, step_id, candidate_id, status, rendered_text, error_code, error_message, created_at)
-                VALUES
-                (:run_id, :user_id, :campaign_goal, :channel, :step_id, :candidate_id, :status, :rendered_text, :error_code, :error_message, :created_at)
-                """
-            )
-            now = _now()
-            for row in send_logs:
-                row["created_at"] = now
-            db.execute(insert_sql, send_logs)
-            db.commit()
-
+        # chunk 결과를 누적하고 checkpoint 저장(로그 commit 이후라 watermark 까지는 DB 에 반영돼 있음)
+        chunk_user_ids = state.get("chunk_user_ids") or []
+        progress = dict(state.get("progress") or {})
         max_preview = int(state.get("max_preview") or 5)
-        preview_texts = []
+        sample = list(progress.get("sample") or [])
         for x in send_logs:
+            if len(sample) >= max_preview:
+                break
             if x.get("status") == "CREATED" and x.get("rendered_text"):
-                preview_texts.append(x["rendered_text"])
-            if len(preview_texts) >= max_preview:
-                wWbreak
+                sample.append(x["rendered_text"])
+        progress.update({
+            "chunks_done": int(progress.get("chunks_done") or 0) + 1,
+            "watermark": chunk_user_ids[-1] if chunk_user_ids else progress.get("watermark"),
+            "processed": int(progress.get("processed") or 0) + len(chunk_user_ids),
+            "users_rendered": int(progress.get("users_rendered") or 0) + len(users),
+            "written": int(progress.get("written") or 0) + new_sink.written + upd_sink.written,
+            "unchanged": int(progress.get("unchanged") or 0) + unchanged_count,
+            "failed": int(progress.get("failed") or 0) + fail_count,
+            "skipped": int(progress.get("skipped") or 0) + skip_count,
+            "rerouted": int(progress.get("rerouted") or 0) + rerouted_count,
+            "by_channel": _add_counts(progress.get("by_channel"), routes.counts()),
+            "sample": sample,
+            "updated_at": _now(),
+        })
+        repo.create_handoff(run_id, ST_PRODUCT_AGENT_PROGRESS, progress)
+
+        # 다음 chunk 로 넘어갈 때 이전 chunk 데이터는 state 에서 비움
+        return {
+            **state,
+            "cursor": int(state.get("cursor") or 0) + len(chunk_user_ids),
+            "progress": progress,
+            "users": [],
+            "recommendations": {},
+            "send_logs": send_logs,
+        }
+    finally:
+        _close(repo)
+
+def _add_counts(a: Optional[Dict[str, int]], b: Dict[str, int]) -> Dict[str, int]:
+    out = dict(a or {})
+    for k, v in b.items():
+        out[k] = int(out.get(k) or 0) + int(v)
+    return out
+
+def _remove_stale_logs(db, run_id: str, user_ids: List[str], candidate_id: str) -> int:
+    """
+    이번 대상/템플릿에서 빠진 (미발송) 로그 정리. 본문은 안 읽고 key 만 조회
+    """
+    audience = set(user_ids)
+    rows = db.execute(
+        text("SELECT send_log_id, user_id, candidate_id FROM campaign_send_logs WHERE run_id = :run_id AND status NOT IN ('SENT', 'SENDING')"),
+        {"run_id": run_id},
+    ).all()
+    stale_ids = [r[0] for r in rows if r[1] not in audience or (r[2] or "") != candidate_id]
+    for i in range(0, len(stale_ids), 1000):
+        db.execute(
+            text("DELETE FROM campaign_send_logs WHERE send_log_id IN :ids").bindparams(
+                bindparam("ids", expanding=True)),
+            {"ids": stale_ids[i:i + 1000]},
+        )
+    db.commit()
+    return len(stale_ids)
+
+def node_finalize(state: ProductState) -> ProductState:
+    repo = _repo()
+    try:
+        run_id = state["run_id"]
+        channel = state.get("channel") or "SMS"
+        campaign_goal = state.get("campaign_goal") or "unknown_goal"
+        selected = state.get("selected_template") or {}
+        user_ids = state.get("user_ids") or []
+        progress = dict(state.get("progress") or {})
+        shard = state.get("shard")
 
+        # sharded worker 는 자기 몫 집계만 돌려주고, 정리/결과 handoff 는 부모가 한 번에
+        removed = 0 if shard else _remove_stale_logs(repo.db, run_id, user_ids, state.get("candidate_id") or "")
 
         summary = {
             "run_id": run_id,
             "channel": channel,
             "campaign_goal": campaign_goal,
             "template_id": selected.get("template_id"),
-            "total_users_in": len(users),
-            "logs_written": len(send_logs),
-            "failed": fail_count,
-            "skipped": skip_count,
-            "sample": preview_texts,
+            "total_users_in": int(progress.get("users_rendered") or 0),
+            "logs_written": int(progress.get("written") or 0),
+            "logs_unchanged": int(progress.get("unchanged") or 0),
+            "logs_removed": removed,
+            "failed": int(progress.get("failed") or 0),
+            "skipped": int(progress.get("skipped") or 0),
+            "rerouted": int(progress.get("rerouted") or 0),
+            "by_channel": dict(progress.get("by_channel") or {}),
+            "chunks": int(progress.get("chunks_done") or 0),
+            "resumed_from": progress.get("resumed_from"),
+            "sample": list(progress.get("sample") or []),
             "created_at": _now(),
         }
+        if shard:
+            summary["shard"] = list(shard)
+        else:
+            _publish_result(repo, run_id, summary)
+        progress.update({"done": True, "updated_at": _now()})
+        repo.create_handoff(run_id, ST_PRODUCT_AGENT_PROGRESS, progress)
 
-        # Template Agent와 stage name 맞춰서 저장
-        repo.create_handoff(run_id, ST_EXECUTION_RESULT, {
-            "final_message_preview": summary["sample"],
-            "used_template_id": summary.get("template_id"),
-            "note": "Per-user send logs are stored in campaign_send_logs.",
-        })
-        repo.create_handoff(run_id, ST_PRODUCT_AGENT_RESULT, summary)
-
-        try:
-            repo.update_run(run_id, step_id="S6_EXEC", status="EXECUTED")
-        except Exception:
-            pass
-
-        return {**state, "send_logs": send_logs, "summary": summary}
+        return {**state, "progress": progress, "summary": summary}
     finally:
         _close(repo)
 
+def _publish_result(repo: Repo, run_id: str, summary: Dict[str, Any]) -> None:
+    # Template Agent와 stage name 맞춰서 저장
+    repo.create_handoff(run_id, ST_EXECUTION_RESULT, {
+        "final_message_preview": summary["sample"],
+        "used_template_id": summary.get("template_id"),
+        "note": "Per-user send logs are stored in campaign_send_logs.",
+    })
+    repo.create_handoff(run_id, ST_PRODUCT_AGENT_RESULT, summary)
+
+    try:
+        repo.update_run(run_id, step_id="S6_EXEC", status="EXECUTED")
+    except Exception:
+        pass
+
+def _latest_progress(repo: Repo, run_id: str, shard: Optional[Sequence[int]] = None) -> Optional[Dict[str, Any]]:
+    # created_at 이 초 단위라 같은 초에 여러 개일 수 있어서 (attempt, chunks_done, done) 최댓값
+    # shard 별 checkpoint 는 payload 의 shard=[index, count] 로 구분
+    want = list(shard) if shard else None
+    best = None
+    best_key = None
+    for h in repo.list_handoffs_by_stage(run_id, ST_PRODUCT_AGENT_PROGRESS):
+        p = h.get("payload_json") or {}
+        if p.get("shard") != want:
+            continue
+        key = (int(p.get("attempt") or 0), int(p.get("chunks_done") or 0), bool(p.get("done")))
+        if best_key is None or key >= best_key:
+            best, best_key = p, key
+    return best
+
+def _start_progress(
+        repo: Repo,
+        run_id: str,
+        total_users: int,
+        resume: bool,
+        shard: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    resume=True 면 마지막 checkpoint 이어서(이미 끝난 attempt 면 남은 chunk 없음), 아니면 새 attempt(처음부터)
+    """
+    last = _latest_progress(repo, run_id, shard)
+    if resume and last:
+        return {**last, "resumed_from": last.get("watermark"), "total_users": total_users}
+
+    progress = {
+        "attempt": int((last or {}).get("attempt") or 0) + 1,
+        "chunks_done": 0,
+        "watermark": None,
+        "processed": 0,
+        "users_rendered": 0,
+        "total_users": total_users,
+        "written": 0,
+        "unchanged": 0,
+        "failed": 0,
+        "skipped": 0,
+        "rerouted": 0,
+        "by_channel": {},
+        "sample": [],
+        "done": False,
+        "shard": list(shard) if shard else None,
+        "started_at": _now(),
+        "updated_at": _now(),
+    }
+    # 첫 chunk 전에 죽어도 이전 attempt 의 checkpoint 로 이어가지 않도록 시작점 기록
+    repo.create_handoff(run_id, ST_PRODUCT_AGENT_PROGRESS, progress)
+    return progress
+
+def _route_chunk(state: ProductState) -> str:
+    if int(state.get("cursor") or 0) < len(state.get("user_ids") or []):
+        return "load_users"
+    return "finalize"
+
 def build_product_graph():
     g = StateGraph(ProductState)
-    g.add_node("load_context", node_load_context)
-    g.add_node("load_users", node_load_users)
-    g.add_node("recommend_products", node_recommend_products)
-    g.add_node("render_and_write", node_render_and_write)
+    g.add_node("load_context", tracing.traced_node("load_context", node_load_context))
+    g.add_node("load_users", tracing.traced_node("load_users", node_load_users))
+    g.add_node("recommend_products", tracing.traced_node("recommend_products", node_recommend_products))
+    g.add_node("render_and_write", tracing.traced_node("render_and_write", node_render_and_write))
+    g.add_node("finalize", tracing.traced_node("finalize", node_finalize))
 
+    # load_users → recommend_products → render_and_write 를 chunk 마다 반복
     g.set_entry_point("load_context")
-    g.add_edge("load_context", "load_users")
+    g.add_conditional_edges("load_context", _route_chunk, {"load_users": "load_users", "finalize": "finalize"})
     g.add_edge("load_users", "recommend_products")
     g.add_edge("recommend_products", "render_and_write")
-    g.add_edge("render_and_write", END)
+    g.add_conditional_edges("render_and_write", _route_chunk, {"load_users": "load_users", "finalize": "finalize"})
+    g.add_edge("finalize", END)
     return g.compile()
 
 GRAPH = build_product_graph()
-
-def run_product_agent(run_id: str, top_k_products: int = 3, ignore_opt_in: bool = True, max_preview: int = 5) -> Dict[str, Any]:
+GRAPH_RECURSION_LIMIT = 1_000_000
+
+def run_product_agent(
+        run_id: str,
+        top_k_products: int = 3,
+        ignore_opt_in: bool = True,
+        max_preview: int = 5,
+        resume: bool = False,
+        chunk_size: Optional[int] = None,
+        shard: Optional[Sequence[int]] = None,
+        routing: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    resume=True: 마지막 PRODUCT_AGENT_PROGRESS checkpoint 다음 chunk 부터 이어서 실행
+    routing="fallback": run 채널 opt-in 이 없는 사용자도 opt-in 된 다른 채널로 CREATED (services/routing.py)
+    shard=(index, count): user_id hash 가 index 인 사용자만 처리(결과 handoff 없이 summary 만) → sharding.py
+    """
     init: ProductState = {
         "run_id": run_id,
         "top_k_products": int(top_k_products),
         "ignore_opt_in": bool(ignore_opt_in),
         "max_preview": int(max_preview),
+        "resume": bool(resume),
+        "chunk_size": int(chunk_size or PRODUCT_AGENT_CHUNK_SIZE),
+        "routing": (routing or PRODUCT_AGENT_ROUTING).strip().lower(),
     }
-    return GRAPH.invoke(init)
+    if shard:
+        init["shard"] = (int(shard[0]), int(shard[1]))
+    tr = None
+    try:
+        with tracing.trace(run_id, "product.shard" if shard else "product.run") as tr:
+            # chunk 하나에 3 step 이라 기본 recursion_limit(25)로는 부족
+            return GRAPH.invoke(init, config={"recursion_limit": GRAPH_RECURSION_LIMIT})
+    finally:
+        if tr is not None:
+            repo = _repo()
+            try:
+                tracing.save_perf(repo, tr)
+            finally:
+                _close(repo)
 
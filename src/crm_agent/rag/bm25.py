@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+INDEX_DIR = Path(__file__).parent / "index"
+DEFAULT_INDEX_PATH = INDEX_DIR / "bm25.json"
+
+# RRF 상수(논문 기본값). 클수록 하위 순위의 영향이 커짐
+RRF_K = 60
+
+_WORD_RE = re.compile(r"[0-9a-z%]+|[가-힣]+")
+_HANGUL_RE = re.compile(r"^[가-힣]+$")
+
+# 자주 붙는 조사/어미(긴 것부터 검사). 형태소 분석기 없이 어간을 근사
+_JOSA = sorted(
+    [
+        "에서는", "으로는", "에게서", "까지는", "이라는", "라는",
+        "에서", "으로", "에게", "까지", "부터", "보다", "처럼", "하고", "이나", "이랑",
+        "은", "는", "이", "가", "을", "를", "에", "의", "도", "만", "로", "와", "과", "랑",
+    ],
+    key=len,
+    reverse=True,
+)
+
+
+def _strip_josa(w: str) -> str:
+    for j in _JOSA:
+        if len(w) > len(j) + 1 and w.endswith(j):
+            return w[: -len(j)]
+    return w
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    한국어 친화 토크나이저(외부 형태소 분석기 없음).
+    - 영문/숫자: 소문자 단어 그대로 ("100%" 유지)
+    - 한글: 조사 제거한 어간 + 2-gram (붙여쓰기/활용형 차이에도 부분 매칭)
+    """
+    out: List[str] = []
+    for m in _WORD_RE.finditer((text or "").lower()):
+        w = m.group(0)
+        if not _HANGUL_RE.match(w):
+            out.append(w)
+            continue
+        w = _strip_josa(w)
+        out.append(w)
+        if len(w) > 2:
+            out.extend(w[i: i + 2] for i in range(len(w) - 1))
+    return out
+
+
+def _match_filter(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    Pinecone filter 문법 중 단순 케이스만 지원: {"k": v}, {"k": {"$eq": v}}, {"k": {"$in": [...]}}
+    """
+    if not filters:
+        return True
+    for k, cond in filters.items():
+        v = metadata.get(k)
+        if isinstance(cond, dict):
+            if "$eq" in cond and v != cond["$eq"]:
+                return False
+            if "$in" in cond and v not in cond["$in"]:
+                return False
+            if "$ne" in cond and v == cond["$ne"]:
+                return False
+        elif v != cond:
+            return False
+    return True
+
+
+class BM25Index:
+    """
+    in-process inverted index (Okapi BM25).
+    ingest 시점에 chunk(id/text/metadata)로 만들어 json으로 저장하고,
+    retriever가 로드해서 vector 결과와 RRF로 합침.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.avgdl = 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str, Dict[str, Any]]], **kwargs) -> "BM25Index":
+        idx = cls(**kwargs)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc_id, text, metadata in docs:
+            i = len(idx.ids)
+            tf = Counter(tokenize(text))
+            for term, n in tf.items():
+                postings[term].append((i, n))
+            idx.ids.append(doc_id)
+            idx.metadata.append({**(metadata or {}), "text": text})
+            idx.doc_len.append(sum(tf.values()))
+        idx.postings = dict(postings)
+        idx.avgdl = (sum(idx.doc_len) / len(idx.doc_len)) if idx.doc_len else 0.0
+        return idx
+
+    def _idf(self, df: int) -> float:
+        n = len(self.ids)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def search(
+            self,
+            query: str,
+            top_k: int = 10,
+            filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        if not self.ids:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        avgdl = self.avgdl or 1.0
+        for term, qtf in Counter(tokenize(query)).items():
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self._idf(len(plist))
+            for i, tf in plist:
+                denom = tf + self.k1 * (1 - self.b + self.b * self.doc_len[i] / avgdl)
+                scores[i] += idf * tf * (self.k1 + 1) / denom
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        out: List[Dict[str, Any]] = []
+        for i, s in ranked:
+            md = self.metadata[i]
+            if not _match_filter(md, filters):
+                continue
+            out.append({"id": self.ids[i], "score": float(s), "metadata": md})
+            if len(out) >= top_k:
+                break
+        return out
+
+    # ---------------------------
+    # persistence
+    # ---------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "metadata": self.metadata,
+            "doc_len": self.doc_len,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "BM25Index":
+        idx = cls(k1=float(d.get("k1", 1.2)), b=float(d.get("b", 0.75)))
+        idx.ids = list(d.get("ids") or [])
+        idx.metadata = list(d.get("metadata") or [])
+        idx.doc_len = [int(x) for x in (d.get("doc_len") or [])]
+        idx.postings = {t: [(int(i), int(n)) for i, n in pl] for t, pl in (d.get("postings") or {}).items()}
+        idx.avgdl = (sum(idx.doc_len) / len(idx.doc_len)) if idx.doc_len else 0.0
+        return idx
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        path = Path(path or index_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "BM25Index":
+        path = Path(path or index_path())
+        return cls.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+
+def index_path() -> Path:
+    p = os.getenv("BM25_INDEX_PATH", "").strip()
+    return Path(p) if p else DEFAULT_INDEX_PATH
+
+
+_CACHE_LOCK = threading.Lock()
+_CACHE: Dict[str, Tuple[float, BM25Index]] = {}
+
+
+def load_index(path: Optional[Path] = None) -> Optional[BM25Index]:
+    """
+    저장된 index를 로드(mtime이 바뀌면 다시 로드). 파일이 없으면
+    로컬 코퍼스로 즉석 생성(네트워크 호출 없음, chunk id는 ingest와 동일).
+    """
+    path = Path(path or index_path())
+    key = str(path)
+    with _CACHE_LOCK:
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            mtime = -1.0
+
+        hit = _CACHE.get(key)
+        if hit and hit[0] == mtime:
+            return hit[1]
+
+        try:
+            if mtime >= 0:
+                idx = BM25Index.load(path)
+            else:
+                from crm_agent.rag.ingest import build_chunks, load_corpus
+                idx = BM25Index.build((c.id, c.text, c.metadata) for c in build_chunks(load_corpus()))
+        except Exception:
+            return None
+
+        _CACHE[key] = (mtime, idx)
+        return idx
+
+
+def rrf_fuse(
+        ranked_lists: Sequence[Sequence[Dict[str, Any]]],
+        *,
+        k: int = RRF_K,
+        top_k: int = 10,
+        names: Sequence[str] = ("vector", "bm25"),
+) -> List[Dict[str, Any]]:
+    """
+    Reciprocal Rank Fusion: score(d) = Σ 1 / (k + rank_i(d)).
+    - score는 0~1로 정규화(모든 리스트에서 1위면 1.0)
+    - 각 리스트의 원 점수는 f"{name}_score" 로 보존
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for li, lst in enumerate(ranked_lists):
+        name = names[li] if li < len(names) else f"list{li}"
+        for rank, m in enumerate(lst, start=1):
+            doc_id = m.get("id", "")
+            if not doc_id:
+                continue
+            cur = fused.get(doc_id)
+            if cur is None:
+                cur = {"id": doc_id, "rrf": 0.0, "metadata": m.get("metadata") or {}}
+                fused[doc_id] = cur
+            elif not cur["metadata"].get("text") and (m.get("metadata") or {}).get("text"):
+                cur["metadata"] = m.get("metadata")
+            cur["rrf"] += 1.0 / (k + rank)
+            cur[f"{name}_score"] = float(m.get("score", 0.0))
+            cur[f"{name}_rank"] = rank
+
+    n_lists = max(1, len([x for x in ranked_lists if x]))
+    best = n_lists / (k + 1)
+    out = sorted(fused.values(), key=lambda x: x["rrf"], reverse=True)[:top_k]
+    for m in out:
+        m["score"] = m.pop("rrf") / best
+    return out
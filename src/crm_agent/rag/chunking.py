@@ -1,39 +1,229 @@
+from __future__ import annotations
+
 import re
+import hashlib
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from crm_agent.services.tokens import count_tokens, truncate_to_tokens
+
+
+# 임베딩 모델(text-embedding-3-small) 토큰 기준
+DEFAULT_MAX_TOKENS = 300
+DEFAULT_OVERLAP_TOKENS = 40
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)\s*$")
+# 문장 경계: 마침표/물음표/느낌표(+닫는 따옴표/괄호) 뒤 공백
+_SENTENCE_RE = re.compile(r"(?<=[.!?。…])\s+|(?<=[.!?。…][\"”’)\]])\s+")
+
 
 @dataclass
-class Chunk:
-    chunk_id: str
+class SectionChunk:
+    section: str
     text: str
-    meta: dict
+    tokens: int
+
+
+def _clean_text(s: str) -> str:
+    s = s.replace("\r\n", "\n").strip()
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    return s
 
-def simple_chunk(text: str, meta: dict, base_id: str, max_chars: int = 1200, overlap: int = 150) -> list[Chunk]:
-    sentences = re.split(r"(?<=[.!?\n])\s+", text.strip())
-    chunks = []
-    buf = ""
 
-    for s in sentences:
-        if not s:
+# -----------------------------
+# markdown sections (streaming)
+# -----------------------------
+def iter_markdown_sections(lines: Iterable[str]) -> Iterator[Tuple[str, List[str], str]]:
+    """
+    줄 단위로 읽으면서 (section_title, heading_path, body) 를 순서대로 yield.
+    - 파일 전체를 메모리에 올리지 않음(큰 md도 섹션 단위로 흘려보냄)
+    - heading_path: 상위 heading 줄까지 포함(예: ["# Channel Policy", "## SMS"])
+    - 본문이 없는 heading(예: "# Brand Guide")은 단독 chunk를 만들지 않고 하위 섹션의 path로만 남음
+    """
+    title = "ROOT"
+    path: List[Tuple[int, str]] = []   # (level, heading line)
+    body: List[str] = []
+
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        m = _HEADING_RE.match(line)
+        if not m:
+            body.append(line)
             continue
-        if len(buf) + len(s) + 1 <= max_chars:
-            buf = (buf + " " + s).strip()
-        else:
-            if buf:
-                chunks.append(buf)
-            buf = s
 
-    if buf:
-        chunks.append(buf)
+        text = _clean_text("\n".join(body))
+        if text:
+            yield title, [h for _, h in path], text
+
+        level = len(m.group(1))
+        path = [(lv, h) for lv, h in path if lv < level] + [(level, line.strip())]
+        title = (m.group(2) or "").strip() or "UNTITLED"
+        body = []
 
+    text = _clean_text("\n".join(body))
+    if text:
+        yield title, [h for _, h in path], text
+
+
+def split_markdown_sections(md: str) -> List[Tuple[str, str]]:
+    """
+    (section_title, section_text) 리스트. section_text는 heading 줄을 포함.
+    """
     out = []
-    for i, c in enumerate(chunks):
-        if overlap > 0 and i > 0:
-            prev_tail = chunks[i - 1][-overlap:]
-            c = (prev_tail + " " + c).strip()
-
-        out.append(Chunk(
-            chunk_id=f"{base_id}__{i:04d}",
-            text=c,
-            meta={**meta, "chunk_index": i},
-        ))
+    for title, headings, body in iter_markdown_sections(md.splitlines()):
+        out.append((title, "\n".join(headings + [body]).strip()))
     return out
+
+
+# -----------------------------
+# token-budgeted packing
+# -----------------------------
+# (unit_text, tokens, 앞 unit과의 구분자)
+_Unit = Tuple[str, int, str]
+
+
+def _split_units(text: str, max_tokens: int, model: Optional[str]) -> List[_Unit]:
+    """
+    본문을 unit 리스트로 분해.
+    줄 → 문장 → 단어 순으로, budget을 넘는 경우에만 더 잘게 쪼갬.
+    (문자 윈도우처럼 단어/한글 문장 중간을 자르지 않음)
+    """
+    units: List[_Unit] = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        n = count_tokens(line, model)
+        if n <= max_tokens:
+            units.append((line, n, "\n"))
+            continue
+
+        sep = "\n"
+        for sent in _SENTENCE_RE.split(line):
+            sent = sent.strip()
+            if not sent:
+                continue
+            n = count_tokens(sent, model)
+            if n <= max_tokens:
+                units.append((sent, n, sep))
+                sep = " "
+                continue
+
+            # 문장 하나가 budget보다 큼 → 단어 경계에서 자름
+            rest = sent
+            while rest:
+                head = truncate_to_tokens(rest, max_tokens, model)
+                if not head:
+                    break
+                units.append((head, count_tokens(head, model), sep))
+                sep = " "
+                rest = rest[len(head):].strip()
+    return units
+
+
+def _join_units(units: List[_Unit]) -> str:
+    parts: List[str] = []
+    for i, (t, _, sep) in enumerate(units):
+        if i:
+            parts.append(sep)
+        parts.append(t)
+    return "".join(parts)
+
+
+def chunk_section(
+        body: str,
+        *,
+        header: str = "",
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+        model: Optional[str] = None,
+) -> List[SectionChunk]:
+    """
+    섹션 본문을 토큰 budget 안에서 문장 단위로 채워 넣음.
+    - header(heading 줄)는 모든 chunk 앞에 붙여 문맥 유지(토큰 budget에 포함)
+    - overlap은 "직전 chunk의 마지막 문장들"을 overlap_tokens 이내로만 이어붙임
+    - 섹션이 budget 안에 들어가면 overlap 없이 1개
+    """
+    header = header.strip()
+    header_tokens = count_tokens(header, model) + (1 if header else 0)
+    budget = max(16, max_tokens - header_tokens)
+
+    units = _split_units(body, budget, model)
+    if not units:
+        return []
+
+    packs: List[List[_Unit]] = []
+    cur: List[_Unit] = []
+    cur_tokens = 0
+    carried = 0  # cur 앞부분 중 overlap으로 들어온 unit 수
+
+    for u in units:
+        if cur and cur_tokens + u[1] + 1 > budget:
+            packs.append(cur)
+            # overlap: 뒤에서부터 whole unit만
+            tail: List[_Unit] = []
+            t = 0
+            for prev in reversed(cur):
+                if t + prev[1] > overlap_tokens:
+                    break
+                tail.insert(0, prev)
+                t += prev[1] + 1
+            if t + u[1] + 1 > budget:
+                tail, t = [], 0
+            cur, cur_tokens, carried = tail, t, len(tail)
+        cur.append(u)
+        cur_tokens += u[1] + 1
+
+    # 마지막 pack이 overlap만으로 이뤄지면 버림(중복 embed 방지)
+    if cur and len(cur) > carried:
+        packs.append(cur)
+
+    out: List[SectionChunk] = []
+    for pack in packs:
+        text = _join_units(pack)
+        if header:
+            text = header + "\n" + text
+        out.append(SectionChunk(section="", text=text, tokens=count_tokens(text, model)))
+    return out
+
+
+def _fingerprint(text: str) -> str:
+    norm = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+def iter_chunks(
+        lines: Iterable[str],
+        *,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+        model: Optional[str] = None,
+        seen: Optional[Set[str]] = None,
+) -> Iterator[SectionChunk]:
+    """
+    md 줄 스트림 → SectionChunk 스트림 (ingest/retriever 공용 chunking 엔진).
+    같은 본문 chunk는 한 번만 내보냄(기본은 이 스트림 안에서만, seen을 넘기면 그 set 기준).
+    """
+    seen = seen if seen is not None else set()
+    for title, headings, body in iter_markdown_sections(lines):
+        header = "\n".join(headings)
+        for c in chunk_section(
+                body,
+                header=header,
+                max_tokens=max_tokens,
+                overlap_tokens=overlap_tokens,
+                model=model,
+        ):
+            fp = _fingerprint(c.text[len(header):] if header else c.text)
+            if fp in seen:
+                continue
+            seen.add(fp)
+            c.section = title
+            yield c
+
+
+def iter_file_chunks(path: Path, **kwargs) -> Iterator[SectionChunk]:
+    with open(path, "r", encoding="utf-8") as f:
+        yield from iter_chunks(f, **kwargs)
+
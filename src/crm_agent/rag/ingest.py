@@ -1,17 +1,25 @@
 from __future__ import annotations
 
 import os
-import re
+import time
+import queue
 import hashlib
 import argparse
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Optional
 
 from dotenv import load_dotenv
 from openai import OpenAI
 from pinecone import Pinecone
 
+from crm_agent.rag.bm25 import BM25Index
+from crm_agent.rag.chunking import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_file_chunks
+from crm_agent.services.rate_limit import get_gate, retry_call
+from crm_agent.services.tokens import count_tokens
+
 
 CORPUS_DIR = Path(__file__).parent / "corpus"
 
@@ -20,65 +28,7 @@ CORPUS_DIR = Path(__file__).parent / "corpus"
 class Chunk:
     id: str
     text: str
-    metadata: Dict[str, str]
-
-
-def _clean_text(s: str) -> str:
-    s = s.replace("\r\n", "\n").strip()
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s
-
-
-def _split_markdown_into_sections(md: str) -> List[Tuple[str, str]]:
-    """
-    (section_title, section_text) 리스트로 분할.
-    간단히 #~###### heading을 기준으로 섹션을 나눔.
-    """
-    lines = md.splitlines()
-    sections: List[Tuple[str, List[str]]] = []
-    current_title = "ROOT"
-    current_buf: List[str] = []
-
-    heading_re = re.compile(r"^(#{1,6})\s+(.*)\s*$")
-
-    for line in lines:
-        m = heading_re.match(line)
-        if m:
-            if current_buf:
-                sections.append((current_title, current_buf))
-            current_title = (m.group(2) or "").strip() or "UNTITLED"
-            current_buf = [line]
-        else:
-            current_buf.append(line)
-
-    if current_buf:
-        sections.append((current_title, current_buf))
-
-    return [(title, _clean_text("\n".join(buf))) for title, buf in sections]
-
-
-def _chunk_text(text: str, max_chars: int = 1200, overlap: int = 150) -> List[str]:
-    """
-    문자 기반 chunking + overlap.
-    """
-    text = _clean_text(text)
-    if not text:
-        return []
-
-    if len(text) <= max_chars:
-        return [text]
-
-    chunks: List[str] = []
-    start = 0
-    while start < len(text):
-        end = min(start + max_chars, len(text))
-        part = text[start:end].strip()
-        if part:
-            chunks.append(part)
-        if end == len(text):
-            break
-        start = max(0, end - overlap)
-    return chunks
+    metadata: Dict[str, Any]
 
 
 def _stable_id(source: str, idx: int, text: str) -> str:
@@ -86,9 +36,10 @@ def _stable_id(source: str, idx: int, text: str) -> str:
     return f"{Path(source).stem}_{idx:03d}_{h}"
 
 
-def load_corpus(only_files: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+def load_corpus(only_files: Optional[List[str]] = None) -> List[Tuple[str, Path]]:
     """
-    Returns list of (filename, markdown_text) where markdown_text is non-empty.
+    Returns list of (filename, path) for non-empty md files.
+    본문은 읽지 않음 → build_chunks 가 파일을 줄 단위로 흘려 읽음
 
     only_files:
       - None: CORPUS_DIR/*.md 전체 로드
@@ -116,17 +67,15 @@ def load_corpus(only_files: Optional[List[str]] = None) -> List[Tuple[str, str]]
                 seen.add(n)
                 only_files.append(n)
 
-        items: List[Tuple[str, str]] = []
+        items: List[Tuple[str, Path]] = []
         missing = []
         for name in only_files:
             fp = CORPUS_DIR / name
             if not fp.exists():
                 missing.append(name)
                 continue
-            raw = fp.read_text(encoding="utf-8")
-            text = raw.strip()
-            if text:
-                items.append((fp.name, text))
+            if fp.stat().st_size:
+                items.append((fp.name, fp))
         if missing:
             raise FileNotFoundError(
                 f"요청한 md 파일을 찾을 수 없습니다: {missing}\n"
@@ -135,37 +84,188 @@ def load_corpus(only_files: Optional[List[str]] = None) -> List[Tuple[str, str]]
         return items
 
     files = sorted(CORPUS_DIR.glob("*.md"))
-    items: List[Tuple[str, str]] = []
-    for fp in files:
-        raw = fp.read_text(encoding="utf-8")
-        text = raw.strip()
-        if text:
-            items.append((fp.name, text))
-    return items
+    return [(fp.name, fp) for fp in files if fp.stat().st_size]
 
 
-def build_chunks(corpus: List[Tuple[str, str]]) -> List[Chunk]:
+def build_chunks(
+        corpus: List[Tuple[str, Path]],
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> List[Chunk]:
+    """
+    rag/chunking 엔진(토큰 budget + md 섹션 단위)으로 chunk 생성.
+    중복 본문 제거는 파일 안에서만 → chunk id 가 그 파일 내용만으로 정해짐
+    (--files 로 일부만 ingest 해도 전체 build 의 BM25 id 와 같음)
+    """
     all_chunks: List[Chunk] = []
 
-    for source, md in corpus:
-        sections = _split_markdown_into_sections(md)
+    for source, path in corpus:
         chunk_idx = 0
-
-        for title, sec_text in sections:
-            parts = _chunk_text(sec_text, max_chars=1200, overlap=150)
-            for part in parts:
-                cid = _stable_id(source, chunk_idx, part)
-                meta = {
-                    "source": source,
-                    "section": title,
-                    "chunk_id": str(chunk_idx),
-                }
-                all_chunks.append(Chunk(id=cid, text=part, metadata=meta))
-                chunk_idx += 1
+        for c in iter_file_chunks(path, max_tokens=max_tokens, overlap_tokens=overlap_tokens):
+            cid = _stable_id(source, chunk_idx, c.text)
+            meta = {
+                "source": source,
+                "section": c.section,
+                "chunk_id": str(chunk_idx),
+                "tokens": c.tokens,
+            }
+            all_chunks.append(Chunk(id=cid, text=c.text, metadata=meta))
+            chunk_idx += 1
 
     return all_chunks
 
 
+# -----------------------------
+# embed → upsert pipeline
+# -----------------------------
+EMBED_BATCH = 96
+UPSERT_BATCH = 200
+
+@dataclass
+class PipelineStats:
+    chunks: int = 0
+    vectors: int = 0
+    embed_batches: int = 0
+    upsert_batches: int = 0
+    retries: int = 0
+    embed_sec: float = 0.0
+    upsert_sec: float = 0.0
+    wall_sec: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        wall = self.wall_sec if self.wall_sec > 0 else 1e-9
+        d["vectors_per_sec"] = round(self.vectors / wall, 2)
+        # embed/upsert 누적시간이 wall보다 크면 그만큼 겹쳐서(동시에) 돌았다는 뜻
+        d["overlap_ratio"] = round((self.embed_sec + self.upsert_sec) / wall, 2)
+        for k in ("embed_sec", "upsert_sec", "wall_sec"):
+            d[k] = round(d[k], 3)
+        return d
+
+
+def _iter_batches(items: List[Any], size: int) -> Iterator[List[Any]]:
+    size = max(1, int(size))
+    for b in range(0, len(items), size):
+        yield items[b: b + size]
+
+
+def run_ingest_pipeline(
+        chunks: List[Chunk],
+        *,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        upsert_fn: Callable[[List[Dict[str, Any]]], Any],
+        embed_batch: int = EMBED_BATCH,
+        upsert_batch: int = UPSERT_BATCH,
+        embed_workers: int = 2,
+        upsert_workers: int = 4,
+        max_inflight: int = 8,
+        max_retries: int = 5,
+) -> PipelineStats:
+    """
+    임베딩 배치를 만드는 즉시 upsert 워커로 흘려보내는 bounded producer/consumer.
+    - 전체 vectors를 메모리에 모으지 않음
+      (최대 max_inflight개 upsert 배치 + 진행중인 embed 배치만 메모리에 존재)
+    - 큐가 가득 차면 embed 워커가 대기(backpressure) → upsert가 느려도 메모리 고정
+    - 429/5xx는 rate_limit.retry_call로 재시도(jitter backoff, retry-after 우선), 재시도 횟수는 stats.retries에 누적
+    """
+    stats = PipelineStats(chunks=len(chunks))
+    lock = threading.Lock()
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    q: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=max(1, int(max_inflight)))
+    embed_slots = threading.BoundedSemaphore(max(1, int(embed_workers)) * 2)
+
+    def _on_retry(e: Exception, attempt: int, delay: float) -> None:
+        with lock:
+            stats.retries += 1
+
+    def _fail(e: BaseException) -> None:
+        with lock:
+            errors.append(e)
+        stop.set()
+
+    def _put(item: List[Dict[str, Any]]) -> None:
+        # stop 신호를 확인하면서 대기 (consumer가 죽었을 때 deadlock 방지)
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _embed(batch: List[Chunk]) -> None:
+        try:
+            if stop.is_set():
+                return
+            t0 = time.perf_counter()
+            embs = retry_call(
+                embed_fn, [c.text for c in batch], max_retries=max_retries, on_retry=_on_retry
+            )
+            with lock:
+                stats.embed_batches += 1
+                stats.embed_sec += time.perf_counter() - t0
+
+            vectors = []
+            for c, values in zip(batch, embs):
+                meta = dict(c.metadata)
+                # ✅ 추적 핵심: 원문 chunk를 metadata에 저장
+                meta["text"] = c.text
+                vectors.append({"id": c.id, "values": values, "metadata": meta})
+
+            for part in _iter_batches(vectors, upsert_batch):
+                _put(part)
+        except BaseException as e:
+            _fail(e)
+        finally:
+            embed_slots.release()
+
+    def _upsert_worker() -> None:
+        while True:
+            item = q.get()
+            try:
+                if item is None:
+                    return
+                if stop.is_set():
+                    continue
+                t0 = time.perf_counter()
+                retry_call(upsert_fn, item, max_retries=max_retries, on_retry=_on_retry)
+                with lock:
+                    stats.upsert_batches += 1
+                    stats.vectors += len(item)
+                    stats.upsert_sec += time.perf_counter() - t0
+            except BaseException as e:
+                _fail(e)
+            finally:
+                q.task_done()
+
+    t_start = time.perf_counter()
+    consumers = [
+        threading.Thread(target=_upsert_worker, name=f"upsert-{i}", daemon=True)
+        for i in range(max(1, int(upsert_workers)))
+    ]
+    for t in consumers:
+        t.start()
+
+    with ThreadPoolExecutor(max_workers=max(1, int(embed_workers)), thread_name_prefix="embed") as pool:
+        for batch in _iter_batches(chunks, embed_batch):
+            embed_slots.acquire()
+            if stop.is_set():
+                embed_slots.release()
+                break
+            pool.submit(_embed, batch)
+
+    for _ in consumers:
+        q.put(None)
+    for t in consumers:
+        t.join()
+
+    stats.wall_sec = time.perf_counter() - t_start
+    if errors:
+        raise RuntimeError(f"ingest pipeline 실패: {errors[0]!r}") from errors[0]
+    return stats
+
+
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Ingest md corpus into Pinecone (RAG).")
     p.add_argument(
@@ -175,6 +275,14 @@ def parse_args() -> argparse.Namespace:
         help="업서트할 md 파일명만 지정 (예: --files amoremall.md innisfree.md). "
              "미지정 시 corpus/*.md 전체 업서트",
     )
+    p.add_argument("--chunk-tokens", type=int, default=DEFAULT_MAX_TOKENS, help="chunk당 최대 토큰 수")
+    p.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS, help="chunk 간 overlap 토큰 상한")
+    p.add_argument("--embed-batch", type=int, default=EMBED_BATCH, help="임베딩 요청 1회당 chunk 수")
+    p.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH, help="upsert 요청 1회당 vector 수")
+    p.add_argument("--embed-workers", type=int, default=2, help="동시 임베딩 요청 수")
+    p.add_argument("--upsert-workers", type=int, default=4, help="동시 upsert 요청 수")
+    p.add_argument("--max-inflight", type=int, default=8, help="메모리에 대기 가능한 upsert 배치 수(backpressure)")
+    p.add_argument("--max-retries", type=int, default=5, help="429/5xx 재시도 횟수")
     return p.parse_args()
 
 
@@ -202,7 +310,7 @@ def main():
             f"→ md 파일에 내용을 채운 뒤 다시 실행하세요."
         )
 
-    chunks = build_chunks(corpus)
+    chunks = build_chunks(corpus, max_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens)
     if not chunks:
         raise RuntimeError("chunk 결과가 0개입니다. 코퍼스 내용을 확인하세요.")
 
@@ -217,35 +325,37 @@ def main():
 
     idx = pc.Index(index_name)
 
-    oa = OpenAI(api_key=openai_key)
-
-    # embeddings 생성
-    texts = [c.text for c in chunks]
-    vectors = []
-
-    BATCH = 96
-    for b in range(0, len(texts), BATCH):
-        batch_texts = texts[b: b + BATCH]
-        emb_res = oa.embeddings.create(model=embed_model, input=batch_texts).data
-
-        for j, e in enumerate(emb_res):
-            c = chunks[b + j]
-            meta = dict(c.metadata)
-            # ✅ 추적 핵심: 원문 chunk를 metadata에 저장
-            meta["text"] = c.text
-
-            vectors.append(
-                {
-                    "id": c.id,
-                    "values": e.embedding,
-                    "metadata": meta,
-                }
-            )
+    # 재시도는 pipeline(retry_call)에서만. 임베딩 호출은 RPM/TPM bucket + 적응형 동시성(gate) 통과
+    oa = OpenAI(api_key=openai_key, max_retries=0)
+    embed_gate = get_gate("openai-embed")
+
+    def _embed_batch(batch_texts: List[str]) -> List[List[float]]:
+        raw = embed_gate.call(
+            lambda: oa.embeddings.with_raw_response.create(model=embed_model, input=batch_texts),
+            tokens=sum(count_tokens(t) for t in batch_texts),
+            headers_of_result=lambda r: dict(r.headers),
+        )
+        return [e.embedding for e in raw.parse().data]
+
+    # embed → upsert 파이프라인 (임베딩 배치가 바로 upsert 워커로 흘러감)
+    pstats = run_ingest_pipeline(
+        chunks,
+        embed_fn=_embed_batch,
+        upsert_fn=lambda vectors: idx.upsert(vectors=vectors, namespace=namespace),
+        embed_batch=args.embed_batch,
+        upsert_batch=args.upsert_batch,
+        embed_workers=args.embed_workers,
+        upsert_workers=args.upsert_workers,
+        max_inflight=args.max_inflight,
+        max_retries=args.max_retries,
+    )
 
-    # upsert
-    UPSERT_BATCH = 200
-    for b in range(0, len(vectors), UPSERT_BATCH):
-        idx.upsert(vectors=vectors[b: b + UPSERT_BATCH], namespace=namespace)
+    # keyword 검색용 BM25 index도 같은 chunk(id)로 생성 → retriever가 RRF로 합침
+    # (--files로 일부만 upsert해도 index는 로컬 코퍼스 전체 기준으로 다시 만듦)
+    bm25_chunks = chunks
+    if args.files:
+        bm25_chunks = build_chunks(load_corpus(), max_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens)
+    bm25_path = BM25Index.build((c.id, c.text, c.metadata) for c in bm25_chunks).save()
 
     stats = idx.describe_index_stats()
 
@@ -254,6 +364,8 @@ def main():
     print(f"- namespace: {namespace}")
     print(f"- files: {[name for name, _ in corpus]}")
     print(f"- chunks: {len(chunks)}")
+    print(f"- pipeline: {pstats.as_dict()}")
+    print(f"- bm25 index: {bm25_path}")
     print(stats)
 
 
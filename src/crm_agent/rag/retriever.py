@@ -8,6 +8,15 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from pinecone import Pinecone
 
+from crm_agent.rag.bm25 import load_index, rrf_fuse
+from crm_agent.services import tracing
+from crm_agent.services.rate_limit import get_gate, retry_call
+from crm_agent.services.singleflight import SingleFlight
+from crm_agent.services.tokens import count_tokens
+
+# 같은 query embedding이 동시에 요청되면 1번만 호출
+_EMBED_FLIGHT = SingleFlight("embed")
+
 
 class RagRetriever:
     def __init__(self):
@@ -27,23 +36,87 @@ class RagRetriever:
 
         self.pc = Pinecone(api_key=self.pinecone_key)
         self.idx = self.pc.Index(self.index_name)
-        self.oa = OpenAI(api_key=self.openai_key)
+        # 재시도는 retry_call에서(SDK 재시도 끔)
+        self.oa = OpenAI(api_key=self.openai_key, max_retries=0)
+
+        # ✅ hybrid(BM25 + vector) 기본 on. index 로드 실패 시 vector-only로 동작
+        self.hybrid = os.getenv("RAG_HYBRID", "1").strip().lower() not in ("0", "false", "no")
+
+    @property
+    def bm25(self):
+        # 매 검색마다 load_index(mtime cache) → 프로세스가 오래 떠 있어도 재-ingest 한 index 를 바로 씀
+        return load_index() if self.hybrid else None
 
     def retrieve(
         self,
         query: str,
         filters: Optional[Dict[str, Any]] = None,
-        top_k: int = 10,
+        top_k: int = 6,
+        candidates: Optional[int] = None,
     ) -> Dict[str, Any]:
-        q_emb = self.oa.embeddings.create(model=self.embed_model, input=query).data[0].embedding
+        """
+        vector(Pinecone) + keyword(BM25, in-process) 결과를 RRF로 합쳐 top_k 반환.
+        - candidates: 각 검색기에서 뽑을 후보 수(기본 top_k*2)
+        - BM25는 로컬 index라 네트워크 호출이 늘지 않음
+        """
+        n_cand = max(int(candidates or top_k * 2), top_k)
+        bm25 = self.bm25
+        vector_matches = self._vector_search(query, filters=filters, top_k=n_cand if bm25 else top_k)
+
+        if not bm25:
+            return {
+                "query": query,
+                "top_k": top_k,
+                "namespace": self.namespace,
+                "mode": "vector",
+                "matches": vector_matches,
+            }
+
+        with tracing.span("bm25.search", kind="internal", top_k=n_cand):
+            keyword_matches = bm25.search(query, top_k=n_cand, filters=filters)
+        matches = rrf_fuse([vector_matches, keyword_matches], top_k=top_k, names=("vector", "bm25"))
+
+        return {
+            "query": query,
+            "top_k": top_k,
+            "namespace": self.namespace,
+            "mode": "hybrid",
+            "matches": matches,
+        }
+
+    def _embed(self, query: str) -> List[float]:
+        gate = get_gate("openai-embed")
+
+        def _call() -> List[float]:
+            with tracing.span("openai.embeddings", kind="embed", model=self.embed_model):
+                return retry_call(
+                    lambda: gate.call(
+                        lambda: self.oa.embeddings.create(model=self.embed_model, input=query).data[0].embedding,
+                        tokens=count_tokens(query),
+                    ),
+                    max_retries=3,
+                    base_delay=0.5,
+                    max_delay=10.0,
+                )
 
-        res = self.idx.query(
-            vector=q_emb,
-            top_k=top_k,
-            namespace=self.namespace,
-            include_metadata=True,
-            filter=filters or None,
-        )
+        return _EMBED_FLIGHT.do((self.embed_model, query), _call)
+
+    def _vector_search(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: int = 10,
+    ) -> List[Dict[str, Any]]:
+        q_emb = self._embed(query)
+
+        with tracing.span("pinecone.query", kind="vector", top_k=top_k, namespace=self.namespace):
+            res = self.idx.query(
+                vector=q_emb,
+                top_k=top_k,
+                namespace=self.namespace,
+                include_metadata=True,
+                filter=filters or None,
+            )
 
         matches = []
         for m in (getattr(res, "matches", []) or []):
@@ -55,13 +128,7 @@ class RagRetriever:
                     "metadata": md,
                 }
             )
-
-        return {
-            "query": query,
-            "top_k": top_k,
-            "namespace": self.namespace,
-            "matches": matches,
-        }
+        return matches
 
 
 def build_context_text(retrieved: Dict[str, Any], max_each: int = 3) -> str:
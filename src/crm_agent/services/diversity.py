@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import re
+import zlib
+import threading
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# 문자 n-gram(기본 3) shingle → MinHash signature.
+# 두 signature에서 같은 자리 값이 일치하는 비율 ≈ shingle 집합 Jaccard.
+SHINGLE_N = 3
+NUM_PERM = 64
+
+# SequenceMatcher.ratio() 0.86 과 비슷한 체감 기준(3-gram Jaccard는 ratio보다 낮게 나옴)
+DEFAULT_THRESHOLD = 0.65
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(20240521)
+_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+
+_WS_RE = re.compile(r"\s+")
+_EMPTY_SIG = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+
+
+def _normalize(text: str) -> str:
+    return _WS_RE.sub(" ", (text or "").strip().lower())
+
+
+def shingles(text: str, n: int = SHINGLE_N) -> set[str]:
+    t = _normalize(text)
+    if not t:
+        return set()
+    if len(t) <= n:
+        return {t}
+    return {t[i: i + n] for i in range(len(t) - n + 1)}
+
+
+def jaccard(a: str, b: str, n: int = SHINGLE_N) -> float:
+    """
+    정확한 shingle Jaccard (검증/소량 비교용)
+    """
+    sa, sb = shingles(a, n), shingles(b, n)
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def signature(text: str) -> np.ndarray:
+    """
+    MinHash signature (NUM_PERM,) uint64. 빈 문자열은 어떤 것과도 0이 되도록 sentinel
+    """
+    sh = shingles(text)
+    if not sh:
+        return _EMPTY_SIG.copy()
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in sh), dtype=np.uint64, count=len(sh))
+    x %= _MERSENNE
+    # (NUM_PERM, n_shingles): a*x + b mod p  (a,x < 2^31 → uint64 overflow 없음)
+    h = (_A[:, None] * x[None, :] + _B[:, None]) % _MERSENNE
+    return h.min(axis=1)
+
+
+def signatures(texts: Sequence[str]) -> np.ndarray:
+    if not texts:
+        return np.empty((0, NUM_PERM), dtype=np.uint64)
+    return np.vstack([signature(t) for t in texts])
+
+
+def _sim_to_many(sig: np.ndarray, mat: np.ndarray) -> np.ndarray:
+    if mat.shape[0] == 0:
+        return np.zeros(0, dtype=np.float64)
+    if (sig == _EMPTY_SIG).all():
+        return np.zeros(mat.shape[0], dtype=np.float64)
+    return (mat == sig[None, :]).mean(axis=1)
+
+
+def similarity(a: str, b: str) -> float:
+    if not (a or "").strip() or not (b or "").strip():
+        return 0.0
+    return float(_sim_to_many(signature(a), signature(b)[None, :])[0])
+
+
+def pairwise(texts: Sequence[str]) -> np.ndarray:
+    """
+    (N, N) 추정 Jaccard 행렬. 대각선은 1(빈 문자열은 0)
+    """
+    mat = signatures(texts)
+    if mat.shape[0] == 0:
+        return np.zeros((0, 0))
+    sims = (mat[:, None, :] == mat[None, :, :]).mean(axis=2)
+    empty = (mat == _EMPTY_SIG[None, :]).all(axis=1)
+    sims[empty, :] = 0.0
+    sims[:, empty] = 0.0
+    return sims
+
+
+class DiversityIndex:
+    """
+    signature 행렬을 누적해 두고 새 문구 1개를 전체와 한 번에 비교.
+    (승인 템플릿 수천 개 대상이어도 (N, 64) 비교 1번)
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._lock = threading.Lock()
+        self._mat = np.empty((max(1, capacity), NUM_PERM), dtype=np.uint64)
+        self._n = 0
+        self.keys: List[Any] = []
+
+    def __len__(self) -> int:
+        return self._n
+
+    def add(self, text: str, key: Any = None, sig: Optional[np.ndarray] = None) -> None:
+        sig = signature(text) if sig is None else sig
+        with self._lock:
+            if self._n >= self._mat.shape[0]:
+                grown = np.empty((self._mat.shape[0] * 2, NUM_PERM), dtype=np.uint64)
+                grown[: self._n] = self._mat[: self._n]
+                self._mat = grown
+            self._mat[self._n] = sig
+            self._n += 1
+            self.keys.append(key)
+
+    def extend(self, items: Iterable[Tuple[str, Any]]) -> None:
+        for text, key in items:
+            self.add(text, key)
+
+    def similarities(self, text: str) -> np.ndarray:
+        with self._lock:
+            mat = self._mat[: self._n]
+        return _sim_to_many(signature(text), mat)
+
+    def max_similarity(self, text: str) -> Tuple[float, Any]:
+        """
+        returns: (가장 비슷한 항목의 추정 Jaccard, 그 key). 비어 있으면 (0.0, None)
+        """
+        sims = self.similarities(text)
+        if sims.size == 0:
+            return 0.0, None
+        i = int(sims.argmax())
+        return float(sims[i]), self.keys[i]
+
+    def top_k(self, text: str, k: int = 5) -> List[Tuple[float, Any]]:
+        sims = self.similarities(text)
+        if sims.size == 0:
+            return []
+        k = min(k, sims.size)
+        idx = np.argpartition(-sims, k - 1)[:k]
+        idx = idx[np.argsort(-sims[idx])]
+        return [(float(sims[i]), self.keys[i]) for i in idx]
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict
+
+
+# 프로세스 단위 counter (thread-safe). 외부 exporter 없이 snapshot으로 확인
+_LOCK = threading.Lock()
+_COUNTERS: Dict[str, int] = {}
+
+
+def incr(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + int(n)
+
+
+def get(name: str) -> int:
+    with _LOCK:
+        return _COUNTERS.get(name, 0)
+
+
+def snapshot(prefix: str = "") -> Dict[str, int]:
+    with _LOCK:
+        return {k: v for k, v in _COUNTERS.items() if k.startswith(prefix)}
+
+
+def reset(prefix: str = "") -> None:
+    with _LOCK:
+        for k in [k for k in _COUNTERS if k.startswith(prefix)]:
+            del _COUNTERS[k]
+
+
+def ratio(num: str, den: str) -> float:
+    with _LOCK:
+        d = _COUNTERS.get(den, 0)
+        return round(_COUNTERS.get(num, 0) / d, 4) if d else 0.0
+
+
+def fallback_rate(scope: str) -> float:
+    """
+    f"{scope}.fallback" / f"{scope}.calls"  (예: scope="template", "normalize")
+    """
+    return ratio(f"{scope}.fallback", f"{scope}.calls")
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from crm_agent.services.tokens import count_tokens
+
+
+# build_context_text()가 만드는 블록 헤더: [source | section | chunk=.. | score=..]
+_RAG_HEADER_RE = re.compile(
+    r"^\[(?P<source>[^|\]]*)\|(?P<section>[^|\]]*)\|\s*chunk=(?P<chunk>[^|\]]*)\|\s*score=(?P<score>-?[0-9.]+)\]\s*$",
+    flags=re.MULTILINE,
+)
+
+
+@dataclass
+class PromptSection:
+    """
+    prompt에 들어갈 가변 섹션.
+    - priority: 작을수록 먼저 budget을 받음
+    - text: 통째로 넣되 넘치면 줄 단위로 뒤에서부터 잘라냄
+    - chunks: (score, text) 목록. 점수 높은 것부터 "통째로"만 넣고 안 들어가면 drop
+    """
+    name: str
+    priority: int
+    text: str = ""
+    chunks: List[Tuple[float, str]] = field(default_factory=list)
+    max_tokens: Optional[int] = None
+    empty_text: str = "(없음)"
+
+
+def split_rag_context(context: str) -> List[Tuple[float, str]]:
+    """
+    build_context_text() 결과 문자열을 (score, block_text) 목록으로 되돌림.
+    헤더가 없으면 전체를 하나의 블록(score=0)으로 취급.
+    """
+    context = (context or "").strip()
+    if not context:
+        return []
+
+    heads = list(_RAG_HEADER_RE.finditer(context))
+    if not heads:
+        return [(0.0, context)]
+
+    out: List[Tuple[float, str]] = []
+    for i, m in enumerate(heads):
+        end = heads[i + 1].start() if i + 1 < len(heads) else len(context)
+        block = context[m.start():end].strip()
+        try:
+            score = float(m.group("score"))
+        except ValueError:
+            score = 0.0
+        out.append((score, block))
+    return out
+
+
+def _fit_chunks(chunks: Sequence[Tuple[float, str]], cap: int, model: Optional[str]) -> Tuple[str, int, int]:
+    """
+    점수 순으로 whole chunk만 채움. 결과는 원래 순서(검색 순위)로 이어붙임.
+    returns: (text, used_tokens, dropped_count)
+    """
+    order = sorted(range(len(chunks)), key=lambda i: chunks[i][0], reverse=True)
+    picked: List[int] = []
+    used = 0
+    for i in order:
+        n = count_tokens(chunks[i][1], model) + 2  # 블록 구분 "\n\n"
+        if used + n > cap:
+            continue
+        picked.append(i)
+        used += n
+    picked.sort()
+    text = "\n\n".join(chunks[i][1] for i in picked)
+    return text, used, len(chunks) - len(picked)
+
+
+def _fit_text(text: str, cap: int, model: Optional[str]) -> Tuple[str, int, bool]:
+    """
+    통째로 들어가면 그대로, 아니면 앞에서부터 whole line 단위로 채움.
+    returns: (text, used_tokens, trimmed)
+    """
+    text = (text or "").strip()
+    n = count_tokens(text, model)
+    if n <= cap:
+        return text, n, False
+
+    kept: List[str] = []
+    used = 0
+    for line in text.splitlines():
+        ln = count_tokens(line, model) + 1
+        if used + ln > cap:
+            break
+        kept.append(line)
+        used += ln
+    return "\n".join(kept).rstrip(), used, True
+
+
+def allocate(
+        sections: Sequence[PromptSection],
+        budget: int,
+        model: Optional[str] = None,
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    priority 순으로 남은 토큰 budget을 나눠줌.
+    budget이 음수(고정 부분만으로 이미 초과)면 모든 섹션이 비고 report["over_budget"]=True.
+    returns: ({section_name: text}, report)
+    """
+    remaining = max(0, int(budget))
+    texts: Dict[str, str] = {}
+    report: Dict[str, Any] = {"budget": int(budget), "sections": {}}
+
+    for sec in sorted(sections, key=lambda s: s.priority):
+        cap = remaining if sec.max_tokens is None else min(remaining, int(sec.max_tokens))
+        if sec.chunks:
+            text, used, dropped = _fit_chunks(sec.chunks, cap, model)
+            info = {"tokens": used, "chunks": len(sec.chunks) - dropped, "dropped_chunks": dropped}
+        else:
+            text, used, trimmed = _fit_text(sec.text, cap, model)
+            info = {"tokens": used, "trimmed": trimmed}
+
+        texts[sec.name] = text or sec.empty_text
+        remaining -= used
+        report["sections"][sec.name] = info
+
+    report["used"] = max(0, int(budget)) - remaining
+    report["over_budget"] = int(budget) < 0
+    return texts, report
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import random
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from crm_agent.services import metrics
+
+try:  # POSIX만. 없으면(Windows) 프로세스 내부 공유만
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+# -----------------------------
+# OpenAI 호출 속도 제어
+# - RateLimiter      : RPM/TPM token bucket. 상태를 파일(flock)에 둬서 같은 머신의 프로세스끼리 공유
+# - AdaptiveConcurrency: 동시 호출 수 AIMD(성공 시 +1, 429/잔여량 부족 시 절반)
+# - retry_call       : 429/5xx 지수 backoff + full jitter, retry-after 우선, deadline 넘기면 중단
+# - deadline_scope   : contextvar로 남은 시간 전파(중첩 시 더 짧은 쪽)
+# -----------------------------
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "1").strip() not in ("0", "false", "False", "")
+RATE_LIMIT_DIR = os.getenv("RATE_LIMIT_DIR", "") or tempfile.gettempdir()
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}  # timeout, rate limit, 일시적 서버 오류만
+RETRYABLE_NAMES = {
+    "RateLimitError",
+    "APITimeoutError",
+    "APIConnectionError",
+    "InternalServerError",
+    "ServiceException",
+}
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+# -----------------------------
+# deadline
+# -----------------------------
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("crm_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    with deadline_scope(8): ...  → 안쪽 호출은 남은 시간 안에서만 대기/재시도.
+    이미 더 짧은 deadline이 걸려 있으면 그대로 유지. None이면 아무것도 안 함
+    """
+    if seconds is None:
+        yield _DEADLINE.get()
+        return
+    at = time.monotonic() + max(0.0, float(seconds))
+    cur = _DEADLINE.get()
+    if cur is not None:
+        at = min(at, cur)
+    token = _DEADLINE.set(at)
+    try:
+        yield at
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    남은 초(deadline 없으면 None, 지났으면 0.0)
+    """
+    at = _DEADLINE.get()
+    if at is None:
+        return None
+    return max(0.0, at - time.monotonic())
+
+
+def check_deadline(what: str = "") -> None:
+    r = remaining()
+    if r is not None and r <= 0:
+        raise DeadlineExceeded(f"deadline exceeded{(' before ' + what) if what else ''}")
+
+
+# -----------------------------
+# error classification
+# -----------------------------
+def status_of(e: BaseException) -> Optional[int]:
+    for obj in (e, getattr(e, "response", None)):
+        for attr in ("status_code", "status"):
+            v = getattr(obj, attr, None)
+            if isinstance(v, int):
+                return v
+    return None
+
+
+def is_retryable(e: BaseException) -> bool:
+    if isinstance(e, DeadlineExceeded):
+        return False
+    status = status_of(e)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(e).__name__ in RETRYABLE_NAMES
+
+
+def headers_of(e: BaseException) -> Dict[str, str]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return {str(k).lower(): str(v) for k, v in dict(headers).items()}
+    except Exception:
+        return {}
+
+
+def retry_after_sec(e: BaseException) -> Optional[float]:
+    h = headers_of(e)
+    try:
+        if "retry-after-ms" in h:
+            return float(h["retry-after-ms"]) / 1000.0
+        if "retry-after" in h:
+            return float(h["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 30.0) -> float:
+    """
+    full jitter: U(0, min(max_delay, base * 2^attempt))
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_call(
+        fn: Callable[..., Any],
+        *args: Any,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        on_retry: Optional[Callable[[Exception, int, float], None]] = None,
+) -> Any:
+    """
+    rate limit(429)/일시 장애(5xx)는 지수 backoff + full jitter로 재시도.
+    서버가 retry-after(-ms)를 주면 그 값을 우선 사용.
+    deadline_scope 안이면 남은 시간보다 오래 기다려야 하는 재시도는 하지 않고 원래 에러를 올림.
+    """
+    attempt = 0
+    while True:
+        check_deadline("call")
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_after_sec(e)
+            if delay is None:
+                delay = backoff_delay(attempt, base_delay, max_delay)
+            left = remaining()
+            if left is not None and delay >= left:
+                raise
+            attempt += 1
+            if on_retry:
+                on_retry(e, attempt, delay)
+            time.sleep(delay)
+
+
+# -----------------------------
+# token bucket (RPM / TPM)
+# -----------------------------
+class RateLimiter:
+    """
+    requests/min, tokens/min 두 bucket을 같이 차감. 둘 다 남아 있어야 통과.
+    shared=True면 bucket 상태를 {RATE_LIMIT_DIR}/crm_rl_{name}.json 에 두고 flock으로 갱신
+    (같은 API key를 쓰는 여러 worker/streamlit 프로세스가 한도를 나눠 씀).
+    rpm/tpm <= 0 이면 해당 bucket 제한 없음.
+    """
+
+    def __init__(self, name: str, *, rpm: float = 0, tpm: float = 0, shared: bool = RATE_LIMIT_SHARED):
+        self.name = name
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self._lock = threading.Lock()
+        self._state = {"req": self.rpm, "tok": self.tpm, "ts": time.time()}
+        self._path = os.path.join(RATE_LIMIT_DIR, f"crm_rl_{name}.json") if (shared and fcntl) else None
+
+    def set_limits(self, *, rpm: Optional[float] = None, tpm: Optional[float] = None) -> None:
+        """
+        응답 header(x-ratelimit-limit-*)로 알게 된 실제 한도 반영
+        """
+        with self._lock:
+            if rpm is not None and rpm > 0:
+                self.rpm = float(rpm)
+            if tpm is not None and tpm > 0:
+                self.tpm = float(tpm)
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, float]]:
+        with self._lock:
+            if self._path is None:
+                yield self._state
+                return
+            with open(self._path, "a+", encoding="utf-8") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or "{}")
+                    except ValueError:
+                        state = {}
+                    if not state:
+                        state = {"req": self.rpm, "tok": self.tpm, "ts": time.time()}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _refill(self, state: Dict[str, float], now: float) -> None:
+        dt = max(0.0, now - float(state.get("ts", now)))
+        if self.rpm > 0:
+            state["req"] = min(self.rpm, float(state.get("req", self.rpm)) + dt * self.rpm / 60.0)
+        if self.tpm > 0:
+            state["tok"] = min(self.tpm, float(state.get("tok", self.tpm)) + dt * self.tpm / 60.0)
+        state["ts"] = now
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """
+        통과하면 0.0, 아니면 기다려야 할 초(차감 안 함)
+        """
+        tokens = float(max(0, tokens))
+        with self._locked_state() as st:
+            self._refill(st, time.time())
+            wait = 0.0
+            if self.rpm > 0 and st["req"] < 1.0:
+                wait = max(wait, (1.0 - st["req"]) * 60.0 / self.rpm)
+            # 한 요청이 분당 한도보다 크면 가득 찼을 때 통과시킴(영원히 대기 방지)
+            need = min(tokens, self.tpm) if self.tpm > 0 else 0.0
+            if self.tpm > 0 and st["tok"] < need:
+                wait = max(wait, (need - st["tok"]) * 60.0 / self.tpm)
+            if wait > 0:
+                return wait
+            if self.rpm > 0:
+                st["req"] -= 1.0
+            if self.tpm > 0:
+                st["tok"] -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        bucket이 찰 때까지 대기. returns: 기다린 초.
+        deadline_scope 안에서 남은 시간 내에 못 들어가면 DeadlineExceeded
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                if waited > 0:
+                    metrics.incr(f"ratelimit.{self.name}.waits")
+                    metrics.incr(f"ratelimit.{self.name}.wait_ms", int(waited * 1000))
+                return waited
+            left = remaining()
+            if left is not None and wait > left:
+                metrics.incr(f"ratelimit.{self.name}.deadline")
+                raise DeadlineExceeded(f"rate limit wait {wait:.2f}s > remaining {left:.2f}s ({self.name})")
+            # 다른 thread/프로세스와 동시에 깨어나지 않도록 약간 흔들어 줌
+            sleep = min(wait, 1.0) * random.uniform(1.0, 1.2)
+            time.sleep(sleep)
+            waited += sleep
+
+    def adjust(self, tokens_delta: int) -> None:
+        """
+        실제 사용 토큰 - 예상 토큰 만큼 사후 보정(음수면 환불)
+        """
+        if self.tpm <= 0 or not tokens_delta:
+            return
+        with self._locked_state() as st:
+            self._refill(st, time.time())
+            st["tok"] = min(self.tpm, st["tok"] - float(tokens_delta))
+
+
+# -----------------------------
+# adaptive concurrency (AIMD)
+# -----------------------------
+class AdaptiveConcurrency:
+    """
+    동시 호출 상한을 관측값으로 조정.
+    - 성공: limit += 1/limit (대략 limit개 성공마다 +1)
+    - 429 또는 남은 한도 부족 header: limit = max(min, limit/2)
+    """
+
+    def __init__(self, name: str, *, initial: int = 4, minimum: int = 1, maximum: int = 32):
+        self.name = name
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self._limit = float(min(max(int(initial), self.minimum), self.maximum))
+        self._inflight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._cond:
+            while self._inflight >= max(self.minimum, int(self._limit)):
+                left = remaining()
+                if left is not None and left <= 0:
+                    raise DeadlineExceeded(f"no concurrency slot before deadline ({self.name})")
+                self._cond.wait(timeout=left if left is not None else 1.0)
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._inflight -= 1
+                self._cond.notify()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self._limit = min(float(self.maximum), self._limit + 1.0 / max(1.0, self._limit))
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self._limit = max(float(self.minimum), self._limit / 2.0)
+        metrics.incr(f"ratelimit.{self.name}.decrease")
+
+
+# -----------------------------
+# gate = limiter + concurrency + header 관측
+# -----------------------------
+def _num(v: Any) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+class ApiGate:
+    """
+    API 한 종류(예: openai responses, openai embeddings)의 호출 관문.
+    gate.call(fn, tokens=..) : bucket 대기 → 동시성 slot → 호출 → header로 한도/동시성 조정 (재시도는 하지 않음)
+    """
+
+    # 남은 한도가 이 비율 아래로 내려가면 동시성 감소
+    LOW_WATERMARK = 0.1
+
+    def __init__(self, name: str, *, rpm: float, tpm: float, concurrency: int, max_concurrency: int):
+        self.name = name
+        self.limiter = RateLimiter(name, rpm=rpm, tpm=tpm)
+        self.concurrency = AdaptiveConcurrency(name, initial=concurrency, maximum=max_concurrency)
+
+    def observe(self, headers: Optional[Dict[str, Any]]) -> None:
+        """
+        x-ratelimit-limit-* / x-ratelimit-remaining-* header 반영
+        """
+        if not headers:
+            return
+        h = {str(k).lower(): v for k, v in dict(headers).items()}
+        lim_r = _num(h.get("x-ratelimit-limit-requests"))
+        lim_t = _num(h.get("x-ratelimit-limit-tokens"))
+        self.limiter.set_limits(rpm=lim_r, tpm=lim_t)
+
+        rem_r = _num(h.get("x-ratelimit-remaining-requests"))
+        rem_t = _num(h.get("x-ratelimit-remaining-tokens"))
+        low = (lim_r and rem_r is not None and rem_r / lim_r < self.LOW_WATERMARK) or \
+              (lim_t and rem_t is not None and rem_t / lim_t < self.LOW_WATERMARK)
+        if low:
+            self.concurrency.on_throttle()
+        else:
+            self.concurrency.on_success()
+
+    def on_error(self, e: BaseException) -> None:
+        if status_of(e) == 429 or type(e).__name__ == "RateLimitError":
+            metrics.incr(f"ratelimit.{self.name}.throttled")
+            self.concurrency.on_throttle()
+            h = headers_of(e)
+            self.limiter.set_limits(
+                rpm=_num(h.get("x-ratelimit-limit-requests")),
+                tpm=_num(h.get("x-ratelimit-limit-tokens")),
+            )
+
+    def call(self, fn: Callable[[], Any], *, tokens: int = 0,
+             headers_of_result: Optional[Callable[[Any], Optional[Dict[str, Any]]]] = None) -> Any:
+        self.limiter.acquire(tokens)
+        with self.concurrency.slot():
+            metrics.incr(f"ratelimit.{self.name}.calls")
+            try:
+                out = fn()
+            except Exception as e:
+                self.on_error(e)
+                raise
+        headers = headers_of_result(out) if headers_of_result else None
+        if headers:
+            self.observe(headers)
+        else:
+            self.concurrency.on_success()
+        return out
+
+
+_GATES: Dict[str, ApiGate] = {}
+_GATES_LOCK = threading.Lock()
+
+
+def get_gate(name: str) -> ApiGate:
+    """
+    env(name 대문자, '-'→'_'): {NAME}_RPM / {NAME}_TPM / {NAME}_CONCURRENCY / {NAME}_MAX_CONCURRENCY
+    (예: OPENAI_RPM=500, OPENAI_TPM=200000). header를 받으면 실제 한도로 갱신됨
+    """
+    with _GATES_LOCK:
+        g = _GATES.get(name)
+        if g is None:
+            env = name.upper().replace("-", "_")
+            g = ApiGate(
+                name,
+                rpm=float(os.getenv(f"{env}_RPM", "500")),
+                tpm=float(os.getenv(f"{env}_TPM", "200000")),
+                concurrency=int(os.getenv(f"{env}_CONCURRENCY", "4")),
+                max_concurrency=int(os.getenv(f"{env}_MAX_CONCURRENCY", "16")),
+            )
+            _GATES[name] = g
+        return g
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import copy
+import json
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from crm_agent.services import metrics
+
+
+# 진행 중인(in-flight) 동일 요청 합치기.
+# 같은 key로 동시에 들어온 호출은 먼저 온 1개만 실제로 실행하고 나머지는 그 결과를 나눠 받음.
+# 끝난 결과는 보관하지 않음(캐시 아님) → 완료 후 들어온 호출은 다시 실행.
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+def request_key(*parts: Any) -> str:
+    """
+    요청 구성요소(모델/프롬프트/입력 등) → 고정 길이 key
+    """
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    metrics: singleflight.{name}.calls / singleflight.{name}.coalesced
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Any, _Call] = {}
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+            else:
+                call.waiters += 1
+        metrics.incr(f"singleflight.{self.name}.calls")
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                call.done.set()
+        else:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        # 기다린 쪽은 복사본(결과 dict를 고쳐 써도 서로 영향 없게)
+        return call.result if leader else copy.deepcopy(call.result)
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+
+def coalesce_rate(name: str) -> float:
+    """
+    합쳐진 호출 비율 = coalesced / calls
+    """
+    return metrics.ratio(f"singleflight.{name}.coalesced", f"singleflight.{name}.calls")
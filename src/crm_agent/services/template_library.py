@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import os
+import copy
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from crm_agent.services.diversity import DiversityIndex
+
+
+# 승인 템플릿 라이브러리: (channel, tone, goal) 이 같은 과거 승인 run 중
+# 정규화 brief(키워드/요약/타겟)가 거의 같은 것의 템플릿을 LLM 없이 재사용
+LIBRARY_TTL_SEC = float(os.getenv("TEMPLATE_LIBRARY_TTL_SEC", "300"))
+LIBRARY_MIN_SCORE = float(os.getenv("TEMPLATE_LIBRARY_MIN_SCORE", "0.6"))
+LIBRARY_MAX_ROWS = int(os.getenv("TEMPLATE_LIBRARY_MAX_ROWS", "2000"))
+
+
+# _format_target_context() 줄 중 "사용자가 고른 조건"만 비교(audience_count 등 run마다 바뀌는 값 제외)
+_TARGET_KEYS = ("base_target_summary", "selected_filters", "concern_mapping")
+
+
+def _target_digest(target_context: str) -> str:
+    vals = []
+    for line in (target_context or "").splitlines():
+        k, _, v = line.strip().lstrip("-").strip().partition(":")
+        v = v.strip()
+        if k.strip() in _TARGET_KEYS and v and v != "(없음)":
+            vals.append(v)
+    return " ".join(vals)
+
+
+def brief_signature_text(
+        *,
+        normalized: Optional[Dict[str, Any]],
+        target_context: str = "",
+) -> str:
+    """
+    유사도 비교용 brief 문자열(키워드는 정렬해서 순서 차이 무시)
+    """
+    n = normalized or {}
+    kws = n.get("keywords") or []
+    if not isinstance(kws, list):
+        kws = []
+    parts = [
+        " ".join(sorted(str(k).strip() for k in kws if str(k).strip())),
+        str(n.get("category") or "").strip(),
+        str(n.get("occasion") or "").strip(),
+        str(n.get("normalized_text") or "").strip(),
+        _target_digest(target_context),
+    ]
+    return " | ".join(parts)
+
+
+def _key(channel: str, tone: str, goal: str) -> Tuple[str, str, str]:
+    return (
+        (channel or "").strip().upper(),
+        (tone or "").strip().lower(),
+        (goal or "").strip().lower(),
+    )
+
+
+@dataclass
+class LibraryEntry:
+    run_id: str
+    channel: str
+    tone: str
+    goal: str
+    brief_text: str
+    template: Dict[str, Any] = field(default_factory=dict)
+    approved_at: Any = None
+
+
+class TemplateLibrary:
+    """
+    (channel, tone, goal) 별 MinHash index. lookup은 그룹 내 (N, 64) 비교 1번
+    """
+
+    def __init__(self):
+        self.entries: List[LibraryEntry] = []
+        self._groups: Dict[Tuple[str, str, str], DiversityIndex] = {}
+        self.built_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, entry: LibraryEntry) -> None:
+        k = _key(entry.channel, entry.tone, entry.goal)
+        idx = self._groups.get(k)
+        if idx is None:
+            idx = DiversityIndex()
+            self._groups[k] = idx
+        idx.add(entry.brief_text, key=len(self.entries))
+        self.entries.append(entry)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "TemplateLibrary":
+        """
+        rows: Repo.list_approved_templates() 결과.
+        정규화 brief/타겟은 후보 생성 시 template.notes에 남겨둔 값을 사용
+        """
+        lib = cls()
+        seen_bodies = set()
+        for r in rows:
+            tpl = r.get("template") or {}
+            body = (tpl.get("body_with_slots") or "").strip()
+            if not body:
+                continue
+            notes = tpl.get("notes") or {}
+            channel = (tpl.get("channel") or r.get("channel") or "").strip().upper()
+            tone = (tpl.get("tone") or notes.get("brand_tone_id") or r.get("tone") or "").strip().lower()
+            goal = str(notes.get("campaign_goal") or "")
+            dedup = (channel, tone, goal, body)
+            if dedup in seen_bodies:
+                continue
+            seen_bodies.add(dedup)
+            lib.add(LibraryEntry(
+                run_id=r.get("run_id") or "",
+                channel=channel,
+                tone=tone,
+                goal=goal,
+                brief_text=brief_signature_text(
+                    normalized=notes.get("campaign_text_normalized") or {},
+                    target_context=notes.get("target_context") or "",
+                ),
+                template=tpl,
+                approved_at=r.get("approved_at"),
+            ))
+        lib.built_at = time.time()
+        return lib
+
+    def lookup(
+            self,
+            *,
+            channel: str,
+            tone: str,
+            campaign_goal: str,
+            normalized: Optional[Dict[str, Any]],
+            target_context: str = "",
+            k: int = 5,
+            min_score: Optional[float] = None,
+    ) -> List[Tuple[float, LibraryEntry]]:
+        """
+        같은 channel/tone/goal 중 brief 유사도(추정 Jaccard) >= min_score 인 항목, 점수 내림차순
+        """
+        idx = self._groups.get(_key(channel, tone, campaign_goal))
+        if idx is None or not len(idx):
+            return []
+        min_score = LIBRARY_MIN_SCORE if min_score is None else float(min_score)
+        query = brief_signature_text(normalized=normalized, target_context=target_context)
+
+        out: List[Tuple[float, LibraryEntry]] = []
+        for score, i in idx.top_k(query, k=k):
+            if score < min_score:
+                break
+            out.append((score, self.entries[i]))
+        return out
+
+    def candidates_for(self, hits: List[Tuple[float, LibraryEntry]]) -> List[Dict[str, Any]]:
+        """
+        hit → 후보 dict 복사본(notes.library에 출처/점수 기록)
+        """
+        out = []
+        for score, e in hits:
+            c = copy.deepcopy(e.template)
+            c.setdefault("notes", {})
+            c["notes"]["library"] = {
+                "run_id": e.run_id,
+                "score": round(score, 4),
+                "approved_at": str(e.approved_at or ""),
+                "source_template_id": e.template.get("template_id", ""),
+            }
+            c["notes"]["fallback"] = False
+            out.append(c)
+        return out
+
+
+_LOCK = threading.Lock()
+_CACHED: Optional[TemplateLibrary] = None
+
+
+def load_library(repo, *, ttl_sec: Optional[float] = None, force: bool = False) -> Optional[TemplateLibrary]:
+    """
+    프로세스 캐시(TTL). DB 조회 실패 시 이전 캐시(없으면 None) 반환
+    """
+    global _CACHED
+    ttl = LIBRARY_TTL_SEC if ttl_sec is None else float(ttl_sec)
+    with _LOCK:
+        if not force and _CACHED is not None and time.time() - _CACHED.built_at < ttl:
+            return _CACHED
+        try:
+            _CACHED = TemplateLibrary.from_rows(repo.list_approved_templates(limit_n=LIBRARY_MAX_ROWS))
+        except Exception:
+            return _CACHED
+        return _CACHED
+
+
+def invalidate_library() -> None:
+    global _CACHED
+    with _LOCK:
+        _CACHED = None
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except Exception:  # requirements.txt 에 있음. 미설치 환경에서만 근사치(_estimate_tokens)로 동작
+    tiktoken = None
+
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# model -> tiktoken encoding (모르는 모델은 DEFAULT_ENCODING)
+_MODEL_ENCODINGS = {
+    "text-embedding-3-small": "cl100k_base",
+    "text-embedding-3-large": "cl100k_base",
+    "text-embedding-ada-002": "cl100k_base",
+    "gpt-4o": "o200k_base",
+    "gpt-4o-mini": "o200k_base",
+    "gpt-4.1": "o200k_base",
+    "gpt-4.1-mini": "o200k_base",
+}
+
+
+@lru_cache(maxsize=8)
+def _encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def _encoding_for(model: Optional[str]):
+    name = _MODEL_ENCODINGS.get((model or "").strip(), DEFAULT_ENCODING)
+    return _encoding(name)
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    tiktoken이 없을 때의 근사치.
+    - ASCII: 약 4자당 1토큰
+    - 한글 등 비ASCII: 약 1자당 1토큰 (cl100k 기준 한글은 보통 1~2토큰/자라 보수적으로 잡지 않음)
+    """
+    ascii_n = 0
+    other_n = 0
+    for ch in text:
+        if ch.isspace():
+            continue
+        if ord(ch) < 128:
+            ascii_n += 1
+        else:
+            other_n += 1
+    return other_n + (ascii_n + 3) // 4
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    embedding/chat 모델 기준 토큰 수.
+    model 미지정 시 OPENAI_EMBED_MODEL(env, ingest/retriever 와 같은 값) 기준.
+    """
+    if not text:
+        return 0
+    enc = _encoding_for(model or os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small"))
+    if enc is None:
+        return _estimate_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    text를 max_tokens 이하로 자름(단어 중간이 잘리지 않도록 공백 기준으로 뒤에서부터 제거).
+    """
+    text = text or ""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    words = text.split(" ")
+    lo, hi = 0, len(words)
+    # 이분 탐색: 앞에서부터 몇 단어까지 들어가는지
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid]), model) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+
+    if lo > 0:
+        return " ".join(words[:lo])
+
+    # 공백 없는 긴 토막(URL 등)은 문자 단위로
+    s = words[0]
+    lo, hi = 0, len(s)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(s[:mid], model) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return s[:lo]
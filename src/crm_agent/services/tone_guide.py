@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import re
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional
+
+from crm_agent.services.tokens import count_tokens
 
 
 # RAG 코퍼스와 동일 위치의 md를 "브랜드 톤 가이드"로도 사용
@@ -13,26 +18,157 @@ _TONE_GUIDE_FILES: Dict[str, str] = {
     "innisfree": "innisfree.md",
 }
 
+# md 섹션 라벨("금지:" 등) -> digest 라벨
+_DIGEST_LABELS = [
+    ("기본 호칭", "호칭"),
+    ("말투/톤", "말투"),
+    ("권장 표현", "권장"),
+    ("금지", "금지"),
+    ("이모지", "이모지"),
+]
+
+_SECTION_RE = re.compile(r"^([^\-\s\[#][^:]{0,30}):\s*$")
+_QUOTED_RE = re.compile(r"[“\"]([^”\"]+)[”\"]")
+_PAREN_EXAMPLE_RE = re.compile(r"\s*\(예:[^)]*\)")
+
+
+@dataclass(frozen=True)
+class ToneGuide:
+    tone_id: str
+    path: Path
+    mtime: float
+    raw: str
+    sections: Dict[str, List[str]] = field(default_factory=dict)
+    banned_phrases: List[str] = field(default_factory=list)
+    digest: str = ""
+    digest_tokens: int = 0
+
 
 def list_tone_ids() -> list[str]:
     return sorted(_TONE_GUIDE_FILES.keys())
 
 
-def load_tone_guide(tone_id: str) -> str:
+def _parse_sections(md: str) -> Dict[str, List[str]]:
     """
-    tone_id(=브랜드)별 md 가이드를 로드해서 문자열로 반환.
-    파일이 없으면 빈 문자열 반환(LLM은 RAG/기본 가이드로라도 동작).
+    "라벨:" 다음에 오는 "- 항목" 들을 {라벨: [항목...]} 으로 묶음.
+    """
+    sections: Dict[str, List[str]] = {}
+    current: Optional[str] = None
+    for line in md.splitlines():
+        s = line.strip()
+        if not s:
+            continue
+        m = _SECTION_RE.match(s)
+        if m:
+            current = m.group(1).strip()
+            sections.setdefault(current, [])
+            continue
+        if current and s.startswith("-"):
+            sections[current].append(s.lstrip("-").strip())
+    return sections
+
+
+def _extract_banned(sections: Dict[str, List[str]]) -> List[str]:
+    out: List[str] = []
+    for item in sections.get("금지", []):
+        for q in _QUOTED_RE.findall(item):
+            q = q.strip()
+            if q and q not in out:
+                out.append(q)
+    return out
+
+
+def _build_digest(tone_id: str, sections: Dict[str, List[str]], banned: List[str]) -> str:
+    """
+    prompt에 매번 들어갈 짧은 요약(예시 문장/괄호 예시는 제외).
+    """
+    lines = [f"[브랜드 톤 요약: {tone_id}]"]
+    for key, label in _DIGEST_LABELS:
+        items = [_PAREN_EXAMPLE_RE.sub("", x).strip() for x in sections.get(key, [])]
+        items = [x for x in items if x]
+        if items:
+            lines.append(f"- {label}: " + " / ".join(items))
+    if banned:
+        lines.append("- 금지 표현: " + ", ".join(banned))
+    examples = sections.get("예시 톤") or []
+    if examples:
+        lines.append(f"- 예시: {examples[0]}")
+    return "\n".join(lines) if len(lines) > 1 else ""
+
+
+def _load(tone_id: str, fp: Path, mtime: float) -> ToneGuide:
+    try:
+        raw = fp.read_text(encoding="utf-8").strip()
+    except Exception:
+        raw = ""
+    sections = _parse_sections(raw)
+    banned = _extract_banned(sections)
+    digest = _build_digest(tone_id, sections, banned) or raw
+    return ToneGuide(
+        tone_id=tone_id,
+        path=fp,
+        mtime=mtime,
+        raw=raw,
+        sections=sections,
+        banned_phrases=banned,
+        digest=digest,
+        digest_tokens=count_tokens(digest),
+    )
+
+
+_LOCK = threading.Lock()
+_REGISTRY: Dict[str, ToneGuide] = {}
+
+
+def get_tone_guide(tone_id: str) -> Optional[ToneGuide]:
+    """
+    tone_id(=브랜드)별 파싱된 가이드. 프로세스당 1회 로드하고
+    md 파일 mtime이 바뀐 경우에만 다시 읽음.
     """
     key = (tone_id or "").strip().lower()
     fname = _TONE_GUIDE_FILES.get(key)
     if not fname:
-        return ""
+        return None
 
     fp = _CORPUS_DIR / fname
-    if not fp.exists():
-        return ""
-
     try:
-        return fp.read_text(encoding="utf-8").strip()
-    except Exception:
-        return ""
+        mtime = fp.stat().st_mtime
+    except OSError:
+        return None
+
+    cached = _REGISTRY.get(key)
+    if cached is not None and cached.mtime == mtime:
+        return cached
+
+    with _LOCK:
+        cached = _REGISTRY.get(key)
+        if cached is None or cached.mtime != mtime:
+            cached = _load(key, fp, mtime)
+            _REGISTRY[key] = cached
+        return cached
+
+
+def load_all_tone_guides() -> Dict[str, ToneGuide]:
+    out: Dict[str, ToneGuide] = {}
+    for tid in list_tone_ids():
+        g = get_tone_guide(tid)
+        if g is not None:
+            out[tid] = g
+    return out
+
+
+def load_tone_guide(tone_id: str) -> str:
+    """
+    tone_id(=브랜드)별 md 가이드 원문을 반환.
+    파일이 없으면 빈 문자열 반환(LLM은 RAG/기본 가이드로라도 동작).
+    """
+    g = get_tone_guide(tone_id)
+    return g.raw if g else ""
+
+
+def load_tone_digest(tone_id: str) -> str:
+    """
+    prompt용 톤 요약(호칭/말투/권장/금지/이모지 + 금지 표현). 없으면 빈 문자열.
+    """
+    g = get_tone_guide(tone_id)
+    return g.digest if g else ""
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+# -----------------------------
+# run 단위 tracing
+# - trace(run_id): run 하나의 span 수집 시작(contextvar). 밖에서 호출된 span()은 아무것도 안 함(no-op)
+# - span(name, kind): node / db / llm / embed / vector 등 구간 측정
+# - summary(): kind·name별 count/total/max ms + token 합계 → PERF handoff로 저장
+# - to_otlp(): OpenTelemetry(OTLP/JSON) 형식으로 export
+# -----------------------------
+TRACING_ENABLED = os.getenv("CRM_TRACING", "1").strip() not in ("0", "false", "False", "")
+TRACE_EXPORT_DIR = os.getenv("CRM_TRACE_EXPORT_DIR", "").strip()
+
+ST_PERF = "PERF"
+
+SERVICE_NAME = "crm_agent"
+
+# OTLP SpanKind: INTERNAL=1, CLIENT=3
+_CLIENT_KINDS = {"db", "llm", "embed", "vector"}
+
+# 한 run에서 span이 너무 많으면(예: 사용자별 DB 조회) 개별 span은 버리고 집계만 유지
+MAX_SPANS = int(os.getenv("CRM_TRACE_MAX_SPANS", "2000"))
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return max(0, self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update({k: v for k, v in attrs.items() if v is not None})
+
+
+class Trace:
+    def __init__(self, run_id: str, name: str):
+        self.run_id = run_id
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._agg: Dict[tuple, Dict[str, float]] = {}
+        self._tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.root: Optional[Span] = None
+
+    def record(self, sp: Span) -> None:
+        with self._lock:
+            key = (sp.kind, sp.name)
+            a = self._agg.get(key)
+            if a is None:
+                a = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0}
+                self._agg[key] = a
+            d = sp.duration_ms
+            a["count"] += 1
+            a["total_ms"] += d
+            a["max_ms"] = max(a["max_ms"], d)
+            if sp.error:
+                a["errors"] += 1
+            for k in ("input_tokens", "cached_tokens", "output_tokens"):
+                v = sp.attrs.get(k)
+                if isinstance(v, int) and v:
+                    self._tokens[k] = self._tokens.get(k, 0) + v
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(sp)
+            else:
+                self.dropped += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        PERF handoff payload
+        """
+        with self._lock:
+            by_kind: Dict[str, Dict[str, float]] = {}
+            stages = []
+            for (kind, name), a in sorted(self._agg.items(), key=lambda kv: -kv[1]["total_ms"]):
+                k = by_kind.setdefault(kind, {"count": 0, "total_ms": 0.0})
+                k["count"] += a["count"]
+                k["total_ms"] = round(k["total_ms"] + a["total_ms"], 2)
+                stages.append({
+                    "kind": kind,
+                    "name": name,
+                    "count": int(a["count"]),
+                    "total_ms": round(a["total_ms"], 2),
+                    "max_ms": round(a["max_ms"], 2),
+                    "errors": int(a["errors"]),
+                })
+            root = self.root
+            return {
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "run_id": self.run_id,
+                "wall_ms": round(root.duration_ms, 2) if root and root.end_ns else None,
+                "error": root.error if root else None,
+                "by_kind": by_kind,
+                "spans": stages,
+                "tokens": dict(self._tokens),
+                "dropped_spans": self.dropped,
+            }
+
+
+_TRACE: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("crm_trace", default=None)
+_SPAN: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("crm_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+@contextmanager
+def trace(run_id: str, name: str) -> Iterator[Optional[Trace]]:
+    """
+    run 하나를 감싸는 root span. CRM_TRACING=0 이면 None
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+    tr = Trace(run_id, name)
+    root = Span(name=name, kind="run", trace_id=tr.trace_id, span_id=secrets.token_hex(8),
+                parent_id=None, start_ns=time.time_ns(), attrs={"run_id": run_id})
+    tr.root = root
+    t_tok = _TRACE.set(tr)
+    s_tok = _SPAN.set(root)
+    t0 = time.perf_counter_ns()
+    try:
+        yield tr
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        root.end_ns = root.start_ns + (time.perf_counter_ns() - t0)
+        _SPAN.reset(s_tok)
+        _TRACE.reset(t_tok)
+        tr.record(root)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attrs: Any) -> Iterator[Optional[Span]]:
+    tr = _TRACE.get()
+    if tr is None:
+        yield None
+        return
+    parent = _SPAN.get()
+    sp = Span(name=name, kind=kind, trace_id=tr.trace_id, span_id=secrets.token_hex(8),
+              parent_id=parent.span_id if parent else None, start_ns=time.time_ns())
+    sp.set(**attrs)
+    tok = _SPAN.set(sp)
+    t0 = time.perf_counter_ns()
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        sp.end_ns = sp.start_ns + (time.perf_counter_ns() - t0)
+        _SPAN.reset(tok)
+        tr.record(sp)
+
+
+def record(name: str, kind: str, start_ns: int, end_ns: int, error: Optional[str] = None, **attrs: Any) -> None:
+    """
+    with 블록으로 감쌀 수 없는 구간(generator/streaming 등) 사후 기록. 현재 span을 부모로 사용
+    """
+    tr = _TRACE.get()
+    if tr is None:
+        return
+    parent = _SPAN.get()
+    sp = Span(name=name, kind=kind, trace_id=tr.trace_id, span_id=secrets.token_hex(8),
+              parent_id=parent.span_id if parent else None, start_ns=start_ns, end_ns=end_ns, error=error)
+    sp.set(**attrs)
+    tr.record(sp)
+
+
+def traced_node(name: str, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """
+    LangGraph node wrapper: g.add_node(name, traced_node(name, node_fn))
+    """
+
+    @wraps(fn)
+    def _wrapped(state):
+        with span(name, kind="node"):
+            return fn(state)
+
+    return _wrapped
+
+
+# -----------------------------
+# SQLAlchemy
+# -----------------------------
+_SQL_MAX = 160
+
+
+def install_sqlalchemy(engine) -> None:
+    """
+    engine의 모든 cursor execute를 db span으로 기록(활성 trace가 있을 때만)
+    """
+    from sqlalchemy import event
+
+    if getattr(engine, "_crm_tracing", False):
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _TRACE.get() is None or context is None:
+            return
+        cm = span(_sql_name(statement), kind="db", executemany=bool(executemany),
+                  statement=" ".join(statement.split())[:_SQL_MAX])
+        context._crm_span_cm = cm
+        context._crm_span = cm.__enter__()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        cm = getattr(context, "_crm_span_cm", None)
+        if cm is None:
+            return
+        sp = getattr(context, "_crm_span", None)
+        if sp is not None:
+            try:
+                sp.set(rowcount=int(cursor.rowcount))
+            except Exception:
+                pass
+        context._crm_span_cm = None
+        cm.__exit__(None, None, None)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        ec = ctx.execution_context
+        cm = getattr(ec, "_crm_span_cm", None) if ec is not None else None
+        if cm is None:
+            return
+        ec._crm_span_cm = None
+        e = ctx.original_exception
+        try:
+            cm.__exit__(type(e), e, None)
+        except BaseException:
+            pass
+
+    engine._crm_tracing = True
+
+
+def _sql_name(statement: str) -> str:
+    """
+    'db.SELECT users' 처럼 동사 + 첫 테이블만(집계 key가 쿼리마다 갈라지지 않게)
+    """
+    toks = statement.split()
+    if not toks:
+        return "db"
+    verb = toks[0].upper()
+    table = ""
+    upper = [t.upper() for t in toks]
+    for kw in ("FROM", "INTO", "UPDATE"):
+        if kw in upper:
+            i = upper.index(kw)
+            if kw == "UPDATE":
+                table = toks[i + 1] if i + 1 < len(toks) else ""
+            elif i + 1 < len(toks):
+                table = toks[i + 1]
+            break
+    table = table.strip("`(").split("(")[0]
+    return f"db.{verb} {table}".strip()
+
+
+# -----------------------------
+# export
+# -----------------------------
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def to_otlp(tr: Trace) -> Dict[str, Any]:
+    """
+    OTLP/JSON (ExportTraceServiceRequest) 형식. collector의 /v1/traces 에 그대로 POST 가능
+    """
+    with tr._lock:
+        spans = list(tr.spans)
+    out = []
+    for sp in spans:
+        attrs = {"crm.kind": sp.kind, "crm.run_id": tr.run_id, **sp.attrs}
+        d: Dict[str, Any] = {
+            "traceId": sp.trace_id,
+            "spanId": sp.span_id,
+            "name": sp.name,
+            "kind": 3 if sp.kind in _CLIENT_KINDS else 1,
+            "startTimeUnixNano": str(sp.start_ns),
+            "endTimeUnixNano": str(sp.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attrs.items()],
+            "status": {"code": 2, "message": sp.error} if sp.error else {"code": 1},
+        }
+        if sp.parent_id:
+            d["parentSpanId"] = sp.parent_id
+        out.append(d)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "crm_agent.tracing"}, "spans": out}],
+        }]
+    }
+
+
+def export_otlp_json(tr: Trace, directory: Optional[str] = None) -> Optional[str]:
+    directory = directory or TRACE_EXPORT_DIR
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{tr.run_id}_{tr.trace_id[:8]}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_otlp(tr), f, ensure_ascii=False)
+    return path
+
+
+def save_perf(repo, tr: Optional[Trace]) -> None:
+    """
+    PERF handoff 저장 + (CRM_TRACE_EXPORT_DIR 설정 시) OTLP JSON 파일 export.
+    성능 기록 실패가 본 흐름을 깨지 않도록 예외는 삼킴
+    """
+    if tr is None:
+        return
+    try:
+        repo.create_handoff(tr.run_id, ST_PERF, tr.summary())
+    except Exception:
+        pass
+    try:
+        export_otlp_json(tr)
+    except Exception:
+        pass
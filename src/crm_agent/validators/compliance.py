@@ -1,27 +1,24 @@
+from crm_agent.validators.rule_engine import FAIL, PASS, WARN, PhraseRule, check, register_rules, scan
+
 BANNED = ["무조건", "100% 효과", "완치", "영구", "절대", "확실히", "단번에"]
 MEDICAL = ["치료", "처방", "진단", "병명"]
 
+PROFILE = "validators.compliance"
+
+register_rules(PROFILE, (
+    [PhraseRule(b, WARN, "WARN: 과장/금칙 가능 표현 '{phrase}'") for b in BANNED]
+    + [PhraseRule(m, FAIL, "FAIL: 의료/치료 암시 '{phrase}'") for m in MEDICAL]
+))
+
 def validate_text(text: str) -> tuple[str, list[str]]:
     """
     MVP 컴플라이언스:
     - 의료/치료 암시는 FAIL
     - 과장/확정형 표현은 WARN
     """
-    t = (text or "").lower()
-    issues: list[str] = []
-
-    for b in BANNED:
-        if b.lower() in t:
-            issues.append(f"WARN: 과장/금칙 가능 표현 '{b}'")
-
-    for m in MEDICAL:
-        if m.lower() in t:
-            issues.append(f"FAIL: 의료/치료 암시 '{m}'")
-
-    status = "PASS"
-    if any(i.startswith("FAIL") for i in issues):
-        status = "FAIL"
-    elif issues:
-        status = "WARN"
+    v = check(text, PROFILE)
+    return v.status, v.reasons
 
-    return status, issues
+def validate_texts(texts: list[str]) -> list[tuple[str, list[str]]]:
+    bad = scan(texts, PROFILE)
+    return [(bad[k].status, bad[k].reasons) if k in bad else (PASS, []) for k in range(len(texts))]
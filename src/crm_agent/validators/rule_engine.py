@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import ahocorasick  # pyahocorasick(C). 없으면 아래 _FindScanner
+except Exception:
+    ahocorasick = None
+
+# -----------------------------
+# 컴플라이언스 rule engine
+# - profile(호출처)마다 phrase rule(금칙/의료/과장) + length rule(채널별 길이)을 등록
+# - 모든 profile 의 phrase 를 Aho-Corasick automaton(pyahocorasick, requirements.txt) 하나로 compile
+#   pyahocorasick 이 설치 안 된 환경에서만 phrase 별 str.find(_FindScanner)로 동작
+# - check_batch: batch 문장을 구분자로 이어 붙여 automaton 을 한 번만 훑고, hit 위치로 문장을 찾아 나눔
+# - 결과: 문장별 Verdict(status PASS/WARN/FAIL, hit 위치, reasons)
+# phrase 매칭은 대소문자 무시
+# -----------------------------
+PASS, WARN, FAIL = "PASS", "WARN", "FAIL"
+_SEVERITY = {PASS: 0, WARN: 1, FAIL: 2}
+
+# 문장 경계(phrase 에 들어갈 일 없는 문자) → 이어 붙여도 문장 사이에 걸친 match 가 안 생김
+_SEP = "\x00"
+
+
+@dataclass(frozen=True)
+class PhraseRule:
+    phrase: str
+    severity: str
+    message: str   # {phrase} 치환
+
+
+@dataclass(frozen=True)
+class LengthRule:
+    max_len: Dict[str, int]   # 채널 → 최대 길이, "*" 는 채널 무관 기본값
+    severity: str
+    message: str              # {length} {limit} {channel} 치환
+
+
+Rule = Union[PhraseRule, LengthRule]
+
+
+@dataclass(frozen=True)
+class Hit:
+    rule: int        # profile 안 rule 순번(reasons 정렬 기준)
+    severity: str
+    message: str
+    phrase: Optional[str] = None
+    start: int = -1  # phrase 위치 [start, end). length rule 은 -1
+    end: int = -1
+
+
+class Verdict:
+    __slots__ = ("status", "hits")
+
+    def __init__(self, status: str = PASS, hits: Optional[List[Hit]] = None):
+        self.status = status
+        self.hits: List[Hit] = hits if hits is not None else []
+
+    def __repr__(self) -> str:
+        return f"Verdict(status={self.status!r}, hits={self.hits!r})"
+
+    @property
+    def reasons(self) -> List[str]:
+        # rule 등록 순서대로, 같은 문구는 한 번만
+        if not self.hits:
+            return []
+        seen = set()
+        out = []
+        for h in sorted(self.hits, key=lambda h: (h.rule, h.start)):
+            if h.message not in seen:
+                seen.add(h.message)
+                out.append(h.message)
+        return out
+
+
+def _fold(text: str) -> str:
+    low = text.lower()
+    if len(low) == len(text):
+        return low
+    # 'İ' 처럼 lower 하면 길이가 바뀌는 문자가 있으면 위치가 어긋나니 글자 단위로
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+# -----------------------------
+# phrase matcher
+# -----------------------------
+class _FindScanner:
+    """
+    pyahocorasick 이 없을 때. Python 으로 글자마다 automaton 상태 전이를 돌리면 기존 `in` 검사보다도 느려서,
+    phrase 마다 batch 전체(이어 붙인 문자열)에 str.find 를 한 번씩 돌림(C). 겹치는 match 포함, 결과는 같음
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self.lengths = [len(p) for p in patterns]
+
+    def iter(self, text: str) -> Iterable[Tuple[int, int]]:
+        """
+        (끝 index, pattern id). 끝 index 는 마지막 글자 위치(pyahocorasick 과 같음)
+        """
+        for pid, p in enumerate(self.patterns):
+            if not p:
+                continue
+            find = text.find
+            last = len(p) - 1
+            i = find(p)
+            while i >= 0:
+                yield i + last, pid
+                i = find(p, i + 1)
+
+
+class _CAutomaton:
+    def __init__(self, patterns: Sequence[str]):
+        self.lengths = [len(p) for p in patterns]
+        self._a = ahocorasick.Automaton()
+        for pid, p in enumerate(patterns):
+            self._a.add_word(p, pid)
+        self._a.make_automaton()
+        self._empty = not patterns
+
+    def iter(self, text: str) -> Iterable[Tuple[int, int]]:
+        if self._empty:
+            return iter(())
+        return self._a.iter(text)
+
+
+def _build_automaton(patterns: Sequence[str]):
+    return _CAutomaton(patterns) if ahocorasick is not None else _FindScanner(patterns)
+
+
+# -----------------------------
+# engine
+# -----------------------------
+class RuleEngine:
+    def __init__(self):
+        self._profiles: Dict[str, List[Rule]] = {}
+        self._lock = threading.Lock()
+        self._compiled = None  # (automaton, [[(profile, rule index)] per pattern])
+
+    def register(self, profile: str, rules: Sequence[Rule]) -> None:
+        """
+        profile 의 rule 목록을 (다시) 등록. 순서가 reasons 순서
+        """
+        with self._lock:
+            self._profiles[profile] = list(rules)
+            self._compiled = None
+
+    def rules(self, profile: str) -> List[Rule]:
+        return list(self._profiles.get(profile) or [])
+
+    def _compile(self):
+        compiled = self._compiled
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            if self._compiled is None:
+                pid_of: Dict[str, int] = {}
+                owners: List[List[Tuple[str, int]]] = []
+                for prof, rules in self._profiles.items():
+                    for ri, r in enumerate(rules):
+                        if not isinstance(r, PhraseRule) or not r.phrase:
+                            continue
+                        key = _fold(r.phrase)
+                        pid = pid_of.get(key)
+                        if pid is None:
+                            pid = pid_of[key] = len(owners)
+                            owners.append([])
+                        owners[pid].append((prof, ri))
+                self._compiled = (_build_automaton(list(pid_of)), owners)
+            return self._compiled
+
+    def scan(
+            self,
+            texts: Sequence[str],
+            profile: str,
+            channels: Union[None, str, Sequence[Optional[str]]] = None,
+    ) -> Dict[int, Verdict]:
+        """
+        PASS 가 아닌 문장만 {index: Verdict}. 대부분 PASS 인 대량 검사용(문장마다 객체를 안 만듦)
+        channels: 문장별 채널(또는 전체 공통 채널 하나). length rule 의 채널 한도에만 씀
+        """
+        rules = self._profiles.get(profile)
+        if rules is None:
+            raise KeyError(f"unknown rule profile: {profile}")
+        texts = [t or "" for t in texts]
+        if channels is None or isinstance(channels, str):
+            channels = [channels] * len(texts)
+        if not texts:
+            return {}
+        hits: Dict[int, List[Hit]] = {}
+
+        # 1) phrase: batch 전체를 한 번에 훑음
+        automaton, owners = self._compile()
+        starts = []
+        pos = 0
+        for t in texts:
+            starts.append(pos)
+            pos += len(t) + 1
+        joined = _fold(_SEP.join(texts))
+        lengths = automaton.lengths
+        for end, pid in automaton.iter(joined):
+            mine = [ri for prof, ri in owners[pid] if prof == profile]
+            if not mine:
+                continue
+            k = bisect_right(starts, end) - 1
+            s = end - lengths[pid] + 1 - starts[k]
+            found = hits.setdefault(k, [])
+            for ri in mine:
+                r = rules[ri]
+                found.append(Hit(ri, r.severity, r.message.format(phrase=r.phrase), r.phrase, s, s + lengths[pid]))
+
+        # 2) length
+        for ri, r in enumerate(rules):
+            if not isinstance(r, LengthRule):
+                continue
+            default = r.max_len.get("*")
+            limit_of = {c: r.max_len.get((c or "").upper(), default) for c in set(channels)}
+            for k, t in enumerate(texts):
+                limit = limit_of[channels[k]]
+                if limit and len(t) > limit:
+                    hits.setdefault(k, []).append(Hit(ri, r.severity, r.message.format(
+                        length=len(t), limit=limit, channel=channels[k])))
+
+        out: Dict[int, Verdict] = {}
+        for k, hs in hits.items():
+            hs.sort(key=lambda h: (h.start, h.rule))
+            out[k] = Verdict(max((h.severity for h in hs), key=_SEVERITY.__getitem__), hs)
+        return out
+
+    def check_batch(
+            self,
+            texts: Sequence[str],
+            profile: str,
+            channels: Union[None, str, Sequence[Optional[str]]] = None,
+    ) -> List[Verdict]:
+        """
+        문장별 Verdict(입력 순서)
+        """
+        bad = self.scan(texts, profile, channels)
+        return [bad.get(k) or Verdict() for k in range(len(texts))]
+
+    def check(self, text: str, profile: str, channel: Optional[str] = None) -> Verdict:
+        return self.check_batch([text], profile, channel)[0]
+
+
+_ENGINE = RuleEngine()
+
+
+def get_engine() -> RuleEngine:
+    return _ENGINE
+
+
+def register_rules(profile: str, rules: Sequence[Rule]) -> None:
+    _ENGINE.register(profile, rules)
+
+
+def scan(
+        texts: Sequence[str],
+        profile: str,
+        channels: Union[None, str, Sequence[Optional[str]]] = None,
+) -> Dict[int, Verdict]:
+    return _ENGINE.scan(texts, profile, channels)
+
+
+def check_batch(
+        texts: Sequence[str],
+        profile: str,
+        channels: Union[None, str, Sequence[Optional[str]]] = None,
+) -> List[Verdict]:
+    return _ENGINE.check_batch(texts, profile, channels)
+
+
+def check(text: str, profile: str, channel: Optional[str] = None) -> Verdict:
+    return _ENGINE.check(text, profile, channel)
@@ -0,0 +1,110 @@
+"""
+chunker 비교 벤치마크 (네트워크 호출 없음)
+
+- legacy : 기존 ingest._chunk_text (문자 1200 / overlap 150 윈도우)
+- engine : rag.chunking (토큰 budget + md 섹션 + overlap 중복 제거)
+
+사용:
+  python tools/bench_chunking.py
+  python tools/bench_chunking.py --repeat 200 --max-tokens 300 --overlap-tokens 40
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from crm_agent.rag.chunking import iter_chunks, split_markdown_sections
+from crm_agent.rag.ingest import CORPUS_DIR, EMBED_BATCH, load_corpus
+from crm_agent.services.tokens import count_tokens, tiktoken
+
+# text-embedding-3-small 단가 (USD / 1M tokens)
+EMBED_USD_PER_1M = 0.02
+
+
+def _legacy_chunk_text(text: str, max_chars: int = 1200, overlap: int = 150) -> List[str]:
+    # 기존 ingest._chunk_text 그대로 (비교용)
+    text = re.sub(r"\n{3,}", "\n\n", text.replace("\r\n", "\n").strip())
+    if not text:
+        return []
+    if len(text) <= max_chars:
+        return [text]
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        part = text[start:end].strip()
+        if part:
+            chunks.append(part)
+        if end == len(text):
+            break
+        start = max(0, end - overlap)
+    return chunks
+
+
+def _legacy(corpus: List[Tuple[str, str]]) -> List[str]:
+    out: List[str] = []
+    for _, md in corpus:
+        for _, sec in split_markdown_sections(md):
+            out.extend(_legacy_chunk_text(sec))
+    return out
+
+
+def _engine(corpus: List[Tuple[str, str]], max_tokens: int, overlap_tokens: int) -> List[str]:
+    seen: set = set()
+    out: List[str] = []
+    for _, md in corpus:
+        for c in iter_chunks(md.splitlines(), max_tokens=max_tokens, overlap_tokens=overlap_tokens, seen=seen):
+            out.append(c.text)
+    return out
+
+
+def _report(name: str, texts: List[str], elapsed: float) -> None:
+    toks = [count_tokens(t) for t in texts]
+    total = sum(toks)
+    batches = (len(texts) + EMBED_BATCH - 1) // EMBED_BATCH
+    print(
+        f"{name:<7} chunks={len(texts):>7}  tokens={total:>9}  "
+        f"avg={total / max(1, len(texts)):7.1f}  max={max(toks) if toks else 0:>5}  "
+        f"embed_batches={batches:>5}  cost=${total / 1_000_000 * EMBED_USD_PER_1M:.5f}  "
+        f"chunk_time={elapsed * 1000:8.1f}ms"
+    )
+
+
+def main():
+    p = argparse.ArgumentParser(description="legacy vs token-aware chunker benchmark")
+    p.add_argument("--repeat", type=int, default=1, help="코퍼스를 N배로 키워서 측정(대용량 근사)")
+    p.add_argument("--max-tokens", type=int, default=300)
+    p.add_argument("--overlap-tokens", type=int, default=40)
+    args = p.parse_args()
+
+    base = load_corpus()
+    # 큰 문서 근사: 같은 파일 내용을 이어 붙이되 문단마다 번호를 달아 완전 중복은 피함
+    corpus = [
+        (name, "\n\n".join(f"{md}\n(#{i})" for i in range(args.repeat)))
+        for name, md in base
+    ]
+
+    print(f"corpus: {CORPUS_DIR} files={len(corpus)} repeat={args.repeat} "
+          f"tokenizer={'tiktoken' if tiktoken else 'estimate'}")
+
+    t0 = time.perf_counter()
+    legacy = _legacy(corpus)
+    _report("legacy", legacy, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    engine = _engine(corpus, args.max_tokens, args.overlap_tokens)
+    _report("engine", engine, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+다양성(유사도) 계산 비교 벤치마크 (네트워크 호출 없음)
+
+- legacy : difflib.SequenceMatcher.ratio() 를 과거 템플릿 전체와 pairwise
+- minhash: services.diversity.DiversityIndex (문자 3-gram MinHash, (N, 64) 벡터 비교 1회)
+
+사용:
+  python tools/bench_diversity.py
+  python tools/bench_diversity.py --history 5000 --queries 20
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import random
+import argparse
+from difflib import SequenceMatcher
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from crm_agent.agents.template_agent import _fallback_candidates, REQUIRED_SLOTS_BY_CHANNEL
+from crm_agent.services.diversity import DiversityIndex
+
+_WORDS = ["겨울", "보습", "촉촉", "루틴", "데일리", "산뜻", "재구매", "건조함", "케어", "추천", "확인", "혜택"]
+
+
+def _synthetic(n: int, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    base = [
+        c["body_with_slots"]
+        for c in _fallback_candidates(
+            channel="SMS", tone_id="amoremall", required=REQUIRED_SLOTS_BY_CHANNEL["SMS"], normalized={}, campaign_goal=""
+        )["candidates"]
+    ]
+    out = []
+    for i in range(n):
+        words = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(3, 8)))
+        out.append(f"{base[i % len(base)]}\n{words}")
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(description="SequenceMatcher vs MinHash diversity benchmark")
+    p.add_argument("--history", type=int, default=2000, help="과거(승인) 템플릿 수")
+    p.add_argument("--queries", type=int, default=10, help="새 후보 수")
+    args = p.parse_args()
+
+    history = _synthetic(args.history)
+    queries = _synthetic(args.queries, seed=11)
+
+    t0 = time.perf_counter()
+    idx = DiversityIndex(capacity=len(history))
+    idx.extend((t, i) for i, t in enumerate(history))
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    mh = [idx.max_similarity(q)[0] for q in queries]
+    mh_t = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    legacy = [max(SequenceMatcher(None, q, h).ratio() for h in history) for q in queries]
+    legacy_t = time.perf_counter() - t0
+
+    print(f"history={len(history)} queries={len(queries)}")
+    print(f"legacy  total={legacy_t * 1000:9.1f}ms  per_query={legacy_t * 1000 / len(queries):8.2f}ms  "
+          f"avg_max_ratio={sum(legacy) / len(legacy):.3f}")
+    print(f"minhash total={mh_t * 1000:9.1f}ms  per_query={mh_t * 1000 / len(queries):8.2f}ms  "
+          f"avg_max_jaccard={sum(mh) / len(mh):.3f}  (index build {build * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()